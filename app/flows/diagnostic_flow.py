@@ -1,5 +1,6 @@
-from typing import Dict, Any, List
-from app.utils.vector_store_manager import VectorStoreManager
+from typing import Dict, Any, List, Optional
+from app.utils.vector_store_registry import VectorStoreRegistry
+from app.utils.semantic_cache import SemanticCache
 from app.utils.human_loop_manager import HumanLoopManager
 from app.crews.mechanic_crew import MechanicCrew
 import streamlit as st
@@ -9,26 +10,23 @@ from datetime import datetime
 class DiagnosticFlow:
     """Flow de diagnostic avec RAG et validation humaine"""
     
-    def __init__(self):
+    def __init__(self, semantic_cache: Optional[SemanticCache] = None):
         try:
-            # Initialisation du gestionnaire de vecteurs
-            self.vector_store = VectorStoreManager()
+            # Base de connaissances partagée entre les sessions, chargée à la première recherche
+            self.vector_store = VectorStoreRegistry().acquire("diagnostic_kb", lazy=True)
             
             # Vérification de l'existence du gestionnaire
             if self.vector_store is None:
                 raise ValueError("Impossible de créer le gestionnaire de vecteurs")
             
+            # Cache des diagnostics de demandes similaires (partageable entre les sessions)
+            self.semantic_cache = semantic_cache or SemanticCache(
+                lambda text: self.vector_store.embeddings.embed_query(text)
+            )
+            
             # Initialisation des autres gestionnaires
             self.human_loop = HumanLoopManager()
             self.crew = MechanicCrew()
-            
-            # Chargement de la base de connaissances
-            try:
-                self.vector_store.load_vector_store("diagnostic_kb")
-            except Exception as load_error:
-                st.warning(f"Impossible de charger la base de connaissances : {str(load_error)}")
-                # Créer une base de connaissances vide si nécessaire
-                self.vector_store.create_empty_vector_store("diagnostic_kb")
         
         except Exception as e:
             st.error(f"Erreur lors de l'initialisation du flux de diagnostic : {str(e)}")
@@ -45,6 +43,18 @@ class DiagnosticFlow:
         # Génération de l'ID unique pour ce diagnostic
         diagnostic_id = str(uuid.uuid4())
         
+        # 0. Demande similaire déjà traitée pour le même véhicule et les mêmes codes
+        cached_result = self.semantic_cache.lookup(vehicle_data, symptoms, dtc_codes)
+        if cached_result is not None:
+            cached_result.update({
+                "diagnostic_id": diagnostic_id,
+                "timestamp": datetime.now().isoformat(),
+                "vehicle_data": vehicle_data,
+                "symptoms": symptoms,
+                "dtc_codes": dtc_codes
+            })
+            return cached_result
+        
         # 1. Recherche de cas similaires dans la base de connaissances
         query = f"""
         Véhicule: {vehicle_data['make']} {vehicle_data['model']} {vehicle_data['year']}
@@ -52,7 +62,14 @@ class DiagnosticFlow:
         Codes DTC: {', '.join(dtc_codes)}
         """
         
-        similar_cases = self.vector_store.similarity_search(query)
+        # Recherche hybride (codes DTC exacts + sémantique), restreinte à la marque et au modèle
+        similar_cases = self.vector_store.hybrid_search(
+            query,
+            filters={"make": vehicle_data['make'], "model": vehicle_data['model']}
+        )
+        if not similar_cases:
+            # Aucun cas pour ce modèle : recherche élargie à toute la base
+            similar_cases = self.vector_store.hybrid_search(query)
         
         # 2. Analyse par l'équipe d'agents
         diagnostic_result = self.crew.analyze_diagnostic(
@@ -63,6 +80,7 @@ class DiagnosticFlow:
         )
         
         # 3. Vérification du niveau de confiance
+        cacheable = True
         if self.human_loop.require_validation(diagnostic_result["confidence_score"]):
             # Demande de validation humaine
             validated_result = self.human_loop.request_human_validation(
@@ -75,6 +93,14 @@ class DiagnosticFlow:
                 diagnostic_result = validated_result
                 # Ajout à la base de connaissances
                 self._update_knowledge_base(diagnostic_result)
+                # Les résultats en cache pour ce véhicule ne tiennent pas compte du nouveau cas
+                self.semantic_cache.invalidate_profile(vehicle_data)
+            else:
+                # Résultat peu fiable en attente de validation : pas de réutilisation
+                cacheable = False
+        
+        if cacheable:
+            self.semantic_cache.store(vehicle_data, symptoms, dtc_codes, diagnostic_result)
         
         # 4. Enrichissement du résultat
         diagnostic_result.update({
@@ -101,14 +127,22 @@ class DiagnosticFlow:
         Recommandations: {diagnostic_data['recommendations']}
         """
         
-        # Ajout à la base vectorielle
-        self.vector_store.add_texts(
-            [knowledge_text],
-            [{"diagnostic_id": diagnostic_data['diagnostic_id']}]
-        )
-        
-        # Sauvegarde de la base
-        self.vector_store.save_vector_store("diagnostic_kb")
+        # Ajout et sauvegarde sous verrou exclusif ; si un autre processus a publié
+        # la base entre-temps, l'ajout est rejoué sur la version publiée
+        try:
+            self.vector_store.add_texts_and_save(
+                [knowledge_text],
+                [{
+                    "diagnostic_id": diagnostic_data['diagnostic_id'],
+                    "make": diagnostic_data['vehicle_data']['make'],
+                    "model": diagnostic_data['vehicle_data']['model'],
+                    "year": diagnostic_data['vehicle_data']['year'],
+                    "dtc_codes": diagnostic_data['dtc_codes']
+                }],
+                "diagnostic_kb"
+            )
+        except RuntimeError as e:
+            st.error(f"Le cas n'a pas été ajouté à la base de connaissances : {str(e)}")
     
     def show_diagnostic_interface(self):
         """Affiche l'interface de diagnostic"""
@@ -174,6 +208,12 @@ class DiagnosticFlow:
                 if result:
                     st.success("Diagnostic complété avec succès!")
                     
+                    cache_info = result.get("semantic_cache")
+                    if cache_info:
+                        st.session_state["diagnostic_cache_hit"] = cache_info
+                    else:
+                        st.session_state.pop("diagnostic_cache_hit", None)
+                    
                     st.write("### Résultats du Diagnostic")
                     st.write(f"**ID du Diagnostic:** {result['diagnostic_id']}")
                     st.write(f"**Diagnostic:** {result['diagnostic']}")
@@ -187,3 +227,16 @@ class DiagnosticFlow:
                         for case in result["similar_cases"][:3]:
                             with st.expander(f"Cas {case['diagnostic_id']}"):
                                 st.write(case['content'])
+        
+        # Résultat repris d'une demande similaire : le technicien peut le rejeter
+        cache_info = st.session_state.get("diagnostic_cache_hit")
+        if cache_info:
+            age_minutes = cache_info["age_seconds"] / 60
+            st.info(
+                f"Résultat repris d'un diagnostic similaire d'il y a {age_minutes:.0f} min "
+                f"(similarité {cache_info['similarity']:.2f})"
+            )
+            if st.button("Ce résultat ne correspond pas à ma demande"):
+                self.semantic_cache.report_false_hit(cache_info["entry_id"], cache_info["similarity"])
+                st.session_state.pop("diagnostic_cache_hit", None)
+                st.warning("Résultat retiré du cache : relancez le diagnostic pour une nouvelle analyse")
@@ -1,5 +1,5 @@
 from typing import Dict, Any, List
-from app.utils.vector_store_manager import VectorStoreManager
+from app.utils.vector_store_registry import VectorStoreRegistry
 from app.utils.human_loop_manager import HumanLoopManager
 from app.crews.mechanic_crew import MechanicCrew
 import streamlit as st
@@ -12,13 +12,11 @@ class InspectionFlow:
     """Flow d'inspection avec analyse d'image et validation humaine"""
     
     def __init__(self):
-        self.vector_store = VectorStoreManager()
+        # Base de connaissances partagée entre les sessions, chargée à la première recherche
+        self.vector_store = VectorStoreRegistry().acquire("inspection_kb", lazy=True)
         self.human_loop = HumanLoopManager()
         self.crew = MechanicCrew()
         
-        # Chargement de la base de connaissances
-        self.vector_store.load_vector_store("inspection_kb")
-        
         # Création du dossier pour les rapports
         self.reports_path = Path("data/inspection_reports")
         self.reports_path.mkdir(parents=True, exist_ok=True)
@@ -44,7 +42,14 @@ class InspectionFlow:
         Problèmes détectés: {', '.join(image_analysis['detected_issues'])}
         """
         
-        similar_cases = self.vector_store.similarity_search(query)
+        # Recherche restreinte aux véhicules de même marque et modèle
+        similar_cases = self.vector_store.similarity_search(
+            query,
+            filters={"make": vehicle_data['make'], "model": vehicle_data['model']}
+        )
+        if not similar_cases:
+            # Aucun cas pour ce modèle : recherche élargie à toute la base
+            similar_cases = self.vector_store.similarity_search(query)
         
         # 3. Génération du rapport d'inspection
         inspection_result = self.crew.generate_inspection_report(
@@ -83,12 +88,21 @@ class InspectionFlow:
         Recommandations: {inspection_data['recommendations']}
         """
         
-        self.vector_store.add_texts(
-            [knowledge_text],
-            [{"inspection_id": inspection_data['inspection_id']}]
-        )
-        
-        self.vector_store.save_vector_store("inspection_kb")
+        # Ajout et sauvegarde sous verrou exclusif ; si un autre processus a publié
+        # la base entre-temps, l'ajout est rejoué sur la version publiée
+        try:
+            self.vector_store.add_texts_and_save(
+                [knowledge_text],
+                [{
+                    "inspection_id": inspection_data['inspection_id'],
+                    "make": inspection_data['vehicle_data']['make'],
+                    "model": inspection_data['vehicle_data']['model'],
+                    "year": inspection_data['vehicle_data']['year']
+                }],
+                "inspection_kb"
+            )
+        except RuntimeError as e:
+            st.error(f"L'inspection n'a pas été ajoutée à la base de connaissances : {str(e)}")
     
     def _save_inspection_report(self, inspection_id: str, report_data: Dict[str, Any]):
         """Sauvegarde le rapport d'inspection"""
@@ -1,5 +1,5 @@
 from typing import Dict, Any, List
-from app.utils.vector_store_manager import VectorStoreManager
+from app.utils.vector_store_registry import VectorStoreRegistry
 from app.utils.human_loop_manager import HumanLoopManager
 from app.crews.mechanic_crew import MechanicCrew
 import streamlit as st
@@ -12,13 +12,11 @@ class MaintenanceFlow:
     """Flow de maintenance avec planification intelligente"""
     
     def __init__(self):
-        self.vector_store = VectorStoreManager()
+        # Base de connaissances partagée entre les sessions, chargée à la première recherche
+        self.vector_store = VectorStoreRegistry().acquire("maintenance_kb", lazy=True)
         self.human_loop = HumanLoopManager()
         self.crew = MechanicCrew()
         
-        # Chargement de la base de connaissances
-        self.vector_store.load_vector_store("maintenance_kb")
-        
         # Création du dossier pour les plans de maintenance
         self.plans_path = Path("data/maintenance_plans")
         self.plans_path.mkdir(parents=True, exist_ok=True)
@@ -41,7 +39,14 @@ class MaintenanceFlow:
         Problèmes actuels: {', '.join(current_issues)}
         """
         
-        similar_cases = self.vector_store.similarity_search(query)
+        # Recherche restreinte aux véhicules de même marque et modèle
+        similar_cases = self.vector_store.similarity_search(
+            query,
+            filters={"make": vehicle_data['make'], "model": vehicle_data['model']}
+        )
+        if not similar_cases:
+            # Aucun cas pour ce modèle : recherche élargie à toute la base
+            similar_cases = self.vector_store.similarity_search(query)
         
         # 2. Génération du plan par l'équipe d'agents
         maintenance_plan = self.crew.generate_maintenance_plan(
@@ -81,12 +86,21 @@ class MaintenanceFlow:
         Estimation totale: {plan_data['total_estimated_time']} heures
         """
         
-        self.vector_store.add_texts(
-            [knowledge_text],
-            [{"plan_id": plan_data['plan_id']}]
-        )
-        
-        self.vector_store.save_vector_store("maintenance_kb")
+        # Ajout et sauvegarde sous verrou exclusif ; si un autre processus a publié
+        # la base entre-temps, l'ajout est rejoué sur la version publiée
+        try:
+            self.vector_store.add_texts_and_save(
+                [knowledge_text],
+                [{
+                    "plan_id": plan_data['plan_id'],
+                    "make": plan_data['vehicle_data']['make'],
+                    "model": plan_data['vehicle_data']['model'],
+                    "year": plan_data['vehicle_data']['year']
+                }],
+                "maintenance_kb"
+            )
+        except RuntimeError as e:
+            st.error(f"Le plan n'a pas été ajouté à la base de connaissances : {str(e)}")
     
     def _save_maintenance_plan(self, plan_id: str, plan_data: Dict[str, Any]):
         """Sauvegarde le plan de maintenance"""
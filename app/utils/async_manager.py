@@ -40,16 +40,16 @@ class AsyncManager:
     
     @staticmethod
     async def _load_vector_store():
-        """Charge la base de données vectorielle"""
-        from app.utils.vector_store_manager import VectorStoreManager
-        if 'vector_store' not in st.session_state:
-            st.session_state.vector_store = VectorStoreManager()
-            # Chargement initial des bases
-            await asyncio.gather(
-                st.session_state.vector_store.load_vector_store("diagnostic_kb"),
-                st.session_state.vector_store.load_vector_store("inspection_kb"),
-                st.session_state.vector_store.load_vector_store("maintenance_kb")
+        """Charge les bases vectorielles partagées (une seule copie par processus)"""
+        from app.utils.vector_store_registry import VectorStoreRegistry
+        if 'vector_stores' not in st.session_state:
+            registry = VectorStoreRegistry()
+            store_names = ["diagnostic_kb", "inspection_kb", "maintenance_kb"]
+            # Le chargement est bloquant : exécuté dans des threads, en parallèle
+            stores = await asyncio.gather(
+                *(asyncio.to_thread(registry.acquire, store_name) for store_name in store_names)
             )
+            st.session_state.vector_stores = dict(zip(store_names, stores))
     
     @staticmethod
     async def _load_tools():
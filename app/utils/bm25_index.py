@@ -0,0 +1,131 @@
+from typing import Dict, List, Tuple, Iterable, Optional
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from app.utils.metadata_index import extract_dtc_codes
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découpe un texte en termes (minuscules, sans accents)
+
+    Les codes défaut sont aussi indexés sous une forme compacte ("p0420",
+    "spn3226fmi4") pour que les recherches exactes portent sur le code entier.
+    """
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+    tokens = TOKEN_PATTERN.findall(normalized)
+    tokens.extend(code.lower() for code in extract_dtc_codes(text))
+    return tokens
+
+
+def is_code_only_query(query: str) -> bool:
+    """Indique si la requête ne contient que des codes défaut (ex: "P0420", "SPN 3226 FMI 4")"""
+    codes = extract_dtc_codes(query)
+    if not codes:
+        return False
+    remainder = re.sub(r"\bSPN\s*\d+\s*FMI\s*\d+\b", " ", query, flags=re.IGNORECASE)
+    remainder = re.sub(r"\b[PBCU][0-9A-F]{4}\b", " ", remainder, flags=re.IGNORECASE)
+    return not re.search(r"\w", remainder)
+
+
+class BM25Index:
+    """Index inversé BM25 local, mis à jour incrémentalement, clé = identifiant du docstore"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: str, text: str):
+        """Ajoute (ou remplace) un document"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id, text)
+        terms = Counter(tokenize(text))
+        for term, frequency in terms.items():
+            self.postings[term][doc_id] = frequency
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id: str, text: str):
+        """Retire un document (son texte permet de retrouver ses termes)"""
+        if doc_id not in self.doc_lengths:
+            return
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        allowed_ids: Optional[set] = None
+    ) -> List[Tuple[str, float]]:
+        """Retourne les k documents de meilleur score BM25"""
+        if not self.doc_lengths:
+            return []
+
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count
+        scores: Dict[str, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                if allowed_ids is not None and doc_id not in allowed_ids:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[str, str]]) -> "BM25Index":
+        """Construit l'index à partir de couples (identifiant, texte)"""
+        index = cls()
+        for doc_id, text in documents:
+            index.add(doc_id, text)
+        return index
+
+    def save(self, path: Path):
+        """Sauvegarde l'index dans un fichier JSON (remplacement atomique)"""
+        tmp_path = Path(f"{path}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        """Charge un index sauvegardé"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.postings = defaultdict(dict, data["postings"])
+        index.doc_lengths = data["doc_lengths"]
+        index.total_length = sum(index.doc_lengths.values())
+        return index
@@ -0,0 +1,153 @@
+from typing import List, Dict, Any, Iterator, Optional
+import os
+import time
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# Module volontairement léger : il est importé par les processus de parsing,
+# qui n'ont besoin ni de Streamlit ni du client d'embeddings
+from langchain_community.document_loaders.text import TextLoader
+from langchain_community.document_loaders.pdf import UnstructuredPDFLoader as PDFLoader
+from langchain_community.document_loaders.csv_loader import CSVLoader
+from langchain_community.document_loaders.json_loader import JSONLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.csv', '.json')
+# Fichiers lus en flux par lots de lignes dans le processus principal : un
+# processus de parsing devrait les charger entièrement pour renvoyer ses chunks
+STREAMING_EXTENSIONS = ('.csv', '.json')
+
+
+def create_loader(file_path: str):
+    """Retourne le loader adapté à l'extension du fichier (None si non supportée)"""
+    file_extension = Path(file_path).suffix.lower()
+
+    if file_extension == '.txt':
+        return TextLoader(file_path)
+    elif file_extension == '.pdf':
+        return PDFLoader(file_path)
+    elif file_extension == '.csv':
+        return CSVLoader(file_path)
+    elif file_extension == '.json':
+        return JSONLoader(
+            file_path,
+            jq_schema='.[]',
+            text_content=False
+        )
+    return None
+
+
+def parse_file(file_path: str, chunk_size: int, chunk_overlap: int) -> Dict[str, Any]:
+    """
+    Charge et découpe un fichier complet (exécuté dans un processus de parsing)
+
+    Returns:
+        Dict[str, Any]: Chemin, chunks, durée et éventuelle erreur
+    """
+    start = time.time()
+    result = {"path": file_path, "chunks": [], "elapsed_seconds": 0.0, "error": None}
+    try:
+        loader = create_loader(file_path)
+        if loader is not None:
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_function=len,
+            )
+            result["chunks"] = splitter.split_documents(loader.load())
+    except Exception as e:
+        result["error"] = str(e)
+    result["elapsed_seconds"] = time.time() - start
+    return result
+
+
+class ParallelDocumentParser:
+    """
+    Parsing des fichiers sur plusieurs cœurs
+
+    Les fichiers sont soumis à un pool de processus par fenêtre glissante et
+    les résultats sont restitués dans l'ordre de soumission. Un fichier en
+    erreur ou qui dépasse le délai est signalé sans bloquer le reste du lot :
+    après un dépassement, les processus sont arrêtés et le pool remplacé, les
+    fichiers en attente étant resoumis au nouveau pool.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        file_timeout: float = 300.0
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.file_timeout = file_timeout
+
+    def iter_parsed(self, file_paths: List[str]) -> Iterator[Dict[str, Any]]:
+        """Produit, dans l'ordre des fichiers, le résultat de parsing de chacun"""
+        paths = iter(file_paths)
+        pending: deque = deque()
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        def submit_next() -> bool:
+            path = next(paths, None)
+            if path is None:
+                return False
+            future = executor.submit(parse_file, str(path), self.chunk_size, self.chunk_overlap)
+            pending.append((str(path), future))
+            return True
+
+        try:
+            # Fenêtre bornée pour ne pas accumuler les chunks de tout le corpus
+            for _ in range(self.workers * 2):
+                if not submit_next():
+                    break
+
+            while pending:
+                path, future = pending.popleft()
+                try:
+                    yield future.result(timeout=self.file_timeout)
+                except FutureTimeoutError:
+                    # Le processus bloqué garde son emplacement : le pool est remplacé
+                    yield self._failure(
+                        path,
+                        f"délai de {self.file_timeout:.0f}s dépassé",
+                        elapsed_seconds=self.file_timeout
+                    )
+                    executor = self._replace_pool(executor, pending)
+                except BrokenProcessPool as e:
+                    # Un processus a planté : on repart avec un pool neuf
+                    yield self._failure(path, f"processus de parsing interrompu ({str(e)})")
+                    executor = self._replace_pool(executor, pending)
+                submit_next()
+        finally:
+            self._terminate(executor)
+
+    def _replace_pool(self, executor: ProcessPoolExecutor, pending: deque) -> ProcessPoolExecutor:
+        """Arrête les processus du pool et resoumet les fichiers en attente à un pool neuf"""
+        self._terminate(executor)
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        retry = [path for path, _ in pending]
+        pending.clear()
+        for retry_path in retry:
+            pending.append((
+                retry_path,
+                executor.submit(parse_file, retry_path, self.chunk_size, self.chunk_overlap)
+            ))
+        return executor
+
+    @staticmethod
+    def _terminate(executor: ProcessPoolExecutor):
+        """Arrête le pool sans attendre les fichiers en cours de parsing"""
+        # shutdown() seul ne peut pas interrompre un processus occupé
+        for process in list((executor._processes or {}).values()):
+            if process.is_alive():
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _failure(path: str, error: str, elapsed_seconds: float = 0.0) -> Dict[str, Any]:
+        return {"path": path, "chunks": [], "elapsed_seconds": elapsed_seconds, "error": error}
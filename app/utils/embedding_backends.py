@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional, Tuple
+import math
+import os
+import re
+import zlib
+from collections import Counter
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.utils.bm25_index import tokenize
+
+# Modèle utilisé par défaut pour chaque backend d'embeddings
+DEFAULT_MODELS: Dict[str, str] = {
+    "openai": "text-embedding-ada-002",
+    "hashing": "hashing-384",
+    "local": "sentence-transformers/all-MiniLM-L6-v2"
+}
+
+# Backends dont le calcul justifie le cache disque (appel réseau ou modèle neuronal)
+DISK_CACHED_BACKENDS = ("openai", "local")
+
+
+def resolve_backend(backend: Optional[str] = None, model: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Détermine le backend et le modèle d'embeddings
+
+    Sans précision, le backend est lu dans la variable d'environnement
+    EMBEDDING_BACKEND (openai par défaut) et le modèle dans EMBEDDING_MODEL.
+    """
+    backend = (backend or os.getenv("EMBEDDING_BACKEND") or "openai").lower()
+    if backend not in DEFAULT_MODELS:
+        raise ValueError(
+            f"Backend d'embeddings inconnu: {backend} (disponibles: {', '.join(DEFAULT_MODELS)})"
+        )
+    return backend, model or os.getenv("EMBEDDING_MODEL") or DEFAULT_MODELS[backend]
+
+
+def create_embeddings(backend: str, model: str) -> Embeddings:
+    """Instancie le backend d'embeddings demandé"""
+    if backend == "openai":
+        if not os.getenv("OPENAI_API_KEY"):
+            raise ValueError(
+                "La clé API OpenAI n'est pas configurée. Veuillez créer un fichier .env avec votre "
+                "OPENAI_API_KEY ou choisir un backend local (EMBEDDING_BACKEND=hashing ou local)"
+            )
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=model)
+    if backend == "hashing":
+        match = re.fullmatch(r"hashing-(\d+)", model)
+        if not match:
+            raise ValueError(f"Modèle de hachage invalide: {model} (attendu: hashing-<dimension>)")
+        return HashingEmbeddings(dimension=int(match.group(1)))
+    return LocalModelEmbeddings(model)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings déterministes par hachage de caractéristiques, calculés sur CPU
+
+    Les mots (accents retirés, codes défaut compactés) et leurs trigrammes de
+    caractères sont projetés par hachage signé sur un vecteur de dimension fixe,
+    normalisé en L2. Aucun modèle ni accès réseau n'est nécessaire.
+    """
+
+    def __init__(self, dimension: int = 384, char_ngram: int = 3, char_weight: float = 0.5):
+        self.dimension = dimension
+        self.char_ngram = char_ngram
+        self.char_weight = char_weight
+
+    def _features(self, text: str) -> Counter:
+        features = Counter()
+        for token in tokenize(text):
+            features[f"w:{token}"] += 1.0
+            padded = f"#{token}#"
+            for i in range(len(padded) - self.char_ngram + 1):
+                features[f"c:{padded[i:i + self.char_ngram]}"] += self.char_weight
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature, weight in self._features(text).items():
+            digest = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            # Pondération sous-linéaire : un terme répété ne domine pas le vecteur
+            vector[digest % self.dimension] += sign * math.log1p(weight)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+
+class LocalModelEmbeddings(Embeddings):
+    """Modèle sentence-transformers exécuté sur CPU (dossier local ou modèle déjà téléchargé)"""
+
+    def __init__(self, model_name_or_path: str, batch_size: int = 32):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "Le backend d'embeddings 'local' nécessite sentence-transformers "
+                "(pip install sentence-transformers)"
+            ) from e
+        self.model = SentenceTransformer(model_name_or_path, device="cpu")
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Encode plusieurs requêtes en un lot (même encodage que embed_query)"""
+        return self.embed_documents(texts)
@@ -0,0 +1,270 @@
+from typing import List, Dict, Any, Optional
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.utils.lru_cache import LRUCache
+
+
+class EmbeddingCache:
+    """Cache persistant des embeddings, indexé par (modèle, empreinte du texte)"""
+
+    def __init__(
+        self,
+        cache_path: str = "data/embedding_cache/embeddings.sqlite",
+        max_entries: int = 500_000
+    ):
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+        # Compteurs de performance
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def __getstate__(self):
+        # La connexion SQLite n'est pas sérialisable
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Ouvre la connexion à la demande"""
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                str(self.cache_path),
+                check_same_thread=False
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Calcule la clé de cache d'un texte pour un modèle donné"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{digest}"
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Récupère les embeddings en cache (None pour les absents)"""
+        keys = [self.make_key(model, text) for text in texts]
+        found = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Requêtes par lots pour rester sous la limite de paramètres SQLite
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self.connection.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def set_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """Enregistre des embeddings dans le cache"""
+        now = time.time()
+        rows = [
+            (
+                self.make_key(model, text),
+                model,
+                np.asarray(vector, dtype=np.float32).tobytes(),
+                now
+            )
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self.connection.commit()
+            self._evict_if_needed()
+
+    def _evict_if_needed(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de la limite"""
+        count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            return
+
+        # On libère 10% de marge pour ne pas évincer à chaque insertion
+        to_remove = count - int(self.max_entries * 0.9)
+        self.connection.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (to_remove,)
+        )
+        self.connection.commit()
+        self.evictions += to_remove
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques d'utilisation du cache"""
+        with self._lock:
+            entries = self.connection.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self._lock:
+            self.connection.execute("DELETE FROM embeddings")
+            self.connection.commit()
+
+
+def normalize_query(text: str) -> str:
+    """Normalise les espaces (indentation des gabarits f-string, retours à la ligne)"""
+    return " ".join(text.split())
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings consultant le cache local avant tout appel distant"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        model_name: str,
+        query_cache_size: int = 1024,
+        spill_queries_to_disk: bool = True,
+        use_disk_cache: bool = True
+    ):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        # Les vecteurs de requête sont rangés à part : une requête identique à un
+        # chunk n'a pas forcément le même embedding (modèles asymétriques)
+        self.query_model_name = f"{model_name}:query"
+
+        # Cache LRU en mémoire des requêtes, devant le cache disque
+        self.query_cache = LRUCache(max_entries=query_cache_size)
+        # Un backend local très rapide (hachage) calcule plus vite qu'il ne lit SQLite
+        self.use_disk_cache = use_disk_cache
+        self.spill_queries_to_disk = spill_queries_to_disk and use_disk_cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Calcule les embeddings en ne payant que les textes absents du cache"""
+        if not self.use_disk_cache:
+            return self.embeddings.embed_documents(texts)
+        vectors = self.cache.get_many(self.model_name, texts)
+
+        # Dédoublonnage des textes manquants avant l'appel distant
+        missing = list(dict.fromkeys(
+            text for text, vector in zip(texts, vectors) if vector is None
+        ))
+        if missing:
+            computed = self.embeddings.embed_documents(missing)
+            self.cache.set_many(self.model_name, missing, computed)
+            computed_by_text = dict(zip(missing, computed))
+            vectors = [
+                vector if vector is not None else list(computed_by_text[text])
+                for text, vector in zip(texts, vectors)
+            ]
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Calcule l'embedding d'une requête via le cache mémoire puis le cache disque"""
+        query = normalize_query(text)
+        vector = self.query_cache.get(query)
+        if vector is not None:
+            return vector
+
+        if self.spill_queries_to_disk:
+            vector = self.cache.get_many(self.query_model_name, [query])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            if self.spill_queries_to_disk:
+                self.cache.set_many(self.query_model_name, [query], [vector])
+
+        self.query_cache.put(query, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Calcule les embeddings de plusieurs requêtes
+
+        Les requêtes absentes des caches sont encodées en un lot si le backend
+        propose embed_queries, sinon une par une avec embed_query.
+        """
+        queries = [normalize_query(text) for text in texts]
+        vectors = {}
+        for query in dict.fromkeys(queries):
+            vector = self.query_cache.get(query)
+            if vector is not None:
+                vectors[query] = vector
+
+        missing = [query for query in dict.fromkeys(queries) if query not in vectors]
+        if missing and self.spill_queries_to_disk:
+            for query, vector in zip(missing, self.cache.get_many(self.query_model_name, missing)):
+                if vector is not None:
+                    vectors[query] = vector
+                    self.query_cache.put(query, vector)
+            missing = [query for query in missing if query not in vectors]
+
+        if missing:
+            # Même encodage que embed_query (les modèles asymétriques préfixent les requêtes)
+            batch = getattr(self.embeddings, "embed_queries", None)
+            if batch is not None:
+                computed = batch(missing)
+            else:
+                computed = [self.embeddings.embed_query(query) for query in missing]
+            if self.spill_queries_to_disk:
+                self.cache.set_many(self.query_model_name, missing, computed)
+            for query, vector in zip(missing, computed):
+                vectors[query] = vector
+                self.query_cache.put(query, vector)
+
+        return [vectors[query] for query in queries]
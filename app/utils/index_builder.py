@@ -0,0 +1,308 @@
+from typing import Any, Dict, List, Optional
+import re
+import numpy as np
+import faiss
+
+# Index exact utilisé tant que la base est trop petite pour un index approximatif
+DEFAULT_INDEX_FACTORY = "Flat"
+
+# FAISS recommande au moins 39 points d'entraînement par centroïde
+MIN_POINTS_PER_CENTROID = 39
+
+# La quantification scalaire apprend les bornes de chaque dimension : un
+# échantillon trop petit écrête les vecteurs ajoutés ensuite
+MIN_SQ_TRAINING_SIZE = 256
+
+# Projections apprises appliquées aux vecteurs avant l'index (réduction de dimension)
+PROJECTIONS = ("pca", "opq")
+PROJECTION_PATTERN = re.compile(r"PCAR?W?\d+|OPQ\d+(_\d+)?")
+
+# Encodage des vecteurs stockés : float32, float16 ou quantification scalaire 8 bits
+VECTOR_STORAGE_ENCODINGS = {"float32": "Flat", "float16": "SQfp16", "sq8": "SQ8"}
+
+
+def is_flat_factory(factory_string: str) -> bool:
+    """Indique si la chaîne de fabrique décrit un index exact"""
+    return factory_string.replace(" ", "") in ("Flat", "IDMap,Flat")
+
+
+def apply_vector_storage(factory_string: str, storage: str) -> str:
+    """
+    Remplace l'encodage des vecteurs d'une chaîne de fabrique
+
+    Ex: ("Flat", "float16") -> "SQfp16", ("HNSW32", "sq8") -> "HNSW32,SQ8",
+    ("IVF1024,Flat", "sq8") -> "IVF1024,SQ8".
+    """
+    if storage not in VECTOR_STORAGE_ENCODINGS:
+        raise ValueError(
+            f"Stockage de vecteurs inconnu: {storage} (disponibles: {', '.join(VECTOR_STORAGE_ENCODINGS)})"
+        )
+    parts = [part.strip() for part in factory_string.split(",")]
+    if re.fullmatch(r"PQ\d+(x\d+)?(np)?", parts[-1]):
+        raise ValueError(f"L'index {factory_string} compresse déjà ses vecteurs (PQ)")
+    if re.fullmatch(r"Flat|SQ\w+", parts[-1]):
+        parts[-1] = VECTOR_STORAGE_ENCODINGS[storage]
+    elif re.fullmatch(r"HNSW\d+", parts[-1]):
+        # "HNSW32" stocke ses vecteurs en float32 : l'encodage est ajouté explicitement
+        parts.append(VECTOR_STORAGE_ENCODINGS[storage])
+    else:
+        raise ValueError(f"Encodage des vecteurs non modifiable pour l'index {factory_string}")
+    return ",".join(parts)
+
+
+def apply_projection(factory_string: str, projection: str, dimension: int) -> str:
+    """
+    Ajoute (ou remplace) la projection appliquée aux vecteurs avant l'index
+
+    Ex: ("HNSW32", "pca", 256) -> "PCA256,HNSW32", ("Flat", "opq", 128) -> "OPQ16_128,Flat".
+    La projection est entraînée avec l'index et appliquée aussi aux requêtes.
+    """
+    if projection not in PROJECTIONS:
+        raise ValueError(f"Projection inconnue: {projection} (disponibles: {', '.join(PROJECTIONS)})")
+    if not dimension or dimension <= 0:
+        raise ValueError("La projection nécessite une dimension cible positive")
+    if projection == "pca":
+        prefix = f"PCA{dimension}"
+    else:
+        if dimension % 8:
+            raise ValueError(f"La dimension OPQ doit être un multiple de 8 (reçu {dimension})")
+        # Rotation optimisée pour des sous-espaces de 8 dimensions
+        prefix = f"OPQ{dimension // 8}_{dimension}"
+    parts = [
+        part.strip() for part in factory_string.split(",")
+        if not PROJECTION_PATTERN.fullmatch(part.strip())
+    ]
+    return ",".join([prefix] + parts)
+
+
+def min_training_size(factory_string: str, dimension: Optional[int] = None) -> int:
+    """
+    Nombre minimal de vecteurs pour entraîner correctement l'index
+
+    Args:
+        factory_string (str): Type d'index FAISS
+        dimension (int): Dimension des vecteurs (requise par une projection PCA)
+    """
+    required = 0
+    if re.search(r"(^|,)PCA", factory_string) and dimension:
+        # La matrice de covariance doit être de rang plein
+        required = max(required, dimension)
+    if re.search(r"(^|,)OPQ", factory_string):
+        # OPQ entraîne un quantificateur de 256 centroïdes par sous-espace
+        required = max(required, 256 * MIN_POINTS_PER_CENTROID)
+    ivf = re.search(r"IVF(\d+)", factory_string)
+    if ivf:
+        required = max(required, int(ivf.group(1)) * MIN_POINTS_PER_CENTROID)
+    if re.search(r"SQ\d", factory_string):
+        required = max(required, MIN_SQ_TRAINING_SIZE)
+    pq = re.search(r"PQ(\d+)(?:x(\d+))?", factory_string)
+    if pq:
+        bits = int(pq.group(2) or 8)
+        required = max(required, (2 ** bits) * MIN_POINTS_PER_CENTROID)
+    return required
+
+
+def build_index(factory_string: str, vectors: np.ndarray) -> faiss.Index:
+    """Construit, entraîne si nécessaire et remplit un index FAISS"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(vectors.shape[1], factory_string)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    ensure_direct_map(index)
+    return index
+
+
+def recall_against_exact(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    k: int = 10,
+    num_queries: int = 200,
+    seed: int = 0,
+    queries: Optional[np.ndarray] = None
+) -> float:
+    """
+    Rappel@k d'un index par rapport à la recherche exacte en float32 sur les mêmes vecteurs
+
+    Sans requêtes fournies, les requêtes sont les milieux de couples de vecteurs
+    stockés tirés au hasard ; un résultat compte s'il est au moins aussi proche
+    que le k-ième voisin exact.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if len(vectors) == 0:
+        return 1.0
+    if queries is None:
+        rng = np.random.RandomState(seed)
+        pairs = rng.randint(0, len(vectors), size=(min(num_queries, len(vectors)), 2))
+        queries = (vectors[pairs[:, 0]] + vectors[pairs[:, 1]]) / 2
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    top = min(k, len(vectors))
+    expected, _ = exact.search(queries, top)
+    _, found = index.search(queries, top)
+
+    hits = 0
+    for query, expected_row, found_row in zip(queries, expected, found):
+        found_row = found_row[found_row >= 0]
+        distances = ((vectors[found_row] - query) ** 2).sum(axis=1)
+        hits += np.count_nonzero(distances <= expected_row[-1] * (1 + 1e-5) + 1e-6)
+    return hits / (top * len(queries))
+
+
+def select_projection_dimension(
+    vectors: np.ndarray,
+    query_vectors: np.ndarray,
+    dimensions: List[int],
+    target_recall: float = 0.95,
+    projection: str = "pca",
+    base_factory: str = DEFAULT_INDEX_FACTORY,
+    k: int = 10
+) -> Dict[str, Any]:
+    """
+    Cherche la plus petite dimension de projection gardant le rappel au-dessus de la cible
+
+    Args:
+        vectors (np.ndarray): Vecteurs de la base (entraînement et recherche)
+        query_vectors (np.ndarray): Requêtes de validation, absentes de la base
+        dimensions (List[int]): Dimensions candidates
+        target_recall (float): Rappel@k minimal par rapport à la recherche exacte
+        projection (str): "pca" ou "opq"
+        base_factory (str): Index placé après la projection
+
+    Returns:
+        Dict[str, Any]: Dimension retenue (None si aucune n'atteint la cible) et,
+        par dimension, le rappel obtenu et la taille d'un vecteur stocké
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    results = []
+    for dimension in sorted(set(dimensions)):
+        if dimension >= vectors.shape[1]:
+            continue
+        index = build_index(apply_projection(base_factory, projection, dimension), vectors)
+        # Taille des vecteurs seuls : la matrice de projection est comptée à part
+        empty = faiss.clone_index(index)
+        empty.reset()
+        model_bytes = faiss.serialize_index(empty).nbytes
+        results.append({
+            "dimension": dimension,
+            "recall": recall_against_exact(index, vectors, k=k, queries=query_vectors),
+            "bytes_per_vector": (faiss.serialize_index(index).nbytes - model_bytes) // max(index.ntotal, 1),
+            "projection_bytes": model_bytes
+        })
+    selected = next((row["dimension"] for row in results if row["recall"] >= target_recall), None)
+    return {"dimension": selected, "target_recall": target_recall, "results": results}
+
+
+def ensure_direct_map(index: faiss.Index):
+    """
+    Construit la table directe d'un index IVF (position -> liste inversée)
+
+    Modifie l'index : à appeler sous verrou d'écriture, quand l'index est chargé
+    ou remplacé. Les fonctions de reconstruction ne font ensuite que des lectures.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+
+def _check_direct_map(index: faiss.Index):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        raise ValueError("Index IVF sans table directe : appeler ensure_direct_map au chargement")
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Récupère tous les vecteurs stockés (approximés pour les index compressés)"""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    _check_direct_map(index)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def rebuild_without(index: faiss.Index, positions_to_remove) -> faiss.Index:
+    """
+    Reconstruit un index sans certaines positions, en conservant son entraînement
+
+    Utilisé pour les index (HNSW, IVF avec table directe...) qui ne supportent
+    pas remove_ids.
+    """
+    keep = np.ones(index.ntotal, dtype=bool)
+    keep[np.fromiter(positions_to_remove, dtype=np.int64)] = False
+    vectors = reconstruct_all(index)[keep]
+
+    rebuilt = faiss.clone_index(index)
+    rebuilt.reset()
+    if len(vectors):
+        rebuilt.add(vectors)
+    ensure_direct_map(rebuilt)
+    return rebuilt
+
+
+def reconstruct_positions(index: faiss.Index, positions: np.ndarray) -> np.ndarray:
+    """Récupère les vecteurs stockés à certaines positions seulement"""
+    _check_direct_map(index)
+    return index.reconstruct_batch(np.ascontiguousarray(positions, dtype=np.int64))
+
+
+def estimate_index_bytes(index: faiss.Index) -> int:
+    """
+    Taille approximative d'un index en mémoire, sans le copier
+
+    Codes des vecteurs (sa_code_size) et, pour HNSW, liens du graphe.
+    """
+    inner = faiss.downcast_index(index)
+    if hasattr(inner, "hnsw"):
+        storage = faiss.downcast_index(inner.storage)
+        return index.ntotal * storage.sa_code_size() + inner.hnsw.neighbors.size() * 4
+    try:
+        return index.ntotal * index.sa_code_size()
+    except RuntimeError:
+        # Index sans encodage autonome (HNSW après projection...) : vecteurs float32
+        return index.ntotal * index.d * 4
+
+
+def build_search_parameters(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    selector: Optional[faiss.IDSelector] = None
+) -> Optional[faiss.SearchParameters]:
+    """
+    Paramètres de recherche propres à une requête (nprobe pour IVF, efSearch pour HNSW,
+    sélecteur restreignant les positions candidates)
+
+    Passés à index.search, ils évitent de modifier l'index partagé entre sessions.
+    """
+    if nprobe is None and ef_search is None and selector is None:
+        return None
+
+    pre_transform = isinstance(index, faiss.IndexPreTransform)
+    inner = faiss.downcast_index(index.index) if pre_transform else index
+    is_ivf = faiss.try_extract_index_ivf(inner) is not None
+    is_hnsw = hasattr(inner, "hnsw")
+
+    params = None
+    if is_ivf and (nprobe is not None or selector is not None):
+        params = faiss.SearchParametersIVF()
+        if nprobe is not None:
+            params.nprobe = nprobe
+    elif is_hnsw and (ef_search is not None or selector is not None):
+        params = faiss.SearchParametersHNSW()
+        if ef_search is not None:
+            params.efSearch = ef_search
+    elif selector is not None:
+        params = faiss.SearchParameters()
+
+    if params is not None and selector is not None:
+        params.sel = selector
+        params.referenced_selector = selector
+
+    if params is not None and pre_transform:
+        wrapper = faiss.SearchParametersPreTransform()
+        wrapper.index_params = params
+        # Garde une référence Python pour que les paramètres internes restent valides
+        wrapper.referenced_params = params
+        return wrapper
+    return params
@@ -0,0 +1,363 @@
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Tuple
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections import deque
+
+
+class IngestionPipeline:
+    """
+    Pipeline d'ingestion par lots pour les grandes bases de connaissances
+
+    Les embeddings des lots sont calculés en parallèle (concurrence bornée,
+    reprise exponentielle sur limitation de débit) pendant que le fil
+    principal insère les lots déjà prêts dans FAISS, dans l'ordre.
+    La progression est enregistrée régulièrement pour reprendre après un arrêt.
+    """
+
+    def __init__(
+        self,
+        manager,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        checkpoint_every: int = 20,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.manager = manager
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.checkpoint_every = checkpoint_every
+        self.progress_callback = progress_callback
+
+    def _checkpoint_path(self, store_name: str):
+        return self.manager.vector_store_path / f"{store_name}_ingest_checkpoint.json"
+
+    @staticmethod
+    def _partial_store_name(store_name: str) -> str:
+        return f"{store_name}.partial"
+
+    @staticmethod
+    def _batch_digest(batch: List[Tuple[str, Any]]) -> str:
+        """Empreinte d'un lot, pour vérifier qu'une reprise porte sur les mêmes données"""
+        digest = hashlib.sha256()
+        for doc_id, doc in batch:
+            digest.update(str(doc_id).encode("utf-8"))
+            digest.update(doc.page_content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _batches(
+        self,
+        documents: Iterable[Any],
+        ids: Optional[Iterable[str]],
+        stats: Dict[str, Any]
+    ) -> Iterator[List[Tuple[str, Any]]]:
+        """
+        Découpe les documents (ou couples (id, document)) en lots de taille fixe
+
+        Les quasi-doublons d'un chunk déjà retenu sont écartés avant l'embedding.
+        """
+        ids_iter = iter(ids) if ids is not None else None
+        deduplicate = self.manager.dedup_threshold is not None
+        batch = []
+        for ordinal, item in enumerate(documents):
+            if isinstance(item, tuple):
+                doc_id, doc = item
+            else:
+                doc_id = next(ids_iter) if ids_iter is not None else None
+                doc = item
+            if deduplicate:
+                if doc_id is None:
+                    # Identifiant déterministe : les lots restent identiques à la reprise
+                    content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+                    doc_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{ordinal}:{content_hash}"))
+                if self.manager._merge_near_duplicate(doc_id, doc):
+                    stats["duplicates"] += 1
+                    continue
+            batch.append((doc_id, doc))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _is_rate_limit(error: Exception) -> bool:
+        """Détecte une erreur de limitation de débit de l'API"""
+        status = getattr(error, "status_code", None) or getattr(error, "http_status", None)
+        return status == 429 or "ratelimit" in type(error).__name__.lower()
+
+    def _embed_with_backoff(self, texts: List[str]) -> List[List[float]]:
+        """Calcule les embeddings d'un lot avec reprise exponentielle"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.manager.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                # Attente plus longue en cas de limitation de débit
+                factor = 4 if self._is_rate_limit(e) else 1
+                delay = self.backoff_base * factor * (2 ** attempt)
+                delay += random.uniform(0, self.backoff_base)
+                print(f"Erreur d'embedding ({str(e)}), nouvel essai dans {delay:.1f}s")
+                time.sleep(delay)
+
+    def _load_checkpoint(self, store_name: str) -> Optional[Dict[str, Any]]:
+        checkpoint_path = self._checkpoint_path(store_name)
+        if not checkpoint_path.exists():
+            return None
+        try:
+            with open(checkpoint_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Point de reprise illisible pour {store_name}: {str(e)}")
+            return None
+
+    def _save_checkpoint(self, store_name: str, batch_digests: List[str], chunks_done: int):
+        """Sauvegarde l'index partiel puis le point de reprise correspondant"""
+        self.manager.save_vector_store(self._partial_store_name(store_name))
+        checkpoint_path = self._checkpoint_path(store_name)
+        tmp_path = checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "store_name": store_name,
+                "batch_digests": batch_digests,
+                "chunks_done": chunks_done
+            }, f)
+        os.replace(tmp_path, checkpoint_path)
+
+    def clear_checkpoint(self, store_name: str):
+        """Supprime le point de reprise et l'index partiel d'une base"""
+        checkpoint_path = self._checkpoint_path(store_name)
+        if checkpoint_path.exists():
+            checkpoint_path.unlink()
+        partial_dir = self.manager._store_dir(self._partial_store_name(store_name))
+        if partial_dir.exists():
+            shutil.rmtree(partial_dir)
+
+    def _insert_batch(self, batch: List[Tuple[str, Any]], vectors: List[List[float]]):
+        """Insère un lot d'embeddings dans la base vectorielle du gestionnaire"""
+        texts = [doc.page_content for _, doc in batch]
+        metadatas = [doc.metadata for _, doc in batch]
+        ids = [doc_id for doc_id, _ in batch] if batch[0][0] is not None else None
+        self.manager._add_embeddings(list(zip(texts, vectors)), metadatas, ids)
+
+    def run(
+        self,
+        documents: Iterable[Any],
+        store_name: str,
+        ids: Optional[Iterable[str]] = None,
+        append: bool = False,
+        total: Optional[int] = None,
+        resume: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Ingère des documents dans une base vectorielle
+
+        Args:
+            documents (Iterable[Document]): Chunks à indexer, éventuellement sous forme
+                de couples (id, document) ; un générateur est consommé lot par lot
+            store_name (str): Nom de la base de connaissances
+            ids (Iterable[str]): Identifiants des chunks (optionnel)
+            append (bool): Ajoute à la base chargée au lieu d'en créer une nouvelle
+            total (int): Nombre total de chunks attendu, pour la progression
+            resume (bool): Reprend depuis le dernier point de reprise s'il existe
+
+        Returns:
+            Dict[str, Any]: Statistiques d'ingestion (chunks, quasi-doublons écartés,
+            lots, débit)
+        """
+        if total is None and hasattr(documents, "__len__"):
+            total = len(documents)
+
+        checkpoint = self._load_checkpoint(store_name) if resume else None
+        done_digests = checkpoint["batch_digests"] if checkpoint else []
+        if checkpoint and not self.manager.load_vector_store(
+            self._partial_store_name(store_name), mmap=False
+        ):
+            done_digests = []
+        if not done_digests and not append:
+            self.manager.vector_store = None
+            self.manager._on_store_replaced()
+
+        stats = {
+            "store_name": store_name,
+            "chunks": 0,
+            "chunks_resumed": 0,
+            "duplicates": 0,
+            "batches": 0,
+            "elapsed_seconds": 0.0,
+            "chunks_per_second": 0.0,
+            "total": total
+        }
+        batch_digests = []
+        start = time.time()
+        pending: deque = deque()
+
+        def report():
+            stats["elapsed_seconds"] = time.time() - start
+            embedded = stats["chunks"] - stats["chunks_resumed"]
+            if stats["elapsed_seconds"] > 0:
+                stats["chunks_per_second"] = embedded / stats["elapsed_seconds"]
+            if self.progress_callback:
+                self.progress_callback(dict(stats))
+
+        def drain(block_until: int):
+            # Insertion dans l'ordre des lots déjà calculés
+            while pending and (len(pending) > block_until or pending[0][1].done()):
+                batch, future = pending.popleft()
+                self._insert_batch(batch, future.result())
+                batch_digests.append(self._batch_digest(batch))
+                stats["chunks"] += len(batch)
+                stats["batches"] += 1
+                if stats["batches"] % self.checkpoint_every == 0:
+                    self._save_checkpoint(store_name, batch_digests, stats["chunks"])
+                report()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            try:
+                for batch in self._batches(documents, ids, stats):
+                    # Lots déjà ingérés lors d'une exécution précédente
+                    if len(batch_digests) < len(done_digests) and not pending:
+                        if self._batch_digest(batch) == done_digests[len(batch_digests)]:
+                            batch_digests.append(done_digests[len(batch_digests)])
+                            stats["chunks"] += len(batch)
+                            stats["chunks_resumed"] += len(batch)
+                            stats["batches"] += 1
+                            continue
+                        # Les données ont changé : reprise impossible
+                        raise ValueError(
+                            f"Le point de reprise de {store_name} ne correspond plus aux documents"
+                        )
+
+                    texts = [doc.page_content for _, doc in batch]
+                    future: Future = executor.submit(self._embed_with_backoff, texts)
+                    pending.append((batch, future))
+                    drain(block_until=self.max_concurrency)
+
+                drain(block_until=0)
+            except Exception:
+                for _, future in pending:
+                    future.cancel()
+                if stats["batches"]:
+                    self._save_checkpoint(store_name, batch_digests, stats["chunks"])
+                raise
+
+        if self.manager.vector_store is not None:
+            self.manager.save_vector_store(store_name)
+        self.clear_checkpoint(store_name)
+        report()
+        return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    """Point d'entrée en ligne de commande pour l'ingestion d'une base"""
+    parser = argparse.ArgumentParser(
+        description="Ingestion par lots de documents dans une base de connaissances"
+    )
+    parser.add_argument("paths", nargs="+", help="Fichiers ou dossiers à indexer")
+    parser.add_argument("--store", required=True, help="Nom de la base (ex: diagnostic_kb)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Ne traite que les fichiers ajoutés ou modifiés depuis la dernière indexation"
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Nombre de processus de parsing des fichiers (1 = séquentiel)"
+    )
+    parser.add_argument(
+        "--index-factory",
+        default=None,
+        help="Type d'index FAISS (ex: HNSW32, IVF1024,Flat, IVF1024,PQ64)"
+    )
+    parser.add_argument(
+        "--train-threshold",
+        type=int,
+        default=10_000,
+        help="Taille à partir de laquelle l'index approximatif est entraîné"
+    )
+    parser.add_argument(
+        "--vector-storage",
+        choices=["float32", "float16", "sq8"],
+        default=None,
+        help="Encodage des vecteurs de l'index (float16 : mémoire /2, sq8 : mémoire /4)"
+    )
+    parser.add_argument(
+        "--projection",
+        choices=["pca", "opq"],
+        default=None,
+        help="Projection apprise réduisant la dimension des vecteurs (voir app.utils.projection_tuner)"
+    )
+    parser.add_argument("--projected-dimension", type=int, default=None, help="Dimension après projection")
+    parser.add_argument(
+        "--embedding-backend",
+        default=None,
+        help="Backend d'embeddings : openai, hashing (CPU, hors ligne) ou local (sentence-transformers)"
+    )
+    parser.add_argument("--embedding-model", default=None, help="Modèle du backend d'embeddings")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore le point de reprise")
+    args = parser.parse_args(argv)
+
+    from app.utils.vector_store_manager import VectorStoreManager
+    manager = VectorStoreManager(
+        embedding_model=args.embedding_model,
+        embedding_backend=args.embedding_backend,
+        index_factory=args.index_factory,
+        train_threshold=args.train_threshold,
+        vector_storage=args.vector_storage,
+        projection=args.projection,
+        projected_dimension=args.projected_dimension
+    )
+
+    def print_progress(stats: Dict[str, Any]):
+        total = f"/{stats['total']}" if stats.get("total") else ""
+        print(
+            f"\r{stats['store_name']}: {stats['chunks']}{total} chunks "
+            f"({stats['chunks_per_second']:.1f} chunks/s)",
+            end="",
+            flush=True
+        )
+
+    pipeline_options = {
+        "batch_size": args.batch_size,
+        "max_concurrency": args.concurrency,
+        "progress_callback": print_progress
+    }
+
+    if args.incremental:
+        stats = manager.reindex_incremental(
+            args.paths,
+            args.store,
+            parse_workers=args.parse_workers,
+            **pipeline_options
+        )
+    else:
+        # Chargement en flux : la mémoire reste bornée par la taille des lots
+        documents = manager.iter_document_chunks(args.paths, parse_workers=args.parse_workers)
+        pipeline = IngestionPipeline(manager, **pipeline_options)
+        stats = pipeline.run(documents, args.store, resume=not args.no_resume)
+    print()
+    print(json.dumps(stats, indent=2))
+    
+    # Détail du parsing parallèle : fichiers lents ou en erreur
+    for report in manager.parse_report:
+        status = f"ERREUR: {report['error']}" if report["error"] else f"{report['chunks']} chunks"
+        print(f"{report['elapsed_seconds']:7.2f}s  {report['path']}  {status}")
+
+
+if __name__ == "__main__":
+    main()
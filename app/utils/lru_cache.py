@@ -0,0 +1,121 @@
+from typing import Any, Callable, Dict, Hashable, Optional
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Estime l'empreinte mémoire d'une valeur mise en cache (en octets)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + sys.getsizeof(value)
+    size = sys.getsizeof(value)
+    if _depth > 4:
+        return size
+    if isinstance(value, dict):
+        size += sum(
+            estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1)
+            for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _depth + 1) for item in value)
+    elif hasattr(value, "page_content"):
+        size += estimate_size(value.page_content, _depth + 1)
+        size += estimate_size(getattr(value, "metadata", {}), _depth + 1)
+    return size
+
+
+class LRUCache:
+    """Cache LRU en mémoire, borné en nombre d'entrées et en octets, sûr entre threads"""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retourne la valeur associée à la clé et la marque comme récemment utilisée"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        """Ajoute ou remplace une entrée, puis évince les plus anciennes si nécessaire"""
+        size = size if size is not None else estimate_size(value)
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self.memory_bytes -= self._sizes[key]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self.memory_bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self.memory_bytes > self.max_bytes)
+            ):
+                old_key, old_value = self._entries.popitem(last=False)
+                self.memory_bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+
+        if self.on_evict:
+            for old_key, old_value in evicted:
+                self.on_evict(old_key, old_value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Retire une entrée du cache"""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self.memory_bytes -= self._sizes.pop(key)
+            return self._entries.pop(key)
+
+    def clear(self):
+        """Vide le cache sans réinitialiser les compteurs"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.memory_bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques d'utilisation du cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_bytes": self.memory_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,113 @@
+from typing import Any, Dict, Iterable, List, Optional, Set
+import re
+from collections import defaultdict
+import numpy as np
+
+# Codes OBD-II (P0420, U0100...) et codes J1939 (SPN 3226 FMI 4)
+DTC_PATTERN = re.compile(r"\b[PBCU][0-9A-F]{4}\b", re.IGNORECASE)
+J1939_PATTERN = re.compile(r"\bSPN\s*(\d+)\s*FMI\s*(\d+)\b", re.IGNORECASE)
+
+# Champs indexés par valeur exacte (après normalisation)
+KEYWORD_FIELDS = ("make", "model", "diagnostic_id", "inspection_id", "plan_id")
+
+
+def extract_dtc_codes(text: str) -> Set[str]:
+    """Extrait les codes défaut d'un texte, sous une forme normalisée"""
+    codes = {code.upper() for code in DTC_PATTERN.findall(text)}
+    codes.update(f"SPN{spn}FMI{fmi}" for spn, fmi in J1939_PATTERN.findall(text))
+    return codes
+
+
+def normalize_dtc_code(code: str) -> str:
+    """Normalise un code DTC ("spn 3226 fmi 4" -> "SPN3226FMI4")"""
+    return re.sub(r"\s+", "", str(code)).upper()
+
+
+def _normalize_keyword(value: Any) -> str:
+    return " ".join(str(value).split()).lower()
+
+
+class MetadataIndex:
+    """
+    Index inversé des métadonnées (marque, modèle, année, codes DTC, identifiants)
+
+    Associe chaque valeur aux positions FAISS des documents qui la portent, afin
+    de restreindre l'ensemble des candidats avant le calcul des distances.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self.years: Dict[int, Set[int]] = defaultdict(set)
+        self.size = 0
+
+    def add(self, position: int, metadata: Dict[str, Any], text: str = ""):
+        """Indexe le document stocké à une position de l'index FAISS"""
+        metadata = metadata or {}
+        for field in KEYWORD_FIELDS:
+            value = metadata.get(field)
+            if value not in (None, ""):
+                self.postings[field][_normalize_keyword(value)].add(position)
+
+        year = metadata.get("year")
+        if year not in (None, ""):
+            try:
+                self.years[int(year)].add(position)
+            except (TypeError, ValueError):
+                pass
+
+        codes = {normalize_dtc_code(code) for code in metadata.get("dtc_codes") or []}
+        codes.update(extract_dtc_codes(text))
+        for code in codes:
+            self.postings["dtc_codes"][code].add(position)
+
+        self.size = max(self.size, position + 1)
+
+    @classmethod
+    def build(cls, documents: Iterable[Any]) -> "MetadataIndex":
+        """Construit l'index à partir des documents, dans l'ordre des positions"""
+        index = cls()
+        for position, doc in enumerate(documents):
+            index.add(position, doc.metadata, doc.page_content)
+        return index
+
+    def candidates(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Positions des documents satisfaisant tous les filtres (None si aucun filtre)
+
+        Filtres reconnus : make, model, diagnostic_id, inspection_id, plan_id,
+        year, year_min, year_max et dtc_codes (au moins un des codes).
+        """
+        sets: List[Set[int]] = []
+
+        for field in KEYWORD_FIELDS:
+            if filters.get(field) not in (None, ""):
+                sets.append(self.postings[field].get(_normalize_keyword(filters[field]), set()))
+
+        if filters.get("year") not in (None, ""):
+            sets.append(self.years.get(int(filters["year"]), set()))
+        if filters.get("year_min") is not None or filters.get("year_max") is not None:
+            year_min = filters.get("year_min")
+            year_max = filters.get("year_max")
+            matching = set()
+            for year, positions in self.years.items():
+                if (year_min is None or year >= year_min) and (year_max is None or year <= year_max):
+                    matching |= positions
+            sets.append(matching)
+
+        if filters.get("dtc_codes"):
+            matching = set()
+            for code in filters["dtc_codes"]:
+                matching |= self.postings["dtc_codes"].get(normalize_dtc_code(code), set())
+            sets.append(matching)
+
+        if not sets:
+            return None
+
+        # Intersection en partant du plus petit ensemble
+        sets.sort(key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+            if not result:
+                break
+        return np.fromiter(sorted(result), dtype=np.int64, count=len(result))
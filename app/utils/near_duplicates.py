@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional, Set, Tuple
+import os
+import zlib
+from collections import defaultdict
+from pathlib import Path
+import numpy as np
+
+from app.utils.bm25_index import tokenize
+
+# Nombre premier de Mersenne utilisé par les permutations (a * x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Séquences de `size` mots consécutifs d'un texte normalisé"""
+    tokens = tokenize(text)
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class NearDuplicateIndex:
+    """
+    Détection des quasi-doublons par MinHash et LSH
+
+    Chaque texte est résumé par une signature MinHash ; les signatures sont
+    découpées en bandes et seuls les textes partageant une bande sont comparés.
+    La similarité de Jaccard estimée doit atteindre le seuil pour conclure.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm doit être un multiple de bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = np.random.RandomState(seed)
+        # a, b < 2^31 et x < 2^32 : a * x + b tient dans un entier 64 bits non signé
+        self._a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+
+        self.signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [defaultdict(set) for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.signatures
+
+    def signature(self, text: str) -> np.ndarray:
+        """Calcule la signature MinHash d'un texte"""
+        text_shingles = shingles(text)
+        if not text_shingles:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in text_shingles),
+            dtype=np.uint64,
+            count=len(text_shingles)
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % np.uint64(MERSENNE_PRIME)
+        return (permuted & np.uint64(MAX_HASH)).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def find(self, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Retourne le document indexé le plus proche s'il dépasse le seuil de similarité"""
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates |= self._buckets[band].get(key, set())
+
+        best = None
+        for doc_id in candidates:
+            similarity = float(np.mean(self.signatures[doc_id] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (doc_id, similarity)
+        return best
+
+    def add(self, doc_id: str, signature: np.ndarray):
+        """Indexe la signature d'un document"""
+        self.signatures[doc_id] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].add(doc_id)
+
+    def remove(self, doc_id: str):
+        """Retire un document de l'index"""
+        signature = self.signatures.pop(doc_id, None)
+        if signature is None:
+            return
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def save(self, path: Path):
+        """
+        Sauvegarde les signatures (remplacement atomique)
+
+        Seuls num_perm et bands, qui définissent les signatures, sont enregistrés
+        avec elles : le seuil reste celui du gestionnaire qui charge l'index.
+        """
+        doc_ids = list(self.signatures)
+        matrix = (
+            np.stack([self.signatures[doc_id] for doc_id in doc_ids])
+            if doc_ids else np.zeros((0, self.num_perm), dtype=np.uint32)
+        )
+        tmp_path = Path(f"{path}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                ids=np.array(doc_ids, dtype=str),
+                signatures=matrix,
+                params=np.array([self.num_perm, self.bands])
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, threshold: float = 0.9) -> "NearDuplicateIndex":
+        """
+        Charge des signatures sauvegardées
+
+        Args:
+            path (Path): Fichier écrit par save
+            threshold (float): Seuil de similarité à appliquer (celui de l'appelant)
+        """
+        with np.load(path) as data:
+            # Fichiers antérieurs : (seuil, num_perm, bands), le seuil enregistré est ignoré
+            num_perm, bands = data["params"][-2:]
+            index = cls(threshold=threshold, num_perm=int(num_perm), bands=int(bands))
+            for doc_id, signature in zip(data["ids"], data["signatures"]):
+                index.add(str(doc_id), signature)
+        return index
@@ -0,0 +1,60 @@
+from typing import List, Optional
+import argparse
+import json
+
+
+def main(argv: Optional[List[str]] = None):
+    """Point d'entrée en ligne de commande : choix de la dimension de projection d'une base"""
+    parser = argparse.ArgumentParser(
+        description="Choisit la plus petite dimension PCA/OPQ gardant le rappel au-dessus d'une cible"
+    )
+    parser.add_argument("--store", required=True, help="Nom de la base (ex: diagnostic_kb)")
+    parser.add_argument(
+        "--queries-file",
+        required=True,
+        help="Requêtes de validation, une par ligne (absentes de la base)"
+    )
+    parser.add_argument("--dimensions", nargs="+", type=int, default=[64, 128, 256, 512])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--projection", choices=["pca", "opq"], default="pca")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--embedding-backend", default=None)
+    parser.add_argument("--embedding-model", default=None)
+    parser.add_argument("--json", action="store_true", help="Affiche le rapport complet en JSON au lieu du tableau")
+    args = parser.parse_args(argv)
+
+    with open(args.queries_file, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    from app.utils.vector_store_manager import VectorStoreManager
+    manager = VectorStoreManager(
+        embedding_backend=args.embedding_backend,
+        embedding_model=args.embedding_model
+    )
+    if not manager.load_vector_store(args.store):
+        parser.error(f"Base introuvable: {args.store}")
+
+    report = manager.select_projection_dimension(
+        queries,
+        dimensions=args.dimensions,
+        target_recall=args.target_recall,
+        projection=args.projection,
+        k=args.k
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for row in report["results"]:
+        print(f"{row['dimension']:>6}  rappel@{args.k} {row['recall']:.3f}  {row['bytes_per_vector']} octets/vecteur")
+    if report["dimension"] is None:
+        print(f"Aucune dimension n'atteint un rappel de {args.target_recall:.2f}")
+    else:
+        print(
+            f"Dimension retenue : {report['dimension']} "
+            f"(--projection {args.projection} --projected-dimension {report['dimension']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+from typing import Any, Dict, Optional
+from pathlib import Path
+import json
+import os
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+from app.utils.vector_store_registry import VectorStoreRegistry
+
+
+class ReindexCancelled(Exception):
+    """Levée dans le fil de réindexation lorsqu'une annulation est demandée"""
+
+
+class ReindexJobRunner:
+    """
+    Réindexation des bases de connaissances en arrière-plan
+
+    Une tâche réindexe les bases l'une après l'autre dans un thread démon, via
+    VectorStoreRegistry.rebuild (les sessions continuent de chercher dans la
+    version publiée). L'état de la tâche (progression et débit par base) est
+    enregistré sur disque : l'interface se contente de lire status(). Une
+    tâche annulée ou interrompue par un arrêt du processus reprend avec resume() :
+    les bases terminées sont ignorées et l'ingestion repart du dernier point de
+    reprise des autres.
+    """
+
+    ACTIVE_STATUSES = ("running", "cancelling")
+    JOB_LABELS = {
+        "running": "en cours",
+        "cancelling": "annulation en cours",
+        "completed": "terminée",
+        "cancelled": "annulée",
+        "failed": "échouée",
+        "interrupted": "interrompue"
+    }
+
+    def __init__(
+        self,
+        registry: Optional[VectorStoreRegistry] = None,
+        job_path: str = "data/vector_store/reindex_job.json",
+        save_interval: float = 1.0,
+        poll_interval: float = 2.0
+    ):
+        self.registry = registry or VectorStoreRegistry()
+        self.job_path = Path(job_path)
+        self.job_path.parent.mkdir(parents=True, exist_ok=True)
+        self.save_interval = save_interval
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._job: Optional[Dict[str, Any]] = None
+        self._last_saved = 0.0
+
+    def _load_job(self) -> Optional[Dict[str, Any]]:
+        if not self.job_path.exists():
+            return None
+        try:
+            with open(self.job_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Tâche de réindexation illisible: {str(e)}")
+            return None
+
+    def _save_job(self, force: bool = True):
+        """Enregistre l'état de la tâche de manière atomique (au plus une fois par intervalle)"""
+        now = time.time()
+        if not force and now - self._last_saved < self.save_interval:
+            return
+        self._job["updated_at"] = now
+        tmp_path = self.job_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._job, f, indent=2)
+        os.replace(tmp_path, self.job_path)
+        self._last_saved = now
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> Optional[Dict[str, Any]]:
+        """
+        État de la dernière tâche de réindexation
+
+        Returns:
+            Optional[Dict[str, Any]]: Statut global (running, cancelling, completed,
+            cancelled, failed ou interrupted) et, par base, statut, progression (0 à 1),
+            chunks indexés, débit et statistiques finales ; None si aucune tâche
+        """
+        with self._lock:
+            job = self._job if self._job is not None else self._load_job()
+            if job is None:
+                return None
+            job = json.loads(json.dumps(job))
+        # Tâche active d'un processus arrêté : elle ne progressera plus
+        if job["status"] in self.ACTIVE_STATUSES and not self.is_running():
+            job["status"] = "interrupted"
+        return job
+
+    def start(self, knowledge_bases: Dict[str, str], force_full: bool = False) -> Dict[str, Any]:
+        """
+        Lance une nouvelle tâche de réindexation en arrière-plan
+
+        Args:
+            knowledge_bases (Dict[str, str]): Nom de la base -> dossier source
+            force_full (bool): Ignore les manifestes et reconstruit toutes les bases
+
+        Returns:
+            Dict[str, Any]: État initial de la tâche (ou de la tâche déjà en cours)
+        """
+        with self._lock:
+            if self.is_running():
+                return self._job
+            self._job = {
+                "job_id": uuid.uuid4().hex,
+                "status": "running",
+                "force_full": force_full,
+                "created_at": time.time(),
+                "stores": {
+                    store_name: {
+                        "source_dir": source_dir,
+                        "status": "pending",
+                        "progress": 0.0,
+                        "chunks": 0,
+                        "chunks_per_second": 0.0
+                    }
+                    for store_name, source_dir in knowledge_bases.items()
+                }
+            }
+            self._launch()
+            return self._job
+
+    def resume(self) -> Optional[Dict[str, Any]]:
+        """
+        Reprend la dernière tâche annulée, échouée ou interrompue
+
+        Returns:
+            Optional[Dict[str, Any]]: État de la tâche reprise, None s'il n'y a rien à reprendre
+        """
+        job = self.status()
+        if job is None or job["status"] == "completed":
+            return None
+        with self._lock:
+            if self.is_running():
+                return self._job
+            job["status"] = "running"
+            job.pop("error", None)
+            for store in job["stores"].values():
+                if store["status"] != "completed":
+                    store["status"] = "pending"
+            self._job = job
+            self._launch()
+            return self._job
+
+    def cancel(self) -> bool:
+        """
+        Demande l'annulation de la tâche en cours
+
+        La base en cours s'arrête au prochain lot : son point de reprise est
+        enregistré et la version publiée reste inchangée.
+
+        Returns:
+            bool: True si une tâche était en cours
+        """
+        with self._lock:
+            if not self.is_running():
+                return False
+            self._cancel_event.set()
+            self._job["status"] = "cancelling"
+            self._save_job()
+            return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin de la tâche en cours ; True si aucune tâche ne tourne plus"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.is_running()
+
+    def _launch(self):
+        self._cancel_event.clear()
+        self._save_job()
+        self._thread = threading.Thread(target=self._run, name="reindex-job", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        job = self._job
+        try:
+            for store_name, store in job["stores"].items():
+                if store["status"] == "completed":
+                    continue
+                if self._cancel_event.is_set():
+                    raise ReindexCancelled()
+                self._reindex_store(store_name, store, job["force_full"])
+            final_status = "completed"
+        except ReindexCancelled:
+            final_status = "cancelled"
+        except Exception as e:
+            print(f"Erreur lors de la réindexation en arrière-plan: {str(e)}")
+            job["error"] = str(e)
+            final_status = "failed"
+        with self._lock:
+            job["status"] = final_status
+            job["finished_at"] = time.time()
+            self._save_job()
+
+    def _reindex_store(self, store_name: str, store: Dict[str, Any], force_full: bool):
+        """Réindexe une base en publiant sa progression dans l'état de la tâche"""
+        with self._lock:
+            store["status"] = "running"
+            store["progress"] = 0.0
+            store["started_at"] = time.time()
+            self._save_job()
+
+        def update_progress(ingest_stats: Dict[str, Any]):
+            files_total = ingest_stats.get("files_total") or 1
+            with self._lock:
+                store["progress"] = min(ingest_stats.get("files_done", 0) / files_total, 1.0)
+                store["chunks"] = ingest_stats["chunks"]
+                store["chunks_per_second"] = ingest_stats["chunks_per_second"]
+                self._save_job(force=False)
+            # Interrompt l'ingestion : le pipeline enregistre son point de reprise
+            if self._cancel_event.is_set():
+                raise ReindexCancelled()
+
+        def reindex(manager):
+            return manager.reindex_incremental(
+                [store["source_dir"]],
+                store_name,
+                force_full=force_full,
+                progress_callback=update_progress,
+                parse_workers=os.cpu_count()
+            )
+
+        try:
+            stats = self.registry.rebuild(store_name, reindex)
+        except ReindexCancelled:
+            with self._lock:
+                store["status"] = "cancelled"
+                self._save_job()
+            raise
+        except Exception as e:
+            with self._lock:
+                store["status"] = "failed"
+                store["error"] = str(e)
+                self._save_job()
+            raise
+
+        with self._lock:
+            store["status"] = "completed"
+            store["progress"] = 1.0
+            store["stats"] = stats
+            store["chunks_per_second"] = stats.get("chunks_per_second", store["chunks_per_second"])
+            store["finished_at"] = time.time()
+            self._save_job()
+
+    def show_status_panel(self, knowledge_bases: Dict[str, str], force_full: bool = False):
+        """
+        Affiche les commandes et l'état de la réindexation
+
+        Le panneau est un fragment rafraîchi périodiquement : seul l'état de la
+        tâche est relu, sans relancer le reste de la page.
+
+        Args:
+            knowledge_bases (Dict[str, str]): Nom de la base -> dossier source
+            force_full (bool): Reconstruction complète pour une nouvelle tâche
+        """
+        st.fragment(run_every=self.poll_interval)(self._render_status_panel)(knowledge_bases, force_full)
+
+    def _render_status_panel(self, knowledge_bases: Dict[str, str], force_full: bool):
+        col_start, col_cancel, col_resume = st.columns(3)
+        with col_start:
+            if st.button("Réindexer la Base de Connaissances", disabled=self.is_running()):
+                self.start(knowledge_bases, force_full=force_full)
+        with col_cancel:
+            if st.button("Annuler", disabled=not self.is_running()):
+                self.cancel()
+
+        job = self.status()
+        with col_resume:
+            resumable = job is not None and job["status"] in ("cancelled", "failed", "interrupted")
+            if st.button("Reprendre", disabled=not resumable):
+                self.resume()
+                job = self.status()
+
+        if job is None:
+            return
+
+        st.caption(f"Dernière réindexation : {self.JOB_LABELS.get(job['status'], job['status'])}")
+        for store_name, store in job["stores"].items():
+            st.progress(
+                store["progress"],
+                text=f"{store_name} : {store['status']} - {store['chunks']} chunks "
+                     f"({store['chunks_per_second']:.1f} chunks/s)"
+            )
+            if "stats" in store:
+                stats = store["stats"]
+                st.write(
+                    f"**{store_name}** : {stats['added']} ajoutés, "
+                    f"{stats['modified']} modifiés, {stats['removed']} supprimés, "
+                    f"{stats['unchanged']} inchangés ({stats['chunks_added']} chunks indexés, "
+                    f"{stats.get('duplicates', 0)} quasi-doublons fusionnés)"
+                )
+            if "error" in store:
+                st.error(f"{store_name} : {store['error']}")
+
+        if job["status"] == "completed":
+            # Efficacité du cache d'embeddings
+            vector_store = self.registry.acquire(list(job["stores"])[-1])
+            cache_stats = vector_store.get_embedding_cache_stats()
+            vector_store.release()
+            st.caption(
+                f"Cache d'embeddings : {cache_stats['hits']} réutilisés, "
+                f"{cache_stats['misses']} calculés "
+                f"({cache_stats['hit_rate']:.0%} de succès)"
+            )
@@ -0,0 +1,327 @@
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.utils.lru_cache import estimate_size
+
+# Vocabulaire du corpus synthétique de rapports de diagnostic poids lourds
+MAKES = {
+    "Volvo": ["VNL", "VNR", "FH16"],
+    "Kenworth": ["T680", "W900", "T880"],
+    "Peterbilt": ["579", "389", "567"],
+    "Freightliner": ["Cascadia", "M2 106", "Coronado"],
+    "Mack": ["Anthem", "Granite", "Pinnacle"],
+    "International": ["LT", "HX", "MV"]
+}
+FAULTS = [
+    ("P0299", "perte de puissance à l'accélération", "turbocompresseur en sous-suralimentation",
+     "contrôler la durite d'admission et le jeu axial du turbo"),
+    ("P0401", "fumée noire et ralenti instable", "débit EGR insuffisant",
+     "nettoyer la vanne EGR et vérifier le refroidisseur EGR"),
+    ("P2463", "régénérations fréquentes du filtre", "filtre à particules colmaté",
+     "lancer une régénération forcée et contrôler le capteur de pression différentielle"),
+    ("P20EE", "voyant moteur et limitation de couple", "rendement du catalyseur SCR insuffisant",
+     "vérifier la qualité de l'AdBlue et l'injecteur de DEF"),
+    ("SPN 3226 FMI 4", "alerte NOx en sortie", "capteur NOx aval défaillant",
+     "remplacer le capteur NOx et effacer les codes"),
+    ("P0087", "calage moteur à chaud", "pression de rampe trop basse",
+     "remplacer le filtre à carburant et tester la pompe haute pression"),
+    ("P0217", "montée en température du moteur", "surchauffe du liquide de refroidissement",
+     "contrôler le thermostat, la pompe à eau et le ventilateur visco"),
+    ("C0035", "freinage dissymétrique", "capteur de vitesse de roue avant gauche hors service",
+     "nettoyer la couronne ABS et remplacer le capteur"),
+    ("U0100", "tableau de bord sans information moteur", "perte de communication avec l'ECM",
+     "vérifier le réseau CAN et les connecteurs de l'ECM"),
+    ("P0562", "démarrage difficile le matin", "tension batterie trop basse",
+     "tester l'alternateur et les batteries, nettoyer les cosses")
+]
+CONTEXTS = [
+    "Le chauffeur signale le problème après un long trajet autoroutier.",
+    "Le véhicule est utilisé en distribution urbaine avec de nombreux arrêts.",
+    "Défaut apparu par temps froid, moteur encore en phase de chauffe.",
+    "Le camion tractait une remorque chargée en montée.",
+    "Intervention réalisée à l'atelier après dépannage sur le bord de la route."
+]
+CHECKS = [
+    "Lecture des codes avec l'outil de diagnostic constructeur.",
+    "Essai routier en charge avec enregistrement des paramètres moteur.",
+    "Contrôle visuel des faisceaux et des connecteurs.",
+    "Mesure des pressions et comparaison aux valeurs de référence.",
+    "Historique d'entretien consulté : vidange et filtres à jour."
+]
+
+
+def _fault_report(rng: random.Random) -> Dict[str, Any]:
+    make = rng.choice(list(MAKES))
+    model = rng.choice(MAKES[make])
+    year = rng.randint(2012, 2024)
+    code, symptom, cause, action = rng.choice(FAULTS)
+    return {"make": make, "model": model, "year": year, "code": code,
+            "symptom": symptom, "cause": cause, "action": action}
+
+
+def generate_corpus(num_reports: int, seed: int = 0) -> List[Document]:
+    """
+    Génère des rapports de diagnostic synthétiques (marque, modèle, symptômes, codes)
+
+    Les rapports combinent des pannes, contextes et contrôles tirés au hasard :
+    le corpus est reproductible pour une même graine.
+    """
+    rng = random.Random(seed)
+    documents = []
+    for i in range(num_reports):
+        fault = _fault_report(rng)
+        mileage = rng.randint(50, 900) * 1000
+        text = (
+            f"Rapport {i}. Véhicule: {fault['make']} {fault['model']} {fault['year']}, "
+            f"{mileage} km. Symptômes: {fault['symptom']}. Codes DTC: {fault['code']}. "
+            f"{' '.join(rng.sample(CONTEXTS, 2))} {' '.join(rng.sample(CHECKS, 3))} "
+            f"Diagnostic: {fault['cause']}. Recommandations: {fault['action']}. "
+            f"Temps d'intervention estimé: {rng.randint(1, 8)} heures."
+        )
+        documents.append(Document(
+            page_content=text,
+            metadata={"source": f"rapport_{i}.txt", "make": fault["make"],
+                      "model": fault["model"], "year": fault["year"]}
+        ))
+    return documents
+
+
+def generate_queries(num_queries: int, seed: int = 1) -> List[str]:
+    """Génère des requêtes de technicien, distinctes des rapports du corpus"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        fault = _fault_report(rng)
+        queries.append(
+            f"{fault['make']} {fault['model']} {fault['year']} {fault['symptom']} code {fault['code']}"
+        )
+    return queries
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    return float(np.percentile(values, percentile)) if values else 0.0
+
+
+def benchmark_configuration(
+    corpus: List[Document],
+    queries: List[str],
+    index_factory: str,
+    chunk_size: int,
+    embedding_backend: str = "hashing",
+    embedding_model: str = None,
+    k: int = 10,
+    nprobe: int = None,
+    ef_search: int = None,
+    workdir: str = None
+) -> Dict[str, Any]:
+    """
+    Construit une base pour une configuration et mesure ses performances
+
+    Les caches de requêtes et de résultats sont désactivés : chaque recherche
+    mesurée calcule l'embedding de la requête et interroge l'index. La base et
+    le cache d'embeddings sont écrits dans workdir (dossier temporaire par défaut).
+
+    Returns:
+        Dict[str, Any]: Temps de construction, mémoire, latences p50/p99 (ms) et
+        rappel@k par rapport à une recherche exacte sur les mêmes vecteurs
+    """
+    from app.utils.embedding_cache import EmbeddingCache
+    from app.utils.vector_store_manager import VectorStoreManager
+
+    if workdir is None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            return benchmark_configuration(
+                corpus, queries, index_factory, chunk_size,
+                embedding_backend=embedding_backend,
+                embedding_model=embedding_model,
+                k=k,
+                nprobe=nprobe,
+                ef_search=ef_search,
+                workdir=tmp_dir
+            )
+
+    workdir = Path(workdir)
+    manager = VectorStoreManager(
+        embedding_backend=embedding_backend,
+        embedding_model=embedding_model,
+        embedding_cache=EmbeddingCache(cache_path=str(workdir / "embeddings.sqlite")),
+        index_factory=index_factory,
+        train_threshold=0,
+        dedup_threshold=None,
+        query_cache_size=0,
+        spill_queries_to_disk=False,
+        result_cache_size=0,
+        vector_store_path=str(workdir / "vector_store")
+    )
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_size // 5)
+    chunks = splitter.split_documents(corpus)
+
+    start = time.perf_counter()
+    if not manager.create_vector_store(chunks, "benchmark_kb"):
+        raise RuntimeError(f"Construction impossible pour {index_factory} (chunks de {chunk_size})")
+    build_seconds = time.perf_counter() - start
+    store = manager.vector_store
+
+    # Vérité terrain : recherche exacte sur les embeddings des chunks indexés
+    texts = [
+        store.docstore.search(store.index_to_docstore_id[position]).page_content
+        for position in range(store.index.ntotal)
+    ]
+    vectors = np.array(manager.embeddings.embed_documents(texts), dtype=np.float32)
+    exact = faiss.IndexFlatL2(store.index.d)
+    exact.add(vectors)
+    query_vectors = np.array(manager.embeddings.embed_queries(queries), dtype=np.float32)
+    top = min(k, exact.ntotal)
+    expected, _ = exact.search(query_vectors, top)
+    found = manager._search_by_vectors(
+        query_vectors, top, nprobe=nprobe, ef_search=ef_search, return_positions=True
+    )
+    # Rappel tolérant aux ex-aequo : un résultat compte s'il est (réellement) au
+    # moins aussi proche que le k-ième voisin exact
+    hits = []
+    for query_vector, expected_row, found_row in zip(query_vectors, expected, found):
+        positions = np.array([position for position, _ in found_row], dtype=np.int64)
+        distances = ((vectors[positions] - query_vector) ** 2).sum(axis=1) if len(positions) else np.zeros(0)
+        hits.append(np.count_nonzero(distances <= expected_row[-1] + 1e-5) / top)
+    recall = float(np.mean(hits))
+
+    # Latence de bout en bout (embedding de la requête compris), sans cache de requêtes ni de résultats
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        manager.similarity_search(query, k=k, nprobe=nprobe, ef_search=ef_search)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "embedding_backend": manager.embedding_backend,
+        "embedding_model": manager.embedding_model,
+        "index_factory": index_factory,
+        # Un index approximatif reste exact tant que le corpus est trop petit pour l'entraîner
+        "index_type": type(faiss.downcast_index(store.index)).__name__,
+        "chunk_size": chunk_size,
+        "chunks": store.index.ntotal,
+        "build_seconds": round(build_seconds, 3),
+        "index_bytes": faiss.serialize_index(store.index).nbytes,
+        "docstore_bytes": sum(estimate_size(doc) for doc in store.docstore._dict.values()),
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        f"recall@{k}": round(recall, 4)
+    }
+
+
+def run_benchmark(
+    corpus_size: int = 2000,
+    num_queries: int = 200,
+    index_factories: List[str] = ("Flat", "HNSW32", "IVF64,Flat"),
+    chunk_sizes: List[int] = (1000,),
+    embedding_backends: List[str] = ("hashing",),
+    embedding_model: str = None,
+    k: int = 10,
+    nprobe: int = None,
+    ef_search: int = None,
+    seed: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Mesure chaque combinaison backend x taille de chunk x type d'index
+
+    Les bases sont construites dans un dossier temporaire : les données de
+    l'application ne sont pas modifiées.
+    """
+    corpus = generate_corpus(corpus_size, seed=seed)
+    queries = generate_queries(num_queries, seed=seed + 1)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in embedding_backends:
+            for chunk_size in chunk_sizes:
+                for index_factory in index_factories:
+                    results.append(benchmark_configuration(
+                        corpus,
+                        queries,
+                        index_factory,
+                        chunk_size,
+                        embedding_backend=backend,
+                        embedding_model=embedding_model,
+                        k=k,
+                        nprobe=nprobe,
+                        ef_search=ef_search,
+                        workdir=workdir
+                    ))
+    return results
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    """Met en forme les résultats en tableau texte"""
+    if not results:
+        return ""
+    recall_key = next(key for key in results[0] if key.startswith("recall@"))
+    lines = [
+        f"{'backend':<10} {'index':<14} {'type':<24} {'chunk':>6} {'chunks':>7} "
+        f"{'build s':>8} {'index Mo':>9} {'p50 ms':>8} {'p99 ms':>8} {recall_key:>10}"
+    ]
+    for row in results:
+        lines.append(
+            f"{row['embedding_backend']:<10} {row['index_factory']:<14} {row['index_type']:<24} "
+            f"{row['chunk_size']:>6} {row['chunks']:>7} {row['build_seconds']:>8.2f} "
+            f"{row['index_bytes'] / 1e6:>9.2f} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+            f"{row[recall_key]:>10.3f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Point d'entrée en ligne de commande du banc d'essai de recherche"""
+    parser = argparse.ArgumentParser(
+        description="Banc d'essai hors ligne : rappel@k et latence selon la configuration d'index"
+    )
+    parser.add_argument("--corpus-size", type=int, default=2000, help="Nombre de rapports synthétiques")
+    parser.add_argument("--queries", type=int, default=200, help="Nombre de requêtes mesurées")
+    parser.add_argument(
+        "--index-factories",
+        nargs="+",
+        default=["Flat", "HNSW32", "IVF64,Flat"],
+        help="Types d'index FAISS comparés"
+    )
+    parser.add_argument("--chunk-sizes", nargs="+", type=int, default=[1000])
+    parser.add_argument(
+        "--embedding-backends",
+        nargs="+",
+        default=["hashing"],
+        help="Backends d'embeddings comparés (hashing et local fonctionnent hors ligne)"
+    )
+    parser.add_argument("--embedding-model", default=None, help="Modèle du backend d'embeddings")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=None)
+    parser.add_argument("--ef-search", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Fichier JSON où enregistrer les résultats")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        corpus_size=args.corpus_size,
+        num_queries=args.queries,
+        index_factories=args.index_factories,
+        chunk_sizes=args.chunk_sizes,
+        embedding_backends=args.embedding_backends,
+        embedding_model=args.embedding_model,
+        k=args.k,
+        nprobe=args.nprobe,
+        ef_search=args.ef_search,
+        seed=args.seed
+    )
+    print(format_report(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
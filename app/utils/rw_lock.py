@@ -0,0 +1,67 @@
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    Verrou lecteurs/rédacteur : lectures concurrentes, écritures exclusives
+
+    Les rédacteurs en attente sont prioritaires sur les nouveaux lecteurs, et un
+    rédacteur peut reprendre le verrou (en lecture ou en écriture) sans se bloquer.
+    Un lecteur peut reprendre le verrou en lecture (recherches imbriquées dans
+    reading()) sans attendre les rédacteurs : il les bloquerait lui-même.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+        # Nombre de lectures imbriquées tenues par le thread courant
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        depth = getattr(self._local, "read_depth", 0)
+        with self._condition:
+            owned = self._writer == me
+            if not owned:
+                if not depth:
+                    while self._writer is not None or self._writers_waiting:
+                        self._condition.wait()
+                    self._readers += 1
+                self._local.read_depth = depth + 1
+        try:
+            yield
+        finally:
+            if not owned:
+                with self._condition:
+                    self._local.read_depth -= 1
+                    if not self._local.read_depth:
+                        self._readers -= 1
+                        if not self._readers:
+                            self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._write_depth += 1
+            else:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+                self._writers_waiting -= 1
+                self._writer = me
+                self._write_depth = 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._condition.notify_all()
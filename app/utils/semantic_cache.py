@@ -0,0 +1,267 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import copy
+import threading
+import time
+import unicodedata
+import uuid
+from collections import deque
+import numpy as np
+
+from app.utils.lru_cache import LRUCache
+
+
+def _normalize_text(text: Any) -> str:
+    """Minuscules, sans accents ni espaces superflus"""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.split())
+
+
+class SemanticCache:
+    """
+    Cache sémantique des diagnostics
+
+    Deux demandes formulées différemment (« perte de puissance en côte » /
+    « manque de puissance en montée ») sur le même profil de véhicule
+    (marque, modèle, année) et avec les mêmes codes DTC partagent le même
+    résultat si les embeddings des demandes normalisées sont assez proches.
+    Le cache est borné (LRU) et ses entrées expirent ; les réponses signalées
+    comme inadaptées sont comptées comme faux positifs pour régler le seuil.
+    """
+
+    def __init__(
+        self,
+        embed_query: Callable[[str], List[float]],
+        threshold: float = 0.92,
+        max_entries: int = 512,
+        max_age_seconds: Optional[float] = 24 * 3600,
+        history_size: int = 200
+    ):
+        """
+        Args:
+            embed_query (Callable): Calcule l'embedding d'une demande normalisée
+            threshold (float): Similarité cosinus minimale pour réutiliser un résultat
+            max_entries (int): Nombre maximal de résultats gardés en cache
+            max_age_seconds (float): Âge au-delà duquel un résultat n'est plus servi
+                (None : pas d'expiration)
+            history_size (int): Nombre de similarités conservées pour les statistiques
+        """
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Seuil de similarité invalide: {threshold}")
+        self.embed_query = embed_query
+        self.threshold = threshold
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.Lock()
+        # Entrées par identifiant ; l'index par profil suit les évictions du LRU
+        self._profiles: Dict[Tuple, Dict[str, np.ndarray]] = {}
+        self._entries = LRUCache(max_entries=max_entries, on_evict=self._forget)
+
+        self.hits = 0
+        self.misses = 0
+        self.false_hits = 0
+        self.expired = 0
+        self._hit_similarities: deque = deque(maxlen=history_size)
+        self._false_hit_similarities: deque = deque(maxlen=history_size)
+
+    @staticmethod
+    def normalize_request(
+        vehicle_data: Dict[str, Any],
+        symptoms: List[str],
+        dtc_codes: List[str]
+    ) -> Tuple[Tuple, str]:
+        """
+        Normalise une demande de diagnostic
+
+        Returns:
+            Tuple[Tuple, str]: Profil (marque, modèle, année, codes DTC triés),
+            comparé à l'identique, et texte de la demande à comparer sémantiquement
+        """
+        codes = tuple(sorted({code.strip().upper() for code in dtc_codes if code.strip()}))
+        profile = (
+            _normalize_text(vehicle_data.get("make", "")),
+            _normalize_text(vehicle_data.get("model", "")),
+            str(vehicle_data.get("year", "")),
+            codes
+        )
+        normalized_symptoms = sorted(_normalize_text(symptom) for symptom in symptoms if symptom.strip())
+        text = (
+            f"vehicule: {profile[0]} {profile[1]} {profile[2]} | "
+            f"symptomes: {'; '.join(normalized_symptoms)} | "
+            f"codes dtc: {', '.join(codes)}"
+        )
+        return profile, text
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed_query(text), dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _forget(self, entry_id: str, entry: Dict[str, Any]):
+        """Retire une entrée évincée de l'index par profil"""
+        with self._lock:
+            vectors = self._profiles.get(entry["profile"])
+            if vectors is not None:
+                vectors.pop(entry_id, None)
+                if not vectors:
+                    del self._profiles[entry["profile"]]
+
+    def _remove(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.pop(entry_id)
+        if entry is not None:
+            self._forget(entry_id, entry)
+        return entry
+
+    def lookup(
+        self,
+        vehicle_data: Dict[str, Any],
+        symptoms: List[str],
+        dtc_codes: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Cherche le résultat d'une demande similaire pour le même profil
+
+        Returns:
+            Optional[Dict[str, Any]]: Copie du résultat en cache, complétée d'une clé
+            "semantic_cache" (entry_id, similarity, age_seconds) ; None si aucune
+            demande assez proche
+        """
+        profile, text = self.normalize_request(vehicle_data, symptoms, dtc_codes)
+        with self._lock:
+            candidates = dict(self._profiles.get(profile, {}))
+        if not candidates:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        query = self._embed(text)
+        entry_ids = list(candidates)
+        similarities = np.stack([candidates[entry_id] for entry_id in entry_ids]) @ query
+        now = time.time()
+
+        for position in np.argsort(-similarities):
+            similarity = float(similarities[position])
+            if similarity < self.threshold:
+                break
+            entry_id = entry_ids[position]
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                continue
+            age = now - entry["created_at"]
+            if self.max_age_seconds is not None and age > self.max_age_seconds:
+                self._remove(entry_id)
+                with self._lock:
+                    self.expired += 1
+                continue
+
+            with self._lock:
+                self.hits += 1
+                self._hit_similarities.append(similarity)
+            result = copy.deepcopy(entry["result"])
+            result["semantic_cache"] = {
+                "entry_id": entry_id,
+                "similarity": similarity,
+                "age_seconds": age,
+                "cached_at": entry["created_at"]
+            }
+            return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(
+        self,
+        vehicle_data: Dict[str, Any],
+        symptoms: List[str],
+        dtc_codes: List[str],
+        result: Dict[str, Any]
+    ) -> str:
+        """
+        Met en cache le résultat d'une demande
+
+        Returns:
+            str: Identifiant de l'entrée
+        """
+        profile, text = self.normalize_request(vehicle_data, symptoms, dtc_codes)
+        vector = self._embed(text)
+        entry_id = uuid.uuid4().hex
+        entry = {
+            "profile": profile,
+            "request": text,
+            "result": copy.deepcopy(result),
+            "created_at": time.time()
+        }
+        with self._lock:
+            self._profiles.setdefault(profile, {})[entry_id] = vector
+        self._entries.put(entry_id, entry)
+        return entry_id
+
+    def report_false_hit(self, entry_id: str, similarity: Optional[float] = None) -> bool:
+        """
+        Signale qu'un résultat servi depuis le cache ne correspondait pas à la demande
+
+        L'entrée est retirée du cache : la demande suivante est recalculée.
+
+        Args:
+            entry_id (str): Identifiant de l'entrée (clé "semantic_cache" du résultat)
+            similarity (float): Similarité du résultat servi, pour les statistiques
+
+        Returns:
+            bool: True si l'entrée était encore en cache
+        """
+        with self._lock:
+            self.false_hits += 1
+            if similarity is not None:
+                self._false_hit_similarities.append(similarity)
+        return self._remove(entry_id) is not None
+
+    def invalidate_profile(self, vehicle_data: Dict[str, Any]) -> int:
+        """
+        Retire les résultats d'un véhicule (ex: nouveau cas validé dans la base)
+
+        Returns:
+            int: Nombre d'entrées retirées
+        """
+        make, model, year, _ = self.normalize_request(vehicle_data, [], [])[0]
+        with self._lock:
+            entry_ids = [
+                entry_id
+                for profile, vectors in self._profiles.items()
+                if profile[:3] == (make, model, year)
+                for entry_id in vectors
+            ]
+        for entry_id in entry_ids:
+            self._remove(entry_id)
+        return len(entry_ids)
+
+    def clear(self):
+        """Vide le cache sans réinitialiser les compteurs"""
+        self._entries.clear()
+        with self._lock:
+            self._profiles.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Statistiques du cache sémantique
+
+        Returns:
+            Dict[str, Any]: Entrées, succès, échecs, faux positifs signalés, taux
+            associés et similarités observées (la plus faible similarité servie, la
+            plus forte similarité d'un faux positif) pour ajuster le seuil
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "false_hits": self.false_hits,
+                "expired": self.expired,
+                "evictions": self._entries.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "false_hit_rate": self.false_hits / self.hits if self.hits else 0.0,
+                "min_hit_similarity": min(self._hit_similarities, default=None),
+                "max_false_hit_similarity": max(self._false_hit_similarities, default=None)
+            }
@@ -0,0 +1,383 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+
+from app.utils.ingestion_pipeline import IngestionPipeline
+from app.utils.vector_store_manager import VectorStoreManager
+
+# Shard des documents sans valeur pour la clé de routage
+DEFAULT_SHARD = "autres"
+
+# Clés de routage : marque, atelier ou hachage de la source
+SHARD_KEYS = ("make", "shop", "hash")
+
+
+class ShardedVectorStoreManager:
+    """
+    Base vectorielle découpée en shards (par marque, par atelier ou par hachage)
+
+    Chaque shard est une base VectorStoreManager persistée et chargée
+    indépendamment (data/vector_store/{base}/shards/{shard}/). Une recherche
+    n'interroge que les shards compatibles avec ses filtres, en parallèle, puis
+    fusionne les top-k. Seuls les shards récemment utilisés restent en mémoire.
+
+    Bibliothèque seule pour l'instant : le registre, les flows et l'interface
+    servent des bases non shardées ; une base shardée se construit et s'interroge
+    directement avec cette classe.
+    """
+
+    def __init__(
+        self,
+        shard_by: str = "make",
+        num_hash_shards: int = 8,
+        max_resident_shards: int = 4,
+        max_workers: int = None,
+        **manager_options
+    ):
+        """
+        Args:
+            shard_by (str): "make", "shop" ou "hash" (hachage de la source du document)
+            num_hash_shards (int): Nombre de shards en mode "hash"
+            max_resident_shards (int): Nombre maximal de shards gardés en mémoire
+            max_workers (int): Threads de recherche parallèle (par défaut, un par shard résident)
+            **manager_options: Options transmises au VectorStoreManager de chaque shard
+        """
+        if shard_by not in SHARD_KEYS:
+            raise ValueError(f"Clé de routage inconnue: {shard_by} (disponibles: {', '.join(SHARD_KEYS)})")
+        self.shard_by = shard_by
+        self.num_hash_shards = num_hash_shards
+        self.max_resident_shards = max(1, max_resident_shards)
+        self.max_workers = max_workers or self.max_resident_shards
+        self.manager_options = manager_options
+
+        # Gestionnaire racine : fournit les embeddings et le cache partagés par les shards
+        self._root = VectorStoreManager(**manager_options)
+        self.embeddings = self._root.embeddings
+        self.embedding_cache = self._root.embedding_cache
+        self.vector_store_path = self._root.vector_store_path
+
+        self.store_name = None
+        # Shard -> nombre de documents, persisté dans shards.json
+        self.shards: Dict[str, int] = {}
+        self._resident: "OrderedDict[str, VectorStoreManager]" = OrderedDict()
+        self._dirty_shards = set()
+        self._lock = threading.RLock()
+
+    def route(self, doc: Document) -> str:
+        """Shard d'un document selon la clé de routage"""
+        metadata = doc.metadata or {}
+        if self.shard_by == "hash":
+            key = str(metadata.get("source") or doc.page_content)
+            return f"h{zlib.crc32(key.encode('utf-8')) % self.num_hash_shards:02d}"
+        return self._shard_name(metadata.get(self.shard_by))
+
+    @staticmethod
+    def _shard_name(value: Any) -> str:
+        if value in (None, ""):
+            return DEFAULT_SHARD
+        return re.sub(r"[^a-z0-9]+", "-", str(value).lower()).strip("-") or DEFAULT_SHARD
+
+    def _shard_store(self, shard: str) -> str:
+        return f"{self.store_name}/shards/{shard}"
+
+    def _shards_path(self):
+        return self.vector_store_path / self.store_name / "shards.json"
+
+    def _shards_for(self, filters: Dict[str, Any] = None) -> List[str]:
+        """Shards pouvant contenir des documents satisfaisant les filtres"""
+        if self.shard_by != "hash" and filters and filters.get(self.shard_by) not in (None, ""):
+            shard = self._shard_name(filters[self.shard_by])
+            return [shard] if shard in self.shards else []
+        return sorted(self.shards)
+
+    def _get_shard(self, shard: str, create: bool = False) -> Optional[VectorStoreManager]:
+        """Gestionnaire d'un shard, chargé à la demande (le moins récemment utilisé est libéré)"""
+        with self._lock:
+            manager = self._resident.get(shard)
+            if manager is not None:
+                self._resident.move_to_end(shard)
+                return manager
+            if shard not in self.shards and not create:
+                return None
+
+            manager = VectorStoreManager(**{
+                **self.manager_options,
+                "embeddings": self.embeddings,
+                "embedding_cache": self.embedding_cache
+            })
+            manager.load_vector_store(self._shard_store(shard))
+            manager.store_name = self._shard_store(shard)
+            self._resident[shard] = manager
+            self._evict(keep=shard)
+            return manager
+
+    def _evict(self, keep: str = None):
+        """
+        Libère les shards les moins récemment utilisés au-delà de max_resident_shards
+
+        Les shards modifiés restent en mémoire jusqu'à save_vector_store : une
+        recherche n'écrit jamais sur disque.
+
+        Args:
+            keep (str): Shard qui vient d'être chargé, jamais libéré
+        """
+        evictable = [
+            shard for shard in self._resident
+            if shard not in self._dirty_shards and shard != keep
+        ]
+        excess = len(self._resident) - self.max_resident_shards
+        for shard in evictable[:max(excess, 0)]:
+            del self._resident[shard]
+
+    def resident_shards(self) -> List[str]:
+        """Shards actuellement en mémoire, du moins au plus récemment utilisé"""
+        with self._lock:
+            return list(self._resident)
+
+    def _group(self, documents: List[Document]) -> Dict[str, List[Document]]:
+        groups = defaultdict(list)
+        for doc in documents:
+            groups[self.route(doc)].append(doc)
+        return groups
+
+    def create_vector_store(
+        self,
+        documents: Iterable[Document],
+        store_name: str,
+        progress_callback: Callable[[Dict[str, Any]], None] = None,
+        flush_size: int = 1024,
+        **pipeline_options
+    ) -> bool:
+        """
+        Crée une base shardée : chaque shard est construit et sauvegardé séparément
+
+        Les documents (liste ou générateur, voir iter_document_chunks) sont routés
+        au fil de l'eau : chaque shard accumule au plus flush_size documents avant
+        d'être ingéré, la mémoire ne dépend donc pas de la taille du corpus.
+
+        Args:
+            documents (Iterable[Document]): Chunks à indexer
+            store_name (str): Nom de la base de connaissances
+            progress_callback (Callable): Reçoit les statistiques d'ingestion de chaque lot
+            flush_size (int): Nombre de documents accumulés par shard avant ingestion
+            **pipeline_options: Options de l'IngestionPipeline (batch_size, max_concurrency...)
+        """
+        try:
+            with self._lock:
+                self.delete_vector_store(store_name)
+                self.store_name = store_name
+                buffers = defaultdict(list)
+                for doc in documents:
+                    shard = self.route(doc)
+                    buffers[shard].append(doc)
+                    if len(buffers[shard]) >= flush_size:
+                        self._ingest(shard, buffers.pop(shard), progress_callback, pipeline_options)
+                for shard, shard_docs in sorted(buffers.items()):
+                    self._ingest(shard, shard_docs, progress_callback, pipeline_options)
+                self._save_shards()
+                return bool(self.shards)
+        except Exception as e:
+            print(f"Erreur lors de la création de la base shardée {store_name}: {str(e)}")
+            return False
+
+    def _ingest(
+        self,
+        shard: str,
+        documents: List[Document],
+        progress_callback: Callable[[Dict[str, Any]], None],
+        pipeline_options: Dict[str, Any]
+    ):
+        """Ajoute un lot de documents à un shard puis le sauvegarde"""
+        manager = self._get_shard(shard, create=True)
+        pipeline = IngestionPipeline(manager, progress_callback=progress_callback, **pipeline_options)
+        pipeline.run(documents, self._shard_store(shard), append=True, resume=False)
+        if manager.vector_store is not None:
+            self.shards[shard] = manager.vector_store.index.ntotal
+
+    def load_vector_store(self, store_name: str) -> bool:
+        """Charge la liste des shards ; les shards eux-mêmes sont chargés à la première requête"""
+        with self._lock:
+            self.store_name = store_name
+            self.shards = {}
+            self._resident.clear()
+            self._dirty_shards.clear()
+            shards_path = self._shards_path()
+            if not shards_path.exists():
+                return False
+            try:
+                with open(shards_path, "r") as f:
+                    config = json.load(f)
+                if (config["shard_by"], config.get("num_hash_shards")) != (self.shard_by, self.num_hash_shards):
+                    raise ValueError(
+                        f"Base shardée par {config['shard_by']} "
+                        f"({config.get('num_hash_shards')} shards de hachage), "
+                        f"gestionnaire configuré par {self.shard_by} ({self.num_hash_shards})"
+                    )
+                self.shards = config["shards"]
+                return True
+            except ValueError:
+                raise
+            except Exception as e:
+                print(f"Erreur lors du chargement de la base shardée {store_name}: {str(e)}")
+                return False
+
+    def _save_shards(self):
+        """Sauvegarde la liste des shards (remplacement atomique)"""
+        shards_path = self._shards_path()
+        shards_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = shards_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "shard_by": self.shard_by,
+                "num_hash_shards": self.num_hash_shards,
+                "shards": self.shards
+            }, f, indent=2)
+        os.replace(tmp_path, shards_path)
+
+    def save_vector_store(self, store_name: str = None):
+        """Sauvegarde les shards modifiés et la liste des shards"""
+        with self._lock:
+            self.store_name = store_name or self.store_name
+            for shard in sorted(self._dirty_shards):
+                manager = self._resident.get(shard)
+                if manager is not None:
+                    manager.save_vector_store(self._shard_store(shard))
+            self._dirty_shards.clear()
+            self._save_shards()
+            # Les shards modifiés peuvent maintenant être libérés
+            self._evict()
+
+    def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]] = None) -> bool:
+        """Ajoute des textes au shard de chacun"""
+        documents = [
+            Document(page_content=text, metadata=(metadatas[i] if metadatas else None) or {})
+            for i, text in enumerate(texts)
+        ]
+        with self._lock:
+            success = True
+            for shard, shard_docs in self._group(documents).items():
+                manager = self._get_shard(shard, create=True)
+                success &= manager.add_texts(
+                    [doc.page_content for doc in shard_docs],
+                    [doc.metadata for doc in shard_docs]
+                )
+                self.shards[shard] = manager.vector_store.index.ntotal if manager.vector_store else 0
+                self._dirty_shards.add(shard)
+            return success
+
+    def delete_documents(self, key: str, value: Any) -> int:
+        """Retire les documents portant une métadonnée, dans tous les shards"""
+        removed = 0
+        with self._lock:
+            for shard in sorted(self.shards):
+                count = self._get_shard(shard).delete_documents(key, value)
+                if count:
+                    removed += count
+                    self._dirty_shards.add(shard)
+        return removed
+
+    def _fan_out(self, shards: List[str], search: Callable[[VectorStoreManager], List[Dict[str, Any]]]):
+        """
+        Exécute une recherche sur plusieurs shards en parallèle
+
+        Les shards déjà en mémoire sont interrogés d'abord, puis les autres par
+        vagues d'au plus max_resident_shards. Une recherche sans filtre sur plus
+        de shards que max_resident_shards recharge donc à chaque fois depuis le
+        disque ceux qui ne tiennent pas en mémoire (index mappé, docstore relu) :
+        max_resident_shards doit couvrir les shards interrogés régulièrement.
+        """
+        with self._lock:
+            resident = [shard for shard in shards if shard in self._resident]
+        ordered = resident + [shard for shard in shards if shard not in resident]
+
+        def run(manager: VectorStoreManager) -> List[Dict[str, Any]]:
+            with manager.lock.read():
+                return search(manager)
+
+        rows = []
+        for start in range(0, len(ordered), self.max_resident_shards):
+            wave = ordered[start:start + self.max_resident_shards]
+            managers = [manager for manager in (self._get_shard(shard) for shard in wave) if manager]
+            if len(managers) <= 1:
+                rows.extend(run(manager) for manager in managers)
+                continue
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(managers))) as executor:
+                rows.extend(executor.map(run, managers))
+        return rows
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: int = None,
+        ef_search: int = None,
+        filters: Dict[str, Any] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche par similarité dans les shards compatibles avec les filtres
+
+        Les distances L2 étant comparables d'un shard à l'autre, les top-k de
+        chaque shard sont fusionnés par distance croissante.
+        """
+        shards = self._shards_for(filters)
+        if not shards:
+            return []
+        # Embedding calculé une fois : les shards le retrouvent dans le cache de requêtes
+        self.embeddings.embed_query(query)
+        rows = self._fan_out(
+            shards,
+            lambda manager: manager.similarity_search(query, k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+        )
+        return sorted((result for results in rows for result in results), key=lambda r: r["score"])[:k]
+
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 5,
+        alpha: float = 0.5,
+        filters: Dict[str, Any] = None,
+        nprobe: int = None,
+        ef_search: int = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche hybride dans les shards compatibles avec les filtres
+
+        Les scores fusionnés sont normalisés par shard : la fusion des top-k est
+        approximative lorsque plusieurs shards sont interrogés.
+        """
+        shards = self._shards_for(filters)
+        if not shards:
+            return []
+        rows = self._fan_out(
+            shards,
+            lambda manager: manager.hybrid_search(
+                query, k, alpha=alpha, filters=filters, nprobe=nprobe, ef_search=ef_search
+            )
+        )
+        return sorted(
+            (result for results in rows for result in results),
+            key=lambda r: r["score"],
+            reverse=True
+        )[:k]
+
+    def delete_vector_store(self, store_name: str) -> bool:
+        """Supprime tous les shards d'une base"""
+        with self._lock:
+            self._resident.clear()
+            self._dirty_shards.clear()
+            self.shards = {}
+            return self._root.delete_vector_store(store_name)
+
+    def get_shard_report(self) -> List[Dict[str, Any]]:
+        """Documents et présence en mémoire de chaque shard"""
+        with self._lock:
+            return [
+                {"shard": shard, "documents": count, "resident": shard in self._resident}
+                for shard, count in sorted(self.shards.items())
+            ]
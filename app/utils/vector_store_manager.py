@@ -1,115 +1,887 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable, Iterator
 import numpy as np
 import os
 from pathlib import Path
 import json
 import pickle
+import hashlib
+import shutil
+import threading
+import time
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
 
 # Chargement des variables d'environnement
 load_dotenv()
 
-# Vérification de la présence de la clé API OpenAI
-if not os.getenv("OPENAI_API_KEY"):
-    raise ValueError("La clé API OpenAI n'est pas configurée. Veuillez créer un fichier .env avec votre OPENAI_API_KEY")
-
 try:
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
     from langchain_community.vectorstores.faiss import FAISS
-    from langchain_openai import OpenAIEmbeddings
+    from langchain_core.documents import Document
     from langchain_text_splitters import RecursiveCharacterTextSplitter
-    from langchain_community.document_loaders.text import TextLoader
-    from langchain_community.document_loaders.unstructured import UnstructuredPDFLoader as PDFLoader
-    from langchain_community.document_loaders.csv_loader import CSVLoader
-    from langchain_community.document_loaders.json_loader import JSONLoader
+    from app.utils.document_parser import (
+        SUPPORTED_EXTENSIONS,
+        STREAMING_EXTENSIONS,
+        create_loader,
+        ParallelDocumentParser
+    )
 except ImportError as e:
     st.error(f"Erreur d'importation: {str(e)}")
     st.error("Installation des dépendances requises...")
     os.system("pip install --upgrade langchain-community langchain-openai langchain-text-splitters python-dotenv unstructured")
     st.rerun()
 
+from app.utils.embedding_cache import EmbeddingCache, CachedEmbeddings, normalize_query
+from app.utils.embedding_backends import DISK_CACHED_BACKENDS, create_embeddings, resolve_backend
+from app.utils.lru_cache import LRUCache
+from app.utils.ingestion_pipeline import IngestionPipeline
+from app.utils.index_builder import (
+    DEFAULT_INDEX_FACTORY,
+    apply_projection,
+    apply_vector_storage,
+    build_index,
+    build_search_parameters,
+    ensure_direct_map,
+    is_flat_factory,
+    min_training_size,
+    rebuild_without,
+    recall_against_exact,
+    reconstruct_all,
+    reconstruct_positions,
+    select_projection_dimension
+)
+from app.utils.metadata_index import KEYWORD_FIELDS, MetadataIndex
+from app.utils.rw_lock import ReadWriteLock
+from app.utils.bm25_index import BM25Index, is_code_only_query
+from app.utils.near_duplicates import NearDuplicateIndex
+from app.utils.write_ahead_log import WriteAheadLog
+
+# Version du format de persistance (index FAISS natif + docstore JSON)
+STORE_FORMAT_VERSION = 1
+
+# Fichiers d'une base écrits directement à sa racine, avant les instantanés versionnés
+LEGACY_STORE_FILES = (
+    "index.faiss", "docstore.json", "meta.json", "tombstones.json", "bm25.json", "minhash.npz", "wal.log"
+)
+
+# Métadonnées conservées dans les références vers les quasi-doublons fusionnés
+DUPLICATE_REFERENCE_FIELDS = ("source", "diagnostic_id", "inspection_id", "plan_id", "make", "model", "year")
+
 class VectorStoreManager:
     """Gestionnaire de base de données vectorielle pour le RAG"""
     
-    def __init__(self, embedding_model="text-embedding-ada-002"):
-        self.embeddings = OpenAIEmbeddings(model=embedding_model)
+    def __init__(
+        self,
+        embedding_model: str = None,
+        embedding_cache: EmbeddingCache = None,
+        index_factory: str = None,
+        train_threshold: int = 10_000,
+        query_cache_size: int = 1024,
+        spill_queries_to_disk: bool = True,
+        result_cache_size: int = 512,
+        result_cache_max_bytes: int = 64 * 1024 * 1024,
+        exact_filter_limit: int = 50_000,
+        embeddings: CachedEmbeddings = None,
+        dedup_threshold: float = 0.9,
+        embedding_backend: str = None,
+        wal_max_entries: int = 1000,
+        compaction_threshold: float = 0.2,
+        vector_storage: str = None,
+        projection: str = None,
+        projected_dimension: int = None,
+        snapshot_grace_seconds: float = 600,
+        vector_store_path: str = "data/vector_store"
+    ):
+        """
+        Args:
+            embedding_model (str): Modèle d'embeddings du backend (par défaut celui
+                du backend, ou la variable d'environnement EMBEDDING_MODEL)
+            embedding_cache (EmbeddingCache): Cache d'embeddings partagé (optionnel)
+            index_factory (str): Type d'index FAISS ("Flat", "HNSW32", "IVF1024,Flat",
+                "IVF1024,PQ64"...). Par défaut, celui enregistré avec la base chargée
+            train_threshold (int): Taille à partir de laquelle l'index approximatif
+                est entraîné ; en dessous, la base reste sur un index exact
+            query_cache_size (int): Nombre d'embeddings de requêtes gardés en mémoire
+            spill_queries_to_disk (bool): Conserve aussi les embeddings de requêtes
+                dans le cache disque
+            result_cache_size (int): Nombre de résultats de recherche gardés en cache
+            result_cache_max_bytes (int): Mémoire maximale du cache de résultats
+            exact_filter_limit (int): Taille maximale d'un sous-ensemble filtré évalué
+                par calcul exact sur les seuls candidats
+            embeddings (CachedEmbeddings): Embeddings partagés avec d'autres bases
+                du même modèle (optionnel)
+            dedup_threshold (float): Similarité de Jaccard (MinHash) à partir de laquelle
+                un chunk est fusionné avec un chunk existant au lieu d'être indexé
+                (None désactive la déduplication)
+            embedding_backend (str): "openai", "hashing" (CPU, sans réseau) ou "local"
+                (modèle sentence-transformers sur CPU). Par défaut, la variable
+                d'environnement EMBEDDING_BACKEND, sinon "openai"
+            wal_max_entries (int): Nombre d'enregistrements du journal au-delà duquel
+                la sauvegarde suivante réécrit l'index complet (compaction)
+            compaction_threshold (float): Proportion de documents supprimés (pierres
+                tombales) à partir de laquelle l'index est reconstruit en arrière-plan
+            vector_storage (str): Encodage des vecteurs de l'index : "float32",
+                "float16" (mémoire divisée par 2) ou "sq8" (quantification scalaire
+                8 bits, mémoire divisée par 4). Appliqué au type d'index lorsque
+                l'index approximatif est construit (voir train_threshold)
+            projection (str): Projection apprise réduisant la dimension des vecteurs
+                à l'ingestion et à la requête : "pca" ou "opq" (voir
+                select_projection_dimension pour choisir la dimension)
+            projected_dimension (int): Dimension des vecteurs après projection
+            snapshot_grace_seconds (float): Délai pendant lequel un instantané remplacé
+                est conservé pour les lecteurs qui l'utilisent encore
+            vector_store_path (str): Dossier des bases de connaissances
+        """
+        self.embedding_backend, self.embedding_model = resolve_backend(embedding_backend, embedding_model)
+        self.vector_storage = vector_storage
+        self.projection = projection
+        self.projected_dimension = projected_dimension
+        self.index_factory = self._compose_factory(index_factory or DEFAULT_INDEX_FACTORY)
+        self._index_factory_explicit = index_factory is not None
+        # Rappel@10 de l'index par rapport à l'index exact float32, mesuré à sa construction
+        self.storage_recall = None
+        self.train_threshold = train_threshold
+        
+        # Les embeddings passent par le cache local avant tout appel au backend
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        self.embeddings = embeddings or CachedEmbeddings(
+            create_embeddings(self.embedding_backend, self.embedding_model),
+            self.embedding_cache,
+            # Les clés OpenAI restent celles des versions précédentes du cache
+            model_name=(
+                self.embedding_model if self.embedding_backend == "openai"
+                else f"{self.embedding_backend}:{self.embedding_model}"
+            ),
+            query_cache_size=query_cache_size,
+            spill_queries_to_disk=spill_queries_to_disk,
+            use_disk_cache=self.embedding_backend in DISK_CACHED_BACKENDS
+        )
         self.vector_store = None
+        self._index_mmapped = False
+        self._index_file = None
+        
+        # Cache des résultats de recherche, invalidé à chaque changement de version
+        self.store_name = None
+        self.index_version = 0
+        self.result_cache = LRUCache(
+            max_entries=result_cache_size,
+            max_bytes=result_cache_max_bytes
+        )
+        
+        # Index des métadonnées (marque, modèle, année, DTC), construit à la demande
+        self._metadata_index = None
+        # Index lexical BM25, persisté avec la base (bm25.json)
+        self._bm25_index = None
+        # Signatures MinHash des chunks indexés, persistées avec la base (minhash.npz)
+        self.dedup_threshold = dedup_threshold
+        self._dedup_index = None
+        self._pending_canonicals: Dict[str, Document] = {}
+        
+        # Journal des ajouts : une sauvegarde n'écrit que les documents nouveaux
+        self.wal_max_entries = wal_max_entries
+        self._persisted_store = None
+        self._persisted_snapshot = None
+        self._persisted_ntotal = 0
+        self._needs_full_save = True
+        self._dirty_metadata_ids = set()
+        self._wal_entries = 0
+        
+        # Suppressions par pierres tombales, filtrées à la requête puis compactées
+        self.compaction_threshold = compaction_threshold
+        self.snapshot_grace_seconds = snapshot_grace_seconds
+        self._tombstones = set()
+        self._dirty_tombstones = set()
+        self._tombstone_positions = None
+        self._store_generation = 0
+        self._compaction_thread = None
+        # Pendant une reconstruction, seules les sauvegardes par journal sont écrites ;
+        # un gestionnaire remplacé ne publie plus rien
+        self.defer_snapshots = False
+        self._retired = False
+        # Verrou lecteurs/rédacteur (partagé par le registre entre les sessions)
+        self.lock = ReadWriteLock()
+        # Les index dérivés construits à la demande le sont pendant des recherches
+        # concurrentes (verrou de lecture) : un seul lecteur les construit
+        self._derived_lock = threading.Lock()
+        self.exact_filter_limit = exact_filter_limit
+        self.chunk_size = 1000
+        self.chunk_overlap = 200
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             length_function=len,
         )
-        self.vector_store_path = Path("data/vector_store")
+        # Durées et erreurs de parsing par fichier du dernier chargement parallèle
+        self.parse_report = []
+        self.vector_store_path = Path(vector_store_path)
         self.vector_store_path.mkdir(parents=True, exist_ok=True)
     
-    def load_documents(self, file_paths: List[str]) -> List[Dict[str, Any]]:
-        """Charge et prétraite les documents"""
-        documents = []
-        
+    SUPPORTED_EXTENSIONS = SUPPORTED_EXTENSIONS
+    
+    def _expand_paths(self, file_paths: List[str]) -> List[Path]:
+        """Développe les dossiers en la liste des fichiers supportés qu'ils contiennent"""
+        files = []
         for file_path in file_paths:
-            file_extension = Path(file_path).suffix.lower()
-            
-            try:
-                if file_extension == '.txt':
-                    loader = TextLoader(file_path)
-                elif file_extension == '.pdf':
-                    loader = PDFLoader(file_path)
-                elif file_extension == '.csv':
-                    loader = CSVLoader(file_path)
-                elif file_extension == '.json':
-                    loader = JSONLoader(
-                        file_path,
-                        jq_schema='.[]',
-                        text_content=False
+            path = Path(file_path)
+            if path.is_dir():
+                files.extend(
+                    sorted(
+                        p for p in path.rglob("*")
+                        if p.is_file() and p.suffix.lower() in self.SUPPORTED_EXTENSIONS
                     )
-                else:
-                    continue
-                
-                doc = loader.load()
-                documents.extend(doc)
-                
-            except Exception as e:
-                print(f"Erreur lors du chargement de {file_path}: {str(e)}")
+                )
+            else:
+                files.append(path)
+        return files
+    
+    def _create_loader(self, file_path: str):
+        """Retourne le loader adapté à l'extension du fichier (None si non supportée)"""
+        return create_loader(file_path)
+    
+    def load_documents(self, file_paths: List[str], parse_workers: int = None) -> List[Dict[str, Any]]:
+        """Charge et prétraite les documents"""
+        return list(self.iter_document_chunks(file_paths, parse_workers=parse_workers))
+    
+    def iter_document_chunks(
+        self,
+        file_paths: List[str],
+        batch_size: int = 256,
+        parse_workers: int = None
+    ) -> Iterator[Document]:
+        """
+        Charge et découpe les documents en flux, fichier par fichier
         
-        return self.text_splitter.split_documents(documents)
+        Les fichiers CSV et JSON sont lus par lots de lignes : la mémoire utilisée
+        dépend de la taille des lots et non de celle du corpus.
+        
+        Args:
+            file_paths (List[str]): Fichiers ou dossiers à charger
+            batch_size (int): Nombre de documents bruts découpés à la fois
+            parse_workers (int): Nombre de processus de parsing (séquentiel si None ou 1)
+        """
+        for _, chunks in self._iter_file_chunks(self._expand_paths(file_paths), batch_size, parse_workers):
+            yield from chunks
+    
+    def _iter_file_chunks(
+        self,
+        paths: List[Path],
+        batch_size: int = 256,
+        parse_workers: int = None
+    ) -> Iterator[Tuple[str, Iterable[Document]]]:
+        """
+        Produit, dans l'ordre, chaque fichier avec ses chunks
+        
+        En parsing parallèle, seuls les fichiers chargés d'un bloc (texte, PDF) sont
+        confiés aux processus ; les CSV et JSON restent lus en flux par lots.
+        """
+        streamed = {path for path in paths if path.suffix.lower() in STREAMING_EXTENSIONS}
+        parsed = [path for path in paths if path.suffix.lower() not in STREAMING_EXTENSIONS]
+        if not (parse_workers and parse_workers > 1 and len(parsed) > 1):
+            for path in paths:
+                yield str(path), self._iter_single_file_chunks(path, batch_size)
+            return
+        
+        parser = ParallelDocumentParser(
+            workers=parse_workers,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap
+        )
+        self.parse_report = []
+        # Les processus avancent sur les fichiers suivants pendant la lecture des flux
+        results = parser.iter_parsed([str(path) for path in parsed])
+        for path in paths:
+            if path in streamed:
+                report = {"path": str(path), "chunks": 0, "elapsed_seconds": 0.0, "error": None}
+                self.parse_report.append(report)
+                yield str(path), self._iter_single_file_chunks(path, batch_size, report)
+                continue
+            
+            result = next(results)
+            self.parse_report.append({
+                "path": result["path"],
+                "chunks": len(result["chunks"]),
+                "elapsed_seconds": result["elapsed_seconds"],
+                "error": result["error"]
+            })
+            if result["error"]:
+                print(f"Erreur lors du chargement de {result['path']}: {result['error']}")
+            yield result["path"], result["chunks"]
     
-    def create_vector_store(self, documents: List[Dict[str, Any]], store_name: str):
-        """Crée une nouvelle base de données vectorielle"""
+    def _iter_single_file_chunks(
+        self,
+        file_path: Path,
+        batch_size: int,
+        report: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Document]:
+        """Charge et découpe un fichier par lots de documents bruts (report : bilan du parsing)"""
+        start = time.time()
         try:
-            self.vector_store = FAISS.from_documents(documents, self.embeddings)
-            self.save_vector_store(store_name)
+            loader = self._create_loader(str(file_path))
+            if loader is None:
+                return
+            
+            batch = []
+            for doc in loader.lazy_load():
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    chunks = self.text_splitter.split_documents(batch)
+                    if report is not None:
+                        report["chunks"] += len(chunks)
+                    yield from chunks
+                    batch = []
+            if batch:
+                chunks = self.text_splitter.split_documents(batch)
+                if report is not None:
+                    report["chunks"] += len(chunks)
+                yield from chunks
+            
+        except Exception as e:
+            print(f"Erreur lors du chargement de {file_path}: {str(e)}")
+            if report is not None:
+                report["error"] = str(e)
+        finally:
+            if report is not None:
+                report["elapsed_seconds"] = time.time() - start
+    
+    def create_vector_store(
+        self,
+        documents: Iterable[Document],
+        store_name: str,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        progress_callback: Callable[[Dict[str, Any]], None] = None
+    ):
+        """
+        Crée une nouvelle base de données vectorielle via le pipeline d'ingestion par lots
+        
+        Les documents peuvent être une liste ou un générateur (voir iter_document_chunks).
+        """
+        try:
+            pipeline = IngestionPipeline(
+                self,
+                batch_size=batch_size,
+                max_concurrency=max_concurrency,
+                progress_callback=progress_callback
+            )
+            ingest_stats = pipeline.run(documents, store_name)
+            self.store_name = store_name
+            if not ingest_stats["chunks"]:
+                print(f"Aucun document à indexer pour {store_name}")
+                return False
+            
+            # Une reconstruction complète rend le manifeste incrémental obsolète
+            manifest_path = self._manifest_path(store_name)
+            if manifest_path.exists():
+                manifest_path.unlink()
             return True
         except Exception as e:
             print(f"Erreur lors de la création du vector store: {str(e)}")
             return False
     
+    def create_vector_store_from_files(
+        self,
+        file_paths: List[str],
+        store_name: str,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        progress_callback: Callable[[Dict[str, Any]], None] = None,
+        parse_workers: int = None
+    ) -> bool:
+        """Crée une base en flux depuis des fichiers, sans charger tout le corpus en mémoire"""
+        return self.create_vector_store(
+            self.iter_document_chunks(file_paths, parse_workers=parse_workers),
+            store_name,
+            batch_size=batch_size,
+            max_concurrency=max_concurrency,
+            progress_callback=progress_callback
+        )
+    
+    def _add_embeddings(
+        self,
+        text_embeddings: List[Tuple[str, List[float]]],
+        metadatas: List[Dict[str, Any]] = None,
+        ids: List[str] = None
+    ):
+        """Insère des embeddings déjà calculés dans la base chargée (ou la crée)"""
+        with self.lock.write():
+            if self.vector_store is None:
+                self.vector_store = FAISS.from_embeddings(
+                    text_embeddings=text_embeddings,
+                    embedding=self.embeddings,
+                    metadatas=metadatas,
+                    ids=ids
+                )
+                self._index_mmapped = False
+                # Base neuve : les index dérivés (vides) reçoivent les premiers documents
+                self._on_documents_added(0)
+            else:
+                self._ensure_writable()
+                start = len(self.vector_store.index_to_docstore_id)
+                self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+                self._on_documents_added(start)
+            self._bump_index_version()
+            self._maybe_upgrade_index()
+    
+    def _store_dir(self, store_name: str) -> Path:
+        """Dossier d'une base : pointeur CURRENT et instantanés versionnés"""
+        return self.vector_store_path / store_name
+    
+    def _current_snapshot(self, store_name: str) -> str:
+        """Nom de l'instantané servi (None pour une base au format antérieur)"""
+        current_path = self._store_dir(store_name) / "CURRENT"
+        if not current_path.exists():
+            return None
+        return current_path.read_text().strip()
+    
+    def _snapshot_dir(self, store_name: str) -> Path:
+        """Dossier de l'instantané servi (index FAISS natif, docstore, journal)"""
+        snapshot = self._current_snapshot(store_name)
+        if snapshot is None:
+            # Base antérieure aux instantanés : fichiers à la racine
+            return self._store_dir(store_name)
+        return self._store_dir(store_name) / "snapshots" / snapshot
+    
+    def _wal(self, store_name: str) -> WriteAheadLog:
+        """Journal des ajouts de l'instantané servi, à côté de son index"""
+        return WriteAheadLog(self._snapshot_dir(store_name) / "wal.log")
+    
+    @staticmethod
+    def _fsync(path: Path):
+        """Force l'écriture sur disque d'un fichier ou d'un dossier"""
+        fd = os.open(str(path), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def _publish_snapshot(self, store_name: str, snapshot: str):
+        """Désigne atomiquement un instantané complet comme version servie"""
+        store_dir = self._store_dir(store_name)
+        previous_dir = self._snapshot_dir(store_name)
+        current_tmp = store_dir / "CURRENT.tmp"
+        with open(current_tmp, "w") as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current_tmp, store_dir / "CURRENT")
+        self._fsync(store_dir)
+        
+        # La date de remplacement fait partir le délai de grâce de l'ancienne version
+        retired = previous_dir if previous_dir != store_dir else previous_dir / "index.faiss"
+        if retired.exists():
+            os.utime(retired)
+    
+    def collect_snapshots(self, store_name: str) -> List[str]:
+        """
+        Supprime les instantanés remplacés depuis plus de snapshot_grace_seconds
+        
+        Un processus qui a mappé un instantané supprimé continue de le lire :
+        le système ne libère les fichiers qu'à leur fermeture.
+        
+        Returns:
+            List[str]: Instantanés supprimés
+        """
+        store_dir = self._store_dir(store_name)
+        current = self._current_snapshot(store_name)
+        if current is None:
+            return []
+        expired_before = time.time() - self.snapshot_grace_seconds
+        removed = []
+        snapshots_dir = store_dir / "snapshots"
+        for snapshot_dir in sorted(snapshots_dir.iterdir()) if snapshots_dir.exists() else []:
+            if snapshot_dir.name == current or snapshot_dir.stat().st_mtime > expired_before:
+                continue
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            removed.append(snapshot_dir.name)
+        
+        legacy_index = store_dir / "index.faiss"
+        if legacy_index.exists() and legacy_index.stat().st_mtime <= expired_before:
+            for file_name in LEGACY_STORE_FILES:
+                if (store_dir / file_name).exists():
+                    (store_dir / file_name).unlink()
+            removed.append(".")
+        return removed
+    
     def save_vector_store(self, store_name: str):
-        """Sauvegarde la base de données vectorielle"""
-        if self.vector_store:
-            store_path = self.vector_store_path / f"{store_name}.pkl"
-            with open(store_path, "wb") as f:
-                pickle.dump(self.vector_store, f)
-    
-    def load_vector_store(self, store_name: str) -> bool:
-        """Charge une base de données vectorielle existante"""
-        store_path = self.vector_store_path / f"{store_name}.pkl"
-        if store_path.exists():
+        """
+        Sauvegarde la base de données vectorielle (index FAISS natif + docstore)
+        
+        Si la base n'a reçu que des ajouts depuis sa dernière sauvegarde, seuls les
+        nouveaux documents sont écrits dans le journal (coût proportionnel à
+        l'ajout). Sinon (journal au-delà de wal_max_entries, reconstruction...),
+        un nouvel instantané complet est écrit dans son propre dossier, synchronisé
+        sur disque, puis désigné par le pointeur CURRENT : les lecteurs ne voient
+        jamais une base à moitié écrite.
+        
+        Aucun instantané n'est publié par un gestionnaire remplacé (retire), ni
+        par-dessus un instantané publié ailleurs depuis le chargement de la base.
+        
+        Returns:
+            bool: True si la base a été écrite
+        """
+        if not self.vector_store:
+            return False
+        if self._retired:
+            print(f"Sauvegarde ignorée : le gestionnaire de {store_name} a été remplacé")
+            return False
+        
+        if self._can_append_to_wal(store_name):
+            self._append_to_wal(store_name)
+            return True
+        
+        if self.defer_snapshots:
+            print(f"Sauvegarde de {store_name} reportée à la fin de la reconstruction en cours")
+            return False
+        if self._persisted_store == store_name and self._current_snapshot(store_name) != self._persisted_snapshot:
+            print(f"Sauvegarde refusée : un autre instantané de {store_name} a été publié depuis son chargement")
+            return False
+        
+        snapshot = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        store_dir = self._store_dir(store_name) / "snapshots" / snapshot
+        store_dir.mkdir(parents=True)
+        
+        # Le docstore est écrit dans l'ordre des positions de l'index
+        index_to_id = self.vector_store.index_to_docstore_id
+        records = []
+        for position in range(len(index_to_id)):
+            doc_id = index_to_id[position]
+            doc = self.vector_store.docstore.search(doc_id)
+            records.append({
+                "id": doc_id,
+                "page_content": doc.page_content,
+                "metadata": doc.metadata
+            })
+        
+        meta = {
+            "format_version": STORE_FORMAT_VERSION,
+            "embedding_backend": self.embedding_backend,
+            "embedding_model": self.embedding_model,
+            "dimension": self.vector_store.index.d,
+            "ntotal": self.vector_store.index.ntotal,
+            "index_factory": self.index_factory,
+            "index_version": self.index_version,
+            "index_type": type(faiss.downcast_index(self.vector_store.index)).__name__,
+            "storage_recall": self.storage_recall
+        }
+        
+        # L'instantané n'est visible qu'une fois complet : les processus ayant
+        # mappé l'ancien index conservent leurs pages
+        faiss.write_index(self.vector_store.index, str(store_dir / "index.faiss"))
+        with open(store_dir / "docstore.json", "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, separators=(",", ":"))
+        with open(store_dir / "meta.json", "w") as f:
+            json.dump(meta, f, indent=2)
+        with open(store_dir / "tombstones.json", "w") as f:
+            json.dump(sorted(self._tombstones), f)
+        self._get_bm25_index().save(store_dir / "bm25.json")
+        if self._dedup_index is not None:
+            self._dedup_index.save(store_dir / "minhash.npz")
+        for file_path in store_dir.iterdir():
+            self._fsync(file_path)
+        self._fsync(store_dir)
+        
+        # Le nouvel instantané part d'un journal vide
+        self._publish_snapshot(store_name, snapshot)
+        self._mark_persisted(store_name)
+        self.collect_snapshots(store_name)
+        return True
+    
+    def retire(self):
+        """
+        Désactive un gestionnaire remplacé par une reconstruction
+        
+        La compaction en cours se termine, aucune autre n'est lancée, et les
+        sauvegardes ultérieures sont ignorées : l'instantané reconstruit ne peut
+        pas être écrasé par l'ancienne version.
+        """
+        self.compaction_threshold = None
+        self.wait_for_compaction()
+        self._retired = True
+    
+    def _can_append_to_wal(self, store_name: str) -> bool:
+        """Indique si la sauvegarde peut se limiter à un ajout au journal"""
+        if self._needs_full_save or self._persisted_store != store_name:
+            return False
+        # Un autre processus a publié un instantané : le journal ne s'y applique pas
+        if self._current_snapshot(store_name) != self._persisted_snapshot:
+            return False
+        if not (self._snapshot_dir(store_name) / "index.faiss").exists():
+            return False
+        pending = (
+            self.vector_store.index.ntotal - self._persisted_ntotal
+            + len(self._dirty_metadata_ids) + len(self._dirty_tombstones)
+        )
+        return self._wal_entries + pending <= self.wal_max_entries
+    
+    def _append_to_wal(self, store_name: str):
+        """Écrit dans le journal les documents ajoutés et les métadonnées modifiées"""
+        index_to_id = self.vector_store.index_to_docstore_id
+        positions = np.arange(self._persisted_ntotal, len(index_to_id), dtype=np.int64)
+        # Vecteurs tels que stockés : les réinsérer redonne le même index
+        vectors = reconstruct_positions(self.vector_store.index, positions) if len(positions) else []
+        
+        records = []
+        for position, vector in zip(positions, vectors):
+            doc_id = index_to_id[int(position)]
+            doc = self.vector_store.docstore.search(doc_id)
+            records.append({
+                "op": "add",
+                "id": doc_id,
+                "page_content": doc.page_content,
+                "metadata": doc.metadata,
+                "vector": WriteAheadLog.encode_vector(vector)
+            })
+        for doc_id in sorted(self._dirty_metadata_ids):
+            doc = self.vector_store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                records.append({"op": "metadata", "id": doc_id, "metadata": doc.metadata})
+        records.extend({"op": "delete", "id": doc_id} for doc_id in sorted(self._dirty_tombstones))
+        
+        self._wal(store_name).append(records)
+        self._wal_entries += len(records)
+        self._persisted_ntotal = len(index_to_id)
+        self._dirty_metadata_ids.clear()
+        self._dirty_tombstones.clear()
+    
+    def _mark_persisted(self, store_name: str, wal_entries: int = 0):
+        """Enregistre l'état de la base tel qu'il est sur disque"""
+        self._persisted_store = store_name
+        self._persisted_snapshot = self._current_snapshot(store_name)
+        self._persisted_ntotal = self.vector_store.index.ntotal
+        self._needs_full_save = False
+        self._dirty_metadata_ids.clear()
+        self._dirty_tombstones.clear()
+        self._wal_entries = wal_entries
+    
+    def _replay_wal(self, store_name: str) -> int:
+        """
+        Réapplique le journal sur la base qui vient d'être chargée
+        
+        Returns:
+            int: Nombre d'enregistrements présents dans le journal
+        """
+        wal = self._wal(store_name)
+        records, valid_end = wal.replay()
+        if valid_end is not None:
+            print(f"Fin du journal de {store_name} incomplète, ignorée")
+            wal.truncate(valid_end)
+        
+        # Les ajouts déjà intégrés (compaction interrompue avant la remise à zéro) sont ignorés
+        known_ids = set(self.vector_store.index_to_docstore_id.values())
+        additions = []
+        for record in records:
+            if record["op"] == "add" and record["id"] not in known_ids:
+                known_ids.add(record["id"])
+                additions.append(record)
+        
+        if additions:
+            self._ensure_writable()
+            start = len(self.vector_store.index_to_docstore_id)
+            self.vector_store.add_embeddings(
+                [(record["page_content"], WriteAheadLog.decode_vector(record["vector"])) for record in additions],
+                metadatas=[record["metadata"] for record in additions],
+                ids=[record["id"] for record in additions]
+            )
+            self._on_documents_added(start)
+        
+        for record in records:
+            if record["op"] == "metadata":
+                doc = self.vector_store.docstore.search(record["id"])
+                if isinstance(doc, Document):
+                    doc.metadata = record["metadata"]
+        self._add_tombstones([record["id"] for record in records if record["op"] == "delete"])
+        return len(records)
+    
+    def load_vector_store(self, store_name: str, mmap: bool = True) -> bool:
+        """
+        Charge une base de données vectorielle existante
+        
+        Args:
+            store_name (str): Nom de la base de connaissances
+            mmap (bool): Mappe l'index en mémoire en lecture seule, ce qui permet
+                aux processus Streamlit de partager les mêmes pages physiques
+        """
+        store_dir = self._snapshot_dir(store_name)
+        if not (store_dir / "index.faiss").exists():
+            return self._migrate_legacy_store(store_name)
+        
+        try:
+            with open(store_dir / "meta.json", "r") as f:
+                meta = json.load(f)
+            self._check_embedding_backend(store_name, meta)
+            with open(store_dir / "docstore.json", "r", encoding="utf-8") as f:
+                records = json.load(f)
+            
+            if not self._index_factory_explicit:
+                self.index_factory = self._compose_factory(meta.get("index_factory", DEFAULT_INDEX_FACTORY))
+            self.storage_recall = meta.get("storage_recall")
+            
+            index = self._read_index(store_dir / "index.faiss", mmap)
+            if index.ntotal != len(records):
+                raise ValueError(
+                    f"Index ({index.ntotal} vecteurs) et docstore ({len(records)} documents) incohérents"
+                )
+            
+            self.vector_store = FAISS(
+                embedding_function=self.embeddings,
+                index=index,
+                docstore=InMemoryDocstore({
+                    record["id"]: Document(
+                        page_content=record["page_content"],
+                        metadata=record["metadata"]
+                    )
+                    for record in records
+                }),
+                index_to_docstore_id={
+                    position: record["id"] for position, record in enumerate(records)
+                }
+            )
+            self._index_mmapped = mmap
+            self._index_file = store_dir / "index.faiss"
+            self._on_store_replaced()
+            tombstones_path = store_dir / "tombstones.json"
+            if tombstones_path.exists():
+                with open(tombstones_path, "r") as f:
+                    self._tombstones = set(json.load(f))
+            # Les index dérivés ne contiennent pas les documents supprimés
+            live_count = len(records) - len(self._tombstones)
+            bm25_path = store_dir / "bm25.json"
+            if bm25_path.exists():
+                bm25_index = BM25Index.load(bm25_path)
+                # Un index lexical désynchronisé est reconstruit à la demande
+                if len(bm25_index) == live_count:
+                    self._bm25_index = bm25_index
+            minhash_path = store_dir / "minhash.npz"
+            if minhash_path.exists():
+                dedup_index = NearDuplicateIndex.load(minhash_path, threshold=self.dedup_threshold)
+                if len(dedup_index) == live_count:
+                    self._dedup_index = dedup_index
+            
+            wal_entries = self._replay_wal(store_name)
+            self._mark_persisted(store_name, wal_entries)
+            self.store_name = store_name
+            # Chaque enregistrement du journal correspond à une modification de la base
+            self.index_version = meta.get("index_version", 0) + wal_entries
+            self.result_cache.clear()
+            return True
+        except Exception as e:
+            print(f"Erreur lors du chargement du vector store: {str(e)}")
+        return False
+    
+    def _check_embedding_backend(self, store_name: str, meta: Dict[str, Any]):
+        """Refuse une base dont les vecteurs viennent d'un autre backend ou modèle"""
+        # Les bases antérieures aux backends multiples ont été construites avec OpenAI
+        stored = (meta.get("embedding_backend", "openai"), meta.get("embedding_model"))
+        if stored != (self.embedding_backend, self.embedding_model):
+            raise ValueError(
+                f"La base {store_name} a été construite avec {stored[0]}:{stored[1]}, "
+                f"incompatible avec {self.embedding_backend}:{self.embedding_model}"
+            )
+    
+    @staticmethod
+    def _read_index(index_path: Path, mmap: bool):
+        """Lit un index FAISS, mappé en mémoire si possible"""
+        if mmap:
             try:
-                with open(store_path, "rb") as f:
-                    self.vector_store = pickle.load(f)
-                return True
+                return faiss.read_index(
+                    str(index_path),
+                    faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+                )
             except Exception as e:
-                print(f"Erreur lors du chargement du vector store: {str(e)}")
-        return False
+                print(f"Mappage mémoire impossible pour {index_path}, lecture complète: {str(e)}")
+        return faiss.read_index(str(index_path))
+    
+    def _ensure_writable(self):
+        """Recharge en mémoire privée un index mappé avant toute modification"""
+        if self.vector_store and self._index_mmapped:
+            # Un index mappé est en lecture seule : FAISS interromprait le processus.
+            # La copie part de l'index mappé, son fichier ayant pu être supprimé depuis
+            self.vector_store.index = faiss.deserialize_index(faiss.serialize_index(self.vector_store.index))
+            self._index_mmapped = False
     
-    def similarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Effectue une recherche par similarité"""
+    def _migrate_legacy_store(self, store_name: str) -> bool:
+        """Convertit une base au format pickle ou save_local vers le format natif"""
+        pickle_path = self.vector_store_path / f"{store_name}.pkl"
+        local_path = self.vector_store_path / f"{store_name}.index"
+        
+        try:
+            if pickle_path.exists():
+                with open(pickle_path, "rb") as f:
+                    self.vector_store = pickle.load(f)
+                self.vector_store.embedding_function = self.embeddings
+            elif local_path.exists():
+                self.vector_store = FAISS.load_local(
+                    str(local_path),
+                    self.embeddings,
+                    allow_dangerous_deserialization=True
+                )
+            else:
+                return False
+            
+            self._index_mmapped = False
+            self._on_store_replaced()
+            self.store_name = store_name
+            self._bump_index_version()
+            self.save_vector_store(store_name)
+            if pickle_path.exists():
+                pickle_path.unlink()
+            if local_path.exists():
+                shutil.rmtree(local_path)
+            return True
+        except Exception as e:
+            print(f"Erreur lors de la migration du vector store {store_name}: {str(e)}")
+            return False
+    
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: int = None,
+        ef_search: int = None,
+        filters: Dict[str, Any] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Effectue une recherche par similarité
+        
+        Args:
+            query (str): Texte de la requête
+            k (int): Nombre de résultats
+            nprobe (int): Nombre de listes IVF explorées (index IVF uniquement)
+            ef_search (int): Largeur de recherche HNSW (index HNSW uniquement)
+            filters (Dict[str, Any]): Restreint les candidats avant le calcul des
+                distances (make, model, year, year_min, year_max, dtc_codes,
+                diagnostic_id, inspection_id, plan_id)
+        """
         if not self.vector_store:
             return []
         
         try:
-            results = self.vector_store.similarity_search_with_score(query, k=k)
-            return [
+            cache_key = (
+                self.store_name,
+                self.index_version,
+                normalize_query(query),
+                k,
+                nprobe,
+                ef_search,
+                repr(sorted((filters or {}).items()))
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return [dict(result) for result in cached]
+            
+            candidates = self._filter_candidates(filters)
+            if candidates is not None and len(candidates) == 0:
+                # Aucun document ne correspond : inutile de calculer l'embedding
+                results = []
+            else:
+                query_vector = np.array([self.embeddings.embed_query(query)], dtype=np.float32)
+                if candidates is None:
+                    results = self._search_by_vectors(query_vector, k, nprobe=nprobe, ef_search=ef_search)[0]
+                else:
+                    results = self._search_candidates(query_vector, k, candidates, nprobe, ef_search)
+            formatted = [
                 {
                     "content": doc.page_content,
                     "metadata": doc.metadata,
@@ -117,29 +889,929 @@ class VectorStoreManager:
                 }
                 for doc, score in results
             ]
+            self.result_cache.put(cache_key, formatted)
+            return [dict(result) for result in formatted]
         except Exception as e:
             print(f"Erreur lors de la recherche: {str(e)}")
             return []
     
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        nprobe: int = None,
+        ef_search: int = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Effectue plusieurs recherches par similarité en une seule passe
+        
+        Les requêtes absentes du cache sont vectorisées en un seul appel d'embeddings
+        puis recherchées ensemble dans FAISS (une recherche matricielle).
+        
+        Returns:
+            List[List[Dict[str, Any]]]: Résultats de chaque requête, dans l'ordre
+        """
+        if not self.vector_store or not queries:
+            return [[] for _ in queries]
+        
+        try:
+            keys = [
+                (self.store_name, self.index_version, normalize_query(query), k, nprobe, ef_search, "[]")
+                for query in queries
+            ]
+            results = [self.result_cache.get(key) for key in keys]
+            
+            missing = [i for i, cached in enumerate(results) if cached is None]
+            if missing:
+                query_vectors = np.array(
+                    self.embeddings.embed_queries([queries[i] for i in missing]),
+                    dtype=np.float32
+                )
+                found = self._search_by_vectors(query_vectors, k, nprobe=nprobe, ef_search=ef_search)
+                for i, rows in zip(missing, found):
+                    results[i] = [
+                        {
+                            "content": doc.page_content,
+                            "metadata": doc.metadata,
+                            "score": score
+                        }
+                        for doc, score in rows
+                    ]
+                    self.result_cache.put(keys[i], results[i])
+            
+            return [[dict(result) for result in rows] for rows in results]
+        except Exception as e:
+            print(f"Erreur lors de la recherche groupée: {str(e)}")
+            return [[] for _ in queries]
+    
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 5,
+        alpha: float = 0.5,
+        filters: Dict[str, Any] = None,
+        nprobe: int = None,
+        ef_search: int = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche hybride fusionnant les scores lexicaux (BM25) et vectoriels
+        
+        Une requête composée uniquement de codes défaut ("P0420", "SPN 3226 FMI 4")
+        est résolue par l'index inversé seul, sans calcul d'embedding.
+        
+        Args:
+            query (str): Texte de la requête
+            k (int): Nombre de résultats
+            alpha (float): Poids du score vectoriel (0 = lexical seul, 1 = vectoriel seul)
+            filters (Dict[str, Any]): Mêmes filtres que similarity_search
+            
+        Returns:
+            List[Dict[str, Any]]: Résultats triés par score fusionné décroissant
+            (champs lexical_score et vector_score : score BM25 et distance L2)
+        """
+        if not self.vector_store:
+            return []
+        
+        try:
+            cache_key = (
+                self.store_name,
+                self.index_version,
+                normalize_query(query),
+                k,
+                nprobe,
+                ef_search,
+                repr(sorted((filters or {}).items())),
+                ("hybrid", alpha)
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return [dict(result) for result in cached]
+            
+            index_to_id = self.vector_store.index_to_docstore_id
+            candidates = self._filter_candidates(filters)
+            allowed_ids = None
+            if candidates is not None:
+                allowed_ids = {index_to_id[int(position)] for position in candidates}
+            
+            code_only = is_code_only_query(query)
+            depth = k if code_only else k * 4
+            lexical = dict(self._get_bm25_index().search(query, depth, allowed_ids=allowed_ids))
+            
+            vector = {}
+            if not code_only and alpha > 0 and (candidates is None or len(candidates)):
+                query_vector = np.array([self.embeddings.embed_query(query)], dtype=np.float32)
+                if candidates is None:
+                    hits = self._search_by_vectors(
+                        query_vector, depth, nprobe=nprobe, ef_search=ef_search, return_positions=True
+                    )[0]
+                else:
+                    hits = self._search_candidates(
+                        query_vector, depth, candidates, nprobe, ef_search, return_positions=True
+                    )
+                vector = {index_to_id[position]: distance for position, distance in hits}
+            
+            weight = 0.0 if code_only else alpha
+            max_lexical = max(lexical.values(), default=0.0)
+            distances = list(vector.values())
+            min_distance = min(distances, default=0.0)
+            span = max(distances, default=0.0) - min_distance
+            
+            fused = []
+            for doc_id in set(lexical) | set(vector):
+                lexical_part = lexical[doc_id] / max_lexical if doc_id in lexical and max_lexical else 0.0
+                vector_part = 0.0
+                if doc_id in vector:
+                    vector_part = 1.0 - (vector[doc_id] - min_distance) / span if span else 1.0
+                fused.append((weight * vector_part + (1 - weight) * lexical_part, doc_id))
+            fused.sort(key=lambda item: item[0], reverse=True)
+            
+            formatted = []
+            for score, doc_id in fused[:k]:
+                doc = self.vector_store.docstore.search(doc_id)
+                formatted.append({
+                    "content": doc.page_content,
+                    "metadata": doc.metadata,
+                    "score": score,
+                    "lexical_score": lexical.get(doc_id, 0.0),
+                    "vector_score": vector.get(doc_id)
+                })
+            self.result_cache.put(cache_key, formatted)
+            return [dict(result) for result in formatted]
+        except Exception as e:
+            print(f"Erreur lors de la recherche hybride: {str(e)}")
+            return []
+    
+    def _search_by_vectors(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        nprobe: int = None,
+        ef_search: int = None,
+        return_positions: bool = False
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Recherche les k plus proches documents de chaque vecteur de requête
+        
+        Avec return_positions, les documents sont remplacés par leur position FAISS.
+        """
+        index = self.vector_store.index
+        params = build_search_parameters(
+            index, nprobe=nprobe, ef_search=ef_search, selector=self._live_selector()
+        )
+        distances, positions = index.search(query_vectors, k, params=params)
+        
+        results = []
+        for row_distances, row_positions in zip(distances, positions):
+            row = []
+            for distance, position in zip(row_distances, row_positions):
+                # FAISS renvoie -1 quand il y a moins de k résultats
+                if position == -1:
+                    continue
+                row.append((self._resolve(int(position), return_positions), float(distance)))
+            results.append(row)
+        return results
+    
+    def _search_candidates(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        candidates: np.ndarray,
+        nprobe: int = None,
+        ef_search: int = None,
+        return_positions: bool = False
+    ) -> List[Tuple[Document, float]]:
+        """Recherche restreinte à un sous-ensemble de positions"""
+        index = self.vector_store.index
+        
+        if len(candidates) <= self.exact_filter_limit:
+            # Coût proportionnel au sous-ensemble : distances calculées sur ses seuls vecteurs
+            vectors = reconstruct_positions(index, candidates)
+            distances = ((vectors - query_vector) ** 2).sum(axis=1)
+            top = min(k, len(candidates))
+            best = np.argpartition(distances, top - 1)[:top]
+            best = best[np.argsort(distances[best])]
+            return [
+                (self._resolve(int(candidates[i]), return_positions), float(distances[i]))
+                for i in best
+            ]
+        
+        # Grand sous-ensemble : recherche FAISS avec sélecteur d'identifiants
+        selector = faiss.IDSelectorBatch(candidates)
+        params = build_search_parameters(index, nprobe=nprobe, ef_search=ef_search, selector=selector)
+        distances, positions = index.search(query_vector, k, params=params)
+        return [
+            (self._resolve(int(position), return_positions), float(distance))
+            for distance, position in zip(distances[0], positions[0])
+            if position != -1
+        ]
+    
+    def _filter_candidates(self, filters: Dict[str, Any] = None):
+        """Positions satisfaisant les filtres, documents supprimés exclus (None sans filtre)"""
+        if not filters:
+            return None
+        candidates = self._get_metadata_index().candidates(filters)
+        if candidates is not None and self._tombstones:
+            candidates = np.setdiff1d(candidates, self._get_tombstone_positions(), assume_unique=True)
+        return candidates
+    
+    def _get_tombstone_positions(self) -> np.ndarray:
+        """Positions FAISS des documents supprimés, recalculées après chaque changement"""
+        with self._derived_lock:
+            if self._tombstone_positions is None:
+                self._tombstone_positions = np.array(sorted(
+                    position
+                    for position, doc_id in self.vector_store.index_to_docstore_id.items()
+                    if doc_id in self._tombstones
+                ), dtype=np.int64)
+            return self._tombstone_positions
+    
+    def _live_selector(self):
+        """Sélecteur FAISS excluant les documents supprimés (None s'il n'y en a pas)"""
+        if not self._tombstones:
+            return None
+        excluded = faiss.IDSelectorBatch(self._get_tombstone_positions())
+        selector = faiss.IDSelectorNot(excluded)
+        # IDSelectorNot ne garde pas de référence Python vers le sélecteur inversé
+        selector.referenced_selector = excluded
+        return selector
+    
+    def _resolve(self, position: int, return_position: bool = False):
+        """Document stocké à une position FAISS (ou la position elle-même)"""
+        if return_position:
+            return position
+        return self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[position])
+    
     def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]] = None):
-        """Ajoute de nouveaux textes à la base existante"""
+        """
+        Ajoute de nouveaux textes à la base existante
+        
+        Un texte quasi identique à un document déjà indexé n'est pas vectorisé :
+        il est rattaché à ce document (métadonnées "duplicates").
+        """
         try:
-            if not self.vector_store:
-                documents = self.text_splitter.create_documents(texts, metadatas)
-                self.vector_store = FAISS.from_documents(documents, self.embeddings)
-            else:
-                self.vector_store.add_texts(texts, metadatas)
-            return True
+            with self.lock.write():
+                if not self.vector_store:
+                    documents = self.text_splitter.create_documents(texts, metadatas)
+                else:
+                    documents = [
+                        Document(page_content=text, metadata=(metadatas[i] if metadatas else None) or {})
+                        for i, text in enumerate(texts)
+                    ]
+                items = [(str(uuid.uuid4()), doc) for doc in documents]
+                items = [(doc_id, doc) for doc_id, doc in items if not self._merge_near_duplicate(doc_id, doc)]
+                if not items:
+                    # Tout a été fusionné : seules les métadonnées des documents existants changent
+                    self._bump_index_version()
+                    return True
+                ids = [doc_id for doc_id, _ in items]
+                documents = [doc for _, doc in items]
+            
+                if not self.vector_store:
+                    self.vector_store = FAISS.from_documents(documents, self.embeddings, ids=ids)
+                    self._index_mmapped = False
+                    self._on_documents_added(0)
+                else:
+                    self._ensure_writable()
+                    start = len(self.vector_store.index_to_docstore_id)
+                    self.vector_store.add_texts(
+                        [doc.page_content for doc in documents],
+                        [doc.metadata for doc in documents],
+                        ids=ids
+                    )
+                    self._on_documents_added(start)
+                self._bump_index_version()
+                self._maybe_upgrade_index()
+                return True
         except Exception as e:
             print(f"Erreur lors de l'ajout de textes: {str(e)}")
             return False
     
+    def add_texts_and_save(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        store_name: str,
+        retries: int = 2
+    ):
+        """
+        Ajoute des textes puis sauvegarde la base, sans perdre l'ajout si la sauvegarde est refusée
+        
+        Si un autre processus a publié un instantané depuis le chargement, la base
+        est rechargée depuis cet instantané et l'ajout y est rejoué. Pendant une
+        reconstruction (defer_snapshots), l'ajout est conservé par le registre et
+        rejoué sur la nouvelle version.
+        
+        Args:
+            retries (int): Nombre de rechargements tentés
+            
+        Raises:
+            RuntimeError: Si l'ajout n'a pas pu être enregistré
+        """
+        with self.lock.write():
+            for attempt in range(retries + 1):
+                if not self.add_texts(texts, metadatas):
+                    break
+                if self.save_vector_store(store_name) or self.defer_snapshots:
+                    return True
+                if self._retired or attempt == retries or not self.load_vector_store(store_name):
+                    break
+        raise RuntimeError(f"L'ajout n'a pas pu être enregistré dans {store_name}")
+    
+    def _maybe_upgrade_index(self):
+        """Remplace l'index exact par l'index approximatif configuré une fois le seuil atteint"""
+        if not self.vector_store or is_flat_factory(self.index_factory):
+            return
+        
+        index = self.vector_store.index
+        if not isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+            return
+        
+        required = max(self.train_threshold, min_training_size(self.index_factory, index.d))
+        if index.ntotal < required:
+            return
+        
+        # Les positions sont conservées : index_to_docstore_id reste valide
+        vectors = reconstruct_all(index)
+        self.vector_store.index = build_index(self.index_factory, vectors)
+        self.storage_recall = recall_against_exact(self.vector_store.index, vectors)
+        print(
+            f"Index {self.index_factory} construit ({index.ntotal} vecteurs) : "
+            f"rappel@10 de {self.storage_recall:.3f} par rapport à l'index exact float32"
+        )
+        self._index_mmapped = False
+        self._needs_full_save = True
+        self._store_generation += 1
+        self._bump_index_version()
+    
+    def _compose_factory(self, factory_string: str) -> str:
+        """Applique l'encodage de vecteurs et la projection demandés au type d'index"""
+        if self.vector_storage is not None:
+            factory_string = apply_vector_storage(factory_string, self.vector_storage)
+        if self.projection is not None:
+            factory_string = apply_projection(factory_string, self.projection, self.projected_dimension)
+        return factory_string
+    
+    def select_projection_dimension(
+        self,
+        queries: List[str],
+        dimensions: List[int] = (64, 128, 256, 512),
+        target_recall: float = 0.95,
+        projection: str = "pca",
+        k: int = 10
+    ) -> Dict[str, Any]:
+        """
+        Choisit la dimension de projection sur un jeu de requêtes de validation
+        
+        Chaque dimension est évaluée sur les vecteurs de la base chargée (avec un
+        index exact après projection) ; la plus petite qui garde un rappel@k
+        supérieur à target_recall est retenue.
+        
+        Args:
+            queries (List[str]): Requêtes de validation (non utilisées pour l'entraînement)
+            dimensions (List[int]): Dimensions candidates
+            target_recall (float): Rappel@k minimal par rapport à la recherche exacte
+            projection (str): "pca" ou "opq"
+            
+        Returns:
+            Dict[str, Any]: Voir index_builder.select_projection_dimension
+        """
+        if not self.vector_store:
+            raise ValueError("Aucune base chargée pour évaluer la projection")
+        with self.lock.read():
+            vectors = reconstruct_all(self.vector_store.index)
+        query_vectors = np.array(self.embeddings.embed_queries(queries), dtype=np.float32)
+        return select_projection_dimension(
+            vectors,
+            query_vectors,
+            dimensions,
+            target_recall=target_recall,
+            projection=projection,
+            k=k
+        )
+    
+    def _on_store_replaced(self):
+        """Invalide les index dérivés quand la base est remplacée"""
+        self._on_positions_changed()
+        self._bm25_index = None
+        self._dedup_index = None
+        self._pending_canonicals.clear()
+        self._tombstones = set()
+        self._dirty_tombstones.clear()
+    
+    def _on_positions_changed(self):
+        """Invalide les index dérivés qui dépendent des positions FAISS"""
+        self._metadata_index = None
+        self._tombstone_positions = None
+        self._store_generation += 1
+        if self.vector_store:
+            # Sous verrou d'écriture : les reconstructions concurrentes restent en lecture seule
+            ensure_direct_map(self.vector_store.index)
+        # Le journal ne sait représenter que des ajouts
+        self._needs_full_save = True
+    
+    def _on_documents_added(self, start: int):
+        """Met à jour les index dérivés avec les documents ajoutés à partir d'une position"""
+        if self._metadata_index is None and self._bm25_index is None and self._dedup_index is None:
+            return
+        for position in range(start, len(self.vector_store.index_to_docstore_id)):
+            doc_id = self.vector_store.index_to_docstore_id[position]
+            doc = self.vector_store.docstore.search(doc_id)
+            if self._metadata_index is not None:
+                self._metadata_index.add(position, doc.metadata, doc.page_content)
+            if self._bm25_index is not None:
+                self._bm25_index.add(doc_id, doc.page_content)
+            if self._dedup_index is not None:
+                # Les chunks retenus par la déduplication sont déjà signés
+                self._pending_canonicals.pop(doc_id, None)
+                if doc_id not in self._dedup_index:
+                    self._dedup_index.add(doc_id, self._dedup_index.signature(doc.page_content))
+    
+    def _get_metadata_index(self) -> MetadataIndex:
+        """Retourne l'index des métadonnées, construit au premier filtrage"""
+        with self._derived_lock:
+            if self._metadata_index is None:
+                self._metadata_index = MetadataIndex.build(
+                    self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[position])
+                    for position in range(len(self.vector_store.index_to_docstore_id))
+                )
+            return self._metadata_index
+    
+    def _get_bm25_index(self) -> BM25Index:
+        """Retourne l'index lexical BM25, construit depuis le docstore s'il n'a pas été chargé"""
+        with self._derived_lock:
+            if self._bm25_index is None:
+                self._bm25_index = BM25Index.build(
+                    (doc_id, self.vector_store.docstore.search(doc_id).page_content)
+                    for doc_id in self.vector_store.index_to_docstore_id.values()
+                    if doc_id not in self._tombstones
+                )
+            return self._bm25_index
+    
+    def _get_dedup_index(self) -> NearDuplicateIndex:
+        """Retourne l'index MinHash, construit depuis le docstore s'il n'a pas été chargé"""
+        if self._dedup_index is None:
+            self._dedup_index = NearDuplicateIndex(threshold=self.dedup_threshold)
+            if self.vector_store:
+                for doc_id in self.vector_store.index_to_docstore_id.values():
+                    if doc_id in self._tombstones:
+                        continue
+                    text = self.vector_store.docstore.search(doc_id).page_content
+                    self._dedup_index.add(doc_id, self._dedup_index.signature(text))
+        return self._dedup_index
+    
+    def _merge_near_duplicate(self, doc_id: str, doc: Document) -> bool:
+        """
+        Rattache un chunk à un chunk quasi identique déjà retenu, avant tout embedding
+        
+        Le chunk retenu reçoit une référence (identifiant, source, identifiants
+        métier) dans metadata["duplicates"].
+        
+        Returns:
+            bool: True si le chunk a été fusionné et ne doit pas être indexé
+        """
+        if self.dedup_threshold is None:
+            return False
+        
+        dedup_index = self._get_dedup_index()
+        if doc_id in dedup_index:
+            # Chunk déjà indexé (reprise d'une ingestion interrompue)
+            return False
+        
+        signature = dedup_index.signature(doc.page_content)
+        match = dedup_index.find(signature)
+        canonical = None
+        if match is not None:
+            canonical = self._pending_canonicals.get(match[0])
+            if canonical is None and self.vector_store:
+                canonical = self.vector_store.docstore.search(match[0])
+        if not isinstance(canonical, Document):
+            dedup_index.add(doc_id, signature)
+            self._pending_canonicals[doc_id] = doc
+            return False
+        
+        if match[0] not in self._pending_canonicals:
+            # Document déjà sauvegardé : ses métadonnées iront dans le journal
+            self._dirty_metadata_ids.add(match[0])
+        references = canonical.metadata.setdefault("duplicates", [])
+        if all(reference["id"] != doc_id for reference in references):
+            reference = {"id": doc_id}
+            reference.update({
+                field: doc.metadata[field]
+                for field in DUPLICATE_REFERENCE_FIELDS
+                if field in doc.metadata
+            })
+            references.append(reference)
+        return True
+    
+    def _bump_index_version(self):
+        """Change la version de l'index, ce qui invalide les résultats en cache"""
+        self.index_version += 1
+        # Les entrées de l'ancienne version ne peuvent plus servir : on libère la mémoire
+        self.result_cache.clear()
+    
+    def _remove_ids(self, doc_ids: List[str]):
+        """Supprime des documents, y compris des index qui ne supportent pas remove_ids"""
+        self._ensure_writable()
+        if self._bm25_index is not None:
+            # L'index lexical est indexé par identifiant : mise à jour sur place
+            for doc_id in doc_ids:
+                self._bm25_index.remove(doc_id, self.vector_store.docstore.search(doc_id).page_content)
+        if self._dedup_index is not None:
+            for doc_id in doc_ids:
+                self._dedup_index.remove(doc_id)
+        self._tombstones.difference_update(doc_ids)
+        if isinstance(faiss.downcast_index(self.vector_store.index), faiss.IndexFlatCodes):
+            # Index à plat : remove_ids referme les positions, comme le suppose LangChain
+            self.vector_store.delete(doc_ids)
+        else:
+            # HNSW, IVF, projections : remove_ids ne renumérote pas (ou échoue),
+            # l'index est reconstruit sans les positions supprimées
+            reversed_index = {id_: idx for idx, id_ in self.vector_store.index_to_docstore_id.items()}
+            positions = {reversed_index[id_] for id_ in doc_ids}
+            self.vector_store.index = rebuild_without(self.vector_store.index, positions)
+            self.vector_store.docstore.delete(doc_ids)
+            remaining_ids = [
+                id_
+                for i, id_ in sorted(self.vector_store.index_to_docstore_id.items())
+                if i not in positions
+            ]
+            self.vector_store.index_to_docstore_id = dict(enumerate(remaining_ids))
+        self._drop_duplicate_references(doc_ids)
+        # Les positions ont été renumérotées
+        self._on_positions_changed()
+        self._bump_index_version()
+    
+    def _drop_duplicate_references(self, doc_ids: List[str]) -> int:
+        """
+        Retire les références de quasi-doublons vers des chunks supprimés
+        
+        Returns:
+            int: Nombre de références retirées
+        """
+        removed_ids = set(doc_ids)
+        dropped = 0
+        for doc_id in self.vector_store.index_to_docstore_id.values():
+            doc = self.vector_store.docstore.search(doc_id)
+            references = doc.metadata.get("duplicates") if isinstance(doc, Document) else None
+            if not references:
+                continue
+            kept = [reference for reference in references if reference["id"] not in removed_ids]
+            if len(kept) != len(references):
+                doc.metadata["duplicates"] = kept
+                self._dirty_metadata_ids.add(doc_id)
+                dropped += len(references) - len(kept)
+        return dropped
+    
+    def _add_tombstones(self, doc_ids: List[str]) -> int:
+        """Marque des documents comme supprimés et les retire des index par identifiant"""
+        new_ids = [doc_id for doc_id in doc_ids if doc_id not in self._tombstones]
+        for doc_id in new_ids:
+            if self._bm25_index is not None:
+                self._bm25_index.remove(doc_id, self.vector_store.docstore.search(doc_id).page_content)
+            if self._dedup_index is not None:
+                # Un document supprimé ne doit plus absorber de nouveaux quasi-doublons
+                self._dedup_index.remove(doc_id)
+        self._tombstones.update(new_ids)
+        self._dirty_tombstones.update(new_ids)
+        if new_ids:
+            self._tombstone_positions = None
+        return len(new_ids)
+    
+    def delete_documents(self, key: str, value: Any) -> int:
+        """
+        Retire les documents portant une métadonnée (ex: un diagnostic validé à tort)
+        
+        Les documents sont marqués par une pierre tombale et exclus des recherches
+        immédiatement ; l'index est reconstruit en arrière-plan lorsque la
+        proportion de documents supprimés dépasse compaction_threshold. Les
+        références de quasi-doublons portant cette valeur sont aussi retirées.
+        Un document supprimé emporte les quasi-doublons qui lui étaient rattachés.
+        
+        Args:
+            key (str): diagnostic_id, inspection_id, plan_id (ou make, model)
+            value (Any): Valeur recherchée
+            
+        Returns:
+            int: Nombre de documents et de références retirés
+        """
+        if key not in KEYWORD_FIELDS:
+            raise ValueError(f"Clé de suppression non indexée: {key} (disponibles: {', '.join(KEYWORD_FIELDS)})")
+        if not self.vector_store:
+            return 0
+        
+        with self.lock.write():
+            index_to_id = self.vector_store.index_to_docstore_id
+            positions = self._get_metadata_index().candidates({key: value})
+            removed = self._add_tombstones([index_to_id[int(position)] for position in positions])
+            
+            for doc_id in index_to_id.values():
+                if doc_id in self._tombstones:
+                    continue
+                doc = self.vector_store.docstore.search(doc_id)
+                references = doc.metadata.get("duplicates")
+                if not references:
+                    continue
+                kept = [reference for reference in references if str(reference.get(key)) != str(value)]
+                if len(kept) != len(references):
+                    doc.metadata["duplicates"] = kept
+                    self._dirty_metadata_ids.add(doc_id)
+                    removed += len(references) - len(kept)
+            
+            if removed:
+                self._bump_index_version()
+                self._maybe_schedule_compaction()
+        return removed
+    
+    def _maybe_schedule_compaction(self):
+        """Lance la compaction en arrière-plan si trop de documents sont supprimés"""
+        if not self.vector_store or self.compaction_threshold is None:
+            return
+        ratio = len(self._tombstones) / max(self.vector_store.index.ntotal, 1)
+        if ratio < self.compaction_threshold:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(
+            target=self._run_compaction,
+            name=f"compaction-{self.store_name}",
+            daemon=True
+        )
+        self._compaction_thread.start()
+    
+    def _run_compaction(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Erreur lors de la compaction de {self.store_name}: {str(e)}")
+    
+    def wait_for_compaction(self, timeout: float = None):
+        """Attend la fin de la compaction en cours, s'il y en a une"""
+        if self._compaction_thread is not None:
+            self._compaction_thread.join(timeout)
+    
+    def compact(self) -> int:
+        """
+        Reconstruit l'index sans les documents supprimés
+        
+        Les vecteurs sont copiés sous verrou de lecture, l'index est reconstruit
+        sans verrou, puis substitué sous verrou d'écriture (les documents ajoutés
+        entre-temps y sont reportés). Les recherches ne sont donc pas bloquées
+        pendant la reconstruction.
+        
+        Returns:
+            int: Nombre de documents physiquement retirés
+        """
+        with self.lock.read():
+            if not self.vector_store or not self._tombstones:
+                return 0
+            store = self.vector_store
+            generation = self._store_generation
+            dead = set(self._tombstones)
+            snapshot_total = store.index.ntotal
+            doc_ids = [store.index_to_docstore_id[position] for position in range(snapshot_total)]
+            keep = np.array([doc_id not in dead for doc_id in doc_ids], dtype=bool)
+            vectors = reconstruct_all(store.index)[keep]
+            rebuilt = faiss.clone_index(store.index)
+        
+        # Reconstruction (la partie coûteuse, notamment pour HNSW) hors verrou
+        rebuilt.reset()
+        if len(vectors):
+            rebuilt.add(vectors)
+        kept_ids = [doc_id for doc_id, alive in zip(doc_ids, keep) if alive]
+        
+        with self.lock.write():
+            if self.vector_store is not store or self._store_generation != generation:
+                # Base remplacée ou renumérotée entre-temps : la compaction est abandonnée
+                return 0
+            extra = np.arange(snapshot_total, store.index.ntotal, dtype=np.int64)
+            if len(extra):
+                rebuilt.add(reconstruct_positions(store.index, extra))
+                kept_ids.extend(store.index_to_docstore_id[int(position)] for position in extra)
+            
+            self.vector_store = FAISS(
+                embedding_function=self.embeddings,
+                index=rebuilt,
+                docstore=InMemoryDocstore({doc_id: store.docstore.search(doc_id) for doc_id in kept_ids}),
+                index_to_docstore_id=dict(enumerate(kept_ids))
+            )
+            self._index_mmapped = False
+            self._tombstones -= dead
+            self._dirty_tombstones -= dead
+            self._on_positions_changed()
+            self._bump_index_version()
+            store_name = self._persisted_store
+        
+        if store_name:
+            # L'écriture ne modifie pas la base : les recherches restent possibles
+            with self.lock.read():
+                self.save_vector_store(store_name)
+        return len(dead)
+    
+    def _manifest_path(self, store_name: str) -> Path:
+        """Chemin du manifeste de réindexation incrémentale"""
+        return self.vector_store_path / f"{store_name}_manifest.json"
+    
+    def _load_manifest(self, store_name: str) -> Dict[str, Any]:
+        """Charge le manifeste (fichier -> taille, mtime, empreinte, chunks)"""
+        manifest_path = self._manifest_path(store_name)
+        if manifest_path.exists():
+            try:
+                with open(manifest_path, "r") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Manifeste illisible pour {store_name}, reconstruction complète: {str(e)}")
+        return {"files": {}}
+    
+    def _save_manifest(self, store_name: str, manifest: Dict[str, Any]):
+        """Sauvegarde le manifeste de manière atomique"""
+        manifest_path = self._manifest_path(store_name)
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+    
+    @staticmethod
+    def _file_hash(file_path: Path) -> str:
+        """Calcule l'empreinte SHA-256 du contenu d'un fichier"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def reindex_incremental(
+        self,
+        file_paths: List[str],
+        store_name: str,
+        force_full: bool = False,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        progress_callback: Callable[[Dict[str, Any]], None] = None,
+        parse_workers: int = None
+    ) -> Dict[str, Any]:
+        """
+        Réindexe une base en ne traitant que les fichiers ajoutés, modifiés ou supprimés
+        
+        Args:
+            file_paths (List[str]): Fichiers ou dossiers sources de la base
+            store_name (str): Nom de la base de connaissances
+            force_full (bool): Ignore le manifeste et reconstruit toute la base
+            batch_size (int): Taille des lots d'embeddings
+            max_concurrency (int): Nombre de lots calculés en parallèle
+            progress_callback (Callable): Reçoit les statistiques d'ingestion après chaque lot
+            parse_workers (int): Nombre de processus de parsing des fichiers
+            
+        Returns:
+            Dict[str, Any]: Nombre de fichiers ajoutés, modifiés, supprimés, inchangés,
+            de chunks indexés, de quasi-doublons fusionnés et débit d'ingestion
+        """
+        stats = {
+            "added": 0,
+            "modified": 0,
+            "removed": 0,
+            "unchanged": 0,
+            "chunks_added": 0,
+            "files_indexed": 0
+        }
+        
+        manifest = {"files": {}} if force_full else self._load_manifest(store_name)
+        # Sans manifeste, on ne peut pas relier les vecteurs existants à leurs fichiers
+        if not manifest["files"] or not self.load_vector_store(store_name):
+            manifest = {"files": {}}
+            self.vector_store = None
+            self._on_store_replaced()
+            self.store_name = store_name
+            self._bump_index_version()
+        
+        current_files = {str(path): path for path in self._expand_paths(file_paths) if path.exists()}
+        to_index = []
+        ids_to_delete = []
+        
+        # Détection des fichiers modifiés ou ajoutés
+        for key, path in current_files.items():
+            stat = path.stat()
+            entry = manifest["files"].get(key)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                stats["unchanged"] += 1
+                continue
+            
+            file_hash = self._file_hash(path)
+            if entry and entry["sha256"] == file_hash:
+                # Contenu identique (fichier simplement touché)
+                entry["mtime"] = stat.st_mtime
+                stats["unchanged"] += 1
+                continue
+            
+            if entry:
+                ids_to_delete.extend(entry["chunk_ids"])
+                stats["modified"] += 1
+            else:
+                stats["added"] += 1
+            to_index.append((key, path, stat, file_hash))
+        
+        # Détection des fichiers supprimés
+        for key in list(manifest["files"]):
+            if key not in current_files:
+                ids_to_delete.extend(manifest["files"].pop(key)["chunk_ids"])
+                stats["removed"] += 1
+        
+        # Les quasi-doublons rattachés à un chunk supprimé perdraient leur contenu :
+        # leurs fichiers sont réindexés avec les autres
+        queued = {key for key, _, _, _ in to_index}
+        checked = 0
+        while self.vector_store and checked < len(ids_to_delete):
+            doc = self.vector_store.docstore.search(ids_to_delete[checked])
+            checked += 1
+            if not isinstance(doc, Document):
+                continue
+            for reference in doc.metadata.get("duplicates", []):
+                key = reference.get("source")
+                if key in current_files and key in manifest["files"] and key not in queued:
+                    entry = manifest["files"][key]
+                    ids_to_delete.extend(entry["chunk_ids"])
+                    to_index.append((key, current_files[key], current_files[key].stat(), entry["sha256"]))
+                    queued.add(key)
+        
+        try:
+            self._ensure_writable()
+            if ids_to_delete and self.vector_store:
+                existing_ids = set(self.vector_store.index_to_docstore_id.values())
+                # Chunks fusionnés dans un autre document : seule leur référence existe
+                merged_ids = [id_ for id_ in ids_to_delete if id_ not in existing_ids]
+                ids_to_delete = [id_ for id_ in ids_to_delete if id_ in existing_ids]
+                if ids_to_delete:
+                    self._remove_ids(ids_to_delete)
+                if merged_ids and self._drop_duplicate_references(merged_ids):
+                    self._bump_index_version()
+            
+            if to_index:
+                def report_progress(ingest_stats: Dict[str, Any]):
+                    # Le flux de chunks n'a pas de taille connue : progression par fichier
+                    ingest_stats["files_done"] = stats["files_indexed"]
+                    ingest_stats["files_total"] = len(to_index)
+                    if progress_callback:
+                        progress_callback(ingest_stats)
+                
+                pipeline = IngestionPipeline(
+                    self,
+                    batch_size=batch_size,
+                    max_concurrency=max_concurrency,
+                    progress_callback=report_progress
+                )
+                ingest_stats = pipeline.run(
+                    self._iter_changed_chunks(to_index, manifest, stats, parse_workers),
+                    store_name,
+                    append=True
+                )
+                stats["chunks_per_second"] = ingest_stats["chunks_per_second"]
+                stats["duplicates"] = ingest_stats["duplicates"]
+            elif ids_to_delete and self.vector_store:
+                self.save_vector_store(store_name)
+            self._save_manifest(store_name, manifest)
+        except Exception as e:
+            print(f"Erreur lors de la réindexation incrémentale de {store_name}: {str(e)}")
+            raise
+        
+        return stats
+    
+    def _iter_changed_chunks(
+        self,
+        to_index: List[Tuple[str, Path, os.stat_result, str]],
+        manifest: Dict[str, Any],
+        stats: Dict[str, Any],
+        parse_workers: int = None
+    ) -> Iterator[Tuple[str, Document]]:
+        """Produit les chunks (id, document) des fichiers à indexer et met à jour le manifeste"""
+        files = {key: (stat, file_hash) for key, _, stat, file_hash in to_index}
+        paths = [path for _, path, _, _ in to_index]
+        
+        for key, file_chunks in self._iter_file_chunks(paths, parse_workers=parse_workers):
+            stat, file_hash = files[key]
+            chunk_ids = []
+            for i, chunk in enumerate(file_chunks):
+                # Identifiants déterministes : une ingestion interrompue peut reprendre
+                chunk_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{key}:{file_hash}:{i}"))
+                chunk_ids.append(chunk_id)
+                yield chunk_id, chunk
+            
+            manifest["files"][key] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": file_hash,
+                "chunk_ids": chunk_ids
+            }
+            stats["chunks_added"] += len(chunk_ids)
+            stats["files_indexed"] += 1
+    
     def delete_vector_store(self, store_name: str) -> bool:
         """Supprime une base de données vectorielle"""
-        store_path = self.vector_store_path / f"{store_name}.pkl"
+        store_dir = self._store_dir(store_name)
+        manifest_path = self._manifest_path(store_name)
         try:
-            if store_path.exists():
-                store_path.unlink()
+            if store_dir.exists():
+                shutil.rmtree(store_dir)
+            if manifest_path.exists():
+                manifest_path.unlink()
             return True
         except Exception as e:
             print(f"Erreur lors de la suppression du vector store: {str(e)}")
@@ -164,11 +1836,28 @@ class VectorStoreManager:
             )
             
             # Sauvegarder le store vide
-            store_path = self.vector_store_path / f"{store_name}.index"
-            self.vector_store.save_local(str(store_path))
+            self._index_mmapped = False
+            self._on_store_replaced()
+            self.store_name = store_name
+            self._bump_index_version()
+            self.save_vector_store(store_name)
             
             st.info(f"Base de connaissances vide '{store_name}' créée avec succès.")
         
         except Exception as e:
             st.error(f"Erreur lors de la création de la base de connaissances vide : {str(e)}")
             raise
+    
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du cache d'embeddings"""
+        return self.embedding_cache.get_stats()
+    
+    def get_query_cache_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du cache LRU des embeddings de requêtes"""
+        return self.embeddings.query_cache.get_stats()
+    
+    def get_result_cache_stats(self) -> Dict[str, Any]:
+        """Retourne le taux de succès et la mémoire du cache de résultats de recherche"""
+        stats = self.result_cache.get_stats()
+        stats.update({"store_name": self.store_name, "index_version": self.index_version})
+        return stats
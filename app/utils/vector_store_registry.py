@@ -0,0 +1,339 @@
+from typing import Any, Callable, Dict, List
+import threading
+import time
+import weakref
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+from app.utils.embedding_backends import resolve_backend
+from app.utils.index_builder import estimate_index_bytes
+from app.utils.lru_cache import estimate_size
+from app.utils.vector_store_manager import VectorStoreManager
+
+
+class _RegistryEntry:
+    """Base chargée une seule fois pour tout le processus"""
+
+    def __init__(self, store_name: str, manager: VectorStoreManager, manager_options: Dict[str, Any]):
+        self.store_name = store_name
+        self.manager = manager
+        self.manager_options = manager_options
+        # Tenu pendant toute une reconstruction : seules les écritures qui remplacent
+        # la base (create_vector_store, reindex_incremental...) l'attendent
+        self.rebuild_lock = threading.RLock()
+        # Tenu par toutes les écritures, et brièvement par une reconstruction
+        # (chargement de la copie, substitution)
+        self.sync_lock = threading.RLock()
+        # Écritures faites pendant une reconstruction, rejouées sur la copie reconstruite
+        self.pending_writes = None
+        self.refcount = 0
+        self.loaded = False
+        self.loaded_at = None
+
+    @property
+    def lock(self):
+        """Verrou du gestionnaire servi : partagé avec ses tâches de fond (compaction)"""
+        return self.manager.lock
+
+    @contextmanager
+    def exclusive(self, wait_for_rebuild: bool = False):
+        """
+        Accès exclusif au gestionnaire servi
+
+        Args:
+            wait_for_rebuild (bool): Attend la fin d'une reconstruction en cours
+        """
+        with self.rebuild_lock if wait_for_rebuild else nullcontext():
+            with self.sync_lock:
+                with self.lock.write():
+                    yield
+
+
+class SharedVectorStore:
+    """
+    Accès d'une session à une base partagée
+
+    S'utilise comme un VectorStoreManager : les recherches prennent le verrou en
+    lecture, toutes les autres méthodes le verrou en écriture. Une base acquise
+    en mode différé est chargée au premier accès. La référence est rendue au
+    registre par release() ou à la destruction de l'objet.
+    """
+
+    READ_METHODS = frozenset({
+        "similarity_search",
+        "similarity_search_batch",
+        "hybrid_search",
+        "get_embedding_cache_stats",
+        "get_query_cache_stats",
+        "get_result_cache_stats"
+    })
+    # Méthodes qui gèrent elles-mêmes le verrou (compaction en arrière-plan)
+    SELF_LOCKING_METHODS = frozenset({"compact", "wait_for_compaction"})
+    # Écritures ponctuelles : pendant une reconstruction, elles s'appliquent à la
+    # version servie et sont rejouées sur la nouvelle au lieu d'attendre
+    REPLAYED_METHODS = frozenset({"add_texts", "add_texts_and_save", "delete_documents", "save_vector_store"})
+
+    def __init__(self, registry: "VectorStoreRegistry", entry: _RegistryEntry):
+        self._entry = entry
+        self._registry = registry
+        self.store_name = entry.store_name
+        self._finalizer = weakref.finalize(self, registry.release, entry.store_name)
+
+    def __getattr__(self, name: str) -> Any:
+        self._registry._ensure_loaded(self._entry)
+        attribute = getattr(self._entry.manager, name)
+        if not callable(attribute) or name in self.SELF_LOCKING_METHODS:
+            return attribute
+
+        entry = self._entry
+        if name in self.READ_METHODS:
+            lock = entry.lock.read
+
+            @wraps(attribute)
+            def locked(*args, **kwargs):
+                with lock():
+                    return attribute(*args, **kwargs)
+            return locked
+
+        replayed = name in self.REPLAYED_METHODS
+
+        @wraps(attribute)
+        def locked(*args, **kwargs):
+            with entry.exclusive(wait_for_rebuild=not replayed):
+                # Gestionnaire relu sous le verrou : il a pu être substitué entre-temps
+                result = getattr(entry.manager, name)(*args, **kwargs)
+                if replayed and entry.pending_writes is not None:
+                    entry.pending_writes.append((name, args, kwargs))
+                return result
+        return locked
+
+    def reading(self):
+        """Verrou en lecture pour enchaîner plusieurs recherches cohérentes"""
+        # Chargement avant le verrou : il prend le verrou en écriture
+        self._registry._ensure_loaded(self._entry)
+        return self._entry.lock.read()
+
+    def writing(self):
+        """
+        Verrou exclusif pour enchaîner plusieurs modifications (ex: ajout puis sauvegarde)
+
+        Pendant une reconstruction, seules les écritures rejouées (REPLAYED_METHODS)
+        peuvent être appelées dans ce bloc.
+        """
+        self._registry._ensure_loaded(self._entry)
+        return self._entry.exclusive()
+
+    def release(self):
+        """Rend la référence au registre (sans effet si déjà rendue)"""
+        self._finalizer()
+
+
+class VectorStoreRegistry:
+    """
+    Registre des bases vectorielles, partagé par toutes les sessions du processus
+
+    Chaque base n'est chargée qu'une fois ; les gestionnaires d'un même modèle
+    partagent le client et les caches d'embeddings.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super(VectorStoreRegistry, cls).__new__(cls)
+                instance._entries: Dict[str, _RegistryEntry] = {}
+                instance._lock = threading.Lock()
+                cls._instance = instance
+        return cls._instance
+
+    def acquire(self, store_name: str, lazy: bool = False, **manager_options) -> SharedVectorStore:
+        """
+        Retourne un accès à la base, chargée au premier appel
+
+        Args:
+            store_name (str): Nom de la base de connaissances
+            lazy (bool): Diffère le chargement au premier accès (recherche, ajout...)
+            **manager_options: Options du VectorStoreManager, utilisées seulement
+                lors de la création de la base partagée
+        """
+        with self._lock:
+            entry = self._get_entry(store_name, manager_options)
+            entry.refcount += 1
+
+        if not lazy:
+            self._ensure_loaded(entry)
+        return SharedVectorStore(self, entry)
+
+    def _get_entry(self, store_name: str, manager_options: Dict[str, Any]) -> _RegistryEntry:
+        """Entrée d'une base, créée si besoin (à appeler sous self._lock)"""
+        entry = self._entries.get(store_name)
+        if entry is None:
+            entry = _RegistryEntry(store_name, self._create_manager(dict(manager_options)), manager_options)
+            self._entries[store_name] = entry
+        return entry
+
+    def _ensure_loaded(self, entry: _RegistryEntry):
+        """Charge la base d'une entrée si ce n'est pas encore fait"""
+        if entry.loaded:
+            return
+        with entry.exclusive():
+            if not entry.loaded:
+                # Une base absente reste vide : elle sera créée au premier ajout
+                entry.manager.load_vector_store(entry.store_name)
+                entry.manager.store_name = entry.store_name
+                entry.loaded = True
+                entry.loaded_at = time.time()
+
+    def warm_up(self, store_names: List[str], **manager_options) -> threading.Thread:
+        """
+        Charge des bases en arrière-plan, sans attendre leur première requête
+
+        Une requête arrivant pendant le chargement attend simplement sa fin.
+
+        Returns:
+            threading.Thread: Thread de préchargement (démon)
+        """
+        with self._lock:
+            entries = [self._get_entry(store_name, dict(manager_options)) for store_name in store_names]
+
+        def load_all():
+            for entry in entries:
+                try:
+                    self._ensure_loaded(entry)
+                except Exception as e:
+                    print(f"Erreur lors du préchargement de {entry.store_name}: {str(e)}")
+
+        thread = threading.Thread(target=load_all, name="vector-store-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _create_manager(self, manager_options: Dict[str, Any]) -> VectorStoreManager:
+        """Crée un gestionnaire en réutilisant les embeddings d'une base du même modèle"""
+        backend = resolve_backend(
+            manager_options.get("embedding_backend"),
+            manager_options.get("embedding_model")
+        )
+        for entry in self._entries.values():
+            if (entry.manager.embedding_backend, entry.manager.embedding_model) == backend:
+                manager_options.setdefault("embedding_cache", entry.manager.embedding_cache)
+                manager_options.setdefault("embeddings", entry.manager.embeddings)
+                break
+        return VectorStoreManager(**manager_options)
+
+    def rebuild(self, store_name: str, build: Callable[[VectorStoreManager], Any], **manager_options) -> Any:
+        """
+        Reconstruit une base à côté de la version servie, puis la substitue
+
+        La reconstruction se fait sur un gestionnaire distinct, chargé depuis
+        l'instantané courant : les recherches continuent sur l'ancienne version
+        jusqu'à la substitution. Les écritures ponctuelles (ajout d'un cas,
+        retrait, sauvegarde) n'attendent pas : elles s'appliquent à l'ancienne
+        version, qui ne publie plus d'instantané complet d'ici la fin, puis sont
+        rejouées sur la nouvelle avant la substitution. L'ancien gestionnaire est
+        ensuite retiré : sa compaction éventuelle se termine avant la substitution
+        et ne peut plus rien publier.
+
+        Args:
+            store_name (str): Nom de la base de connaissances
+            build (Callable): Reçoit le nouveau gestionnaire et le remplit
+                (ex: reindex_incremental, qui publie un nouvel instantané)
+            **manager_options: Options du VectorStoreManager si la base n'est pas encore ouverte
+
+        Returns:
+            Any: Valeur retournée par build
+        """
+        with self._lock:
+            entry = self._get_entry(store_name, manager_options)
+        self._ensure_loaded(entry)
+
+        with entry.rebuild_lock:
+            previous = entry.manager
+            with self._lock:
+                staging = self._create_manager(dict(entry.manager_options))
+            with entry.sync_lock:
+                # Sous le verrou d'écriture : une compaction en train de sauvegarder termine avant
+                with previous.lock.write():
+                    previous.defer_snapshots = True
+                staging.load_vector_store(store_name)
+                staging.store_name = store_name
+                entry.pending_writes = []
+
+            try:
+                result = build(staging)
+            except Exception:
+                with entry.sync_lock:
+                    deferred = entry.pending_writes
+                    entry.pending_writes = None
+                    with previous.lock.write():
+                        previous.defer_snapshots = False
+                        if deferred:
+                            previous.save_vector_store(store_name)
+                raise
+
+            # Plus de compaction sur l'ancienne version, ni de publication ensuite
+            previous.retire()
+            with entry.sync_lock:
+                with previous.lock.write():
+                    for name, args, kwargs in entry.pending_writes:
+                        getattr(staging, name)(*args, **kwargs)
+                    entry.pending_writes = None
+                    # Substitution : les lectures en cours terminent sur l'ancien gestionnaire
+                    entry.manager = staging
+                    entry.loaded_at = time.time()
+        return result
+
+    def release(self, store_name: str):
+        """Décrémente le compteur de références d'une base"""
+        with self._lock:
+            entry = self._entries.get(store_name)
+            if entry is not None and entry.refcount > 0:
+                entry.refcount -= 1
+
+    def unload_unused(self) -> List[str]:
+        """Libère les bases qui ne sont plus référencées par aucune session"""
+        with self._lock:
+            unused = [name for name, entry in self._entries.items() if entry.refcount == 0]
+            for name in unused:
+                del self._entries[name]
+        return unused
+
+    def get_memory_report(self) -> List[Dict[str, Any]]:
+        """
+        Mémoire occupée par chaque base partagée
+
+        Returns:
+            List[Dict[str, Any]]: Par base : références, documents, taille de l'index
+            (privée ou mappée depuis le disque), du docstore et du cache de résultats
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+
+        report = []
+        for entry in entries:
+            with entry.lock.read():
+                manager = entry.manager
+                store = manager.vector_store
+                row = {
+                    "store_name": entry.store_name,
+                    "refcount": entry.refcount,
+                    "documents": 0,
+                    "index_bytes": 0,
+                    "mapped_index_bytes": 0,
+                    "docstore_bytes": 0,
+                    "result_cache_bytes": manager.result_cache.memory_bytes
+                }
+                if store is not None:
+                    row["documents"] = store.index.ntotal
+                    if manager._index_mmapped and manager._index_file.exists():
+                        # Pages partagées avec les autres processus via le cache disque
+                        row["mapped_index_bytes"] = manager._index_file.stat().st_size
+                    else:
+                        # Estimation : sérialiser l'index le copierait entièrement
+                        row["index_bytes"] = estimate_index_bytes(store.index)
+                    row["docstore_bytes"] = sum(
+                        estimate_size(doc) for doc in store.docstore._dict.values()
+                    )
+                report.append(row)
+        return report
@@ -0,0 +1,80 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import base64
+import json
+import os
+import threading
+from pathlib import Path
+import numpy as np
+
+
+class WriteAheadLog:
+    """
+    Journal en ajout seul des modifications d'une base vectorielle
+
+    Chaque ligne est un enregistrement JSON : ajout d'un document avec son
+    vecteur ("add"), remplacement de ses métadonnées ("metadata") ou
+    suppression par pierre tombale ("delete", identifiant seul). Chaque
+    écriture est synchronisée sur disque (fsync) avant de rendre la main ; une
+    dernière ligne incomplète (arrêt pendant l'écriture) est ignorée à la relecture.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def encode_vector(vector: Iterable[float]) -> str:
+        return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+    @staticmethod
+    def decode_vector(encoded: str) -> np.ndarray:
+        return np.frombuffer(base64.b64decode(encoded), dtype=np.float32)
+
+    def append(self, records: List[Dict[str, Any]]):
+        """Ajoute des enregistrements au journal et les synchronise sur disque"""
+        if not records:
+            return
+        payload = "".join(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for record in records
+        ).encode("utf-8")
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def replay(self) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Relit les enregistrements complets du journal
+
+        Returns:
+            Tuple: Enregistrements valides, et position de fin du dernier
+            enregistrement valide si une fin de fichier corrompue a été ignorée
+        """
+        if not self.path.exists():
+            return [], None
+
+        records = []
+        valid_end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return records, valid_end
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    return records, valid_end
+                valid_end += len(line)
+        return records, None
+
+    def truncate(self, size: int = 0):
+        """Tronque le journal (0 : vidé après compaction dans l'index principal)"""
+        with self._lock:
+            if not self.path.exists():
+                return
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+                f.flush()
+                os.fsync(f.fileno())
@@ -15,6 +15,9 @@ from app.utils.export_manager import ExportManager
 from app.utils.notification_manager import NotificationManager
 from app.utils.animation_manager import AnimationManager
 from app.utils.search_manager import SearchManager
+from app.utils.vector_store_registry import VectorStoreRegistry
+from app.utils.reindex_jobs import ReindexJobRunner
+from app.utils.semantic_cache import SemanticCache
 
 # Configuration de la page
 st.set_page_config(
@@ -30,18 +33,36 @@ notification_manager = NotificationManager()
 animation_manager = AnimationManager()
 search_manager = SearchManager()
 
-# Initialisation des flows
-try:
-    if 'diagnostic_flow' not in st.session_state:
-        st.session_state.diagnostic_flow = DiagnosticFlow()
-    if 'inspection_flow' not in st.session_state:
-        st.session_state.inspection_flow = InspectionFlow()
-    if 'maintenance_flow' not in st.session_state:
-        st.session_state.maintenance_flow = MaintenanceFlow()
-except Exception as e:
-    st.error(f"Erreur lors de l'initialisation des flux : {str(e)}")
-    st.error("Détails de l'erreur :")
-    st.error(traceback.format_exc())
+# Préchargement des bases de connaissances en arrière-plan (une fois par processus) :
+# le premier affichage n'attend pas la désérialisation des index
+@st.cache_resource
+def warm_up_knowledge_bases():
+    return VectorStoreRegistry().warm_up(["diagnostic_kb", "inspection_kb", "maintenance_kb"])
+
+warm_up_knowledge_bases()
+
+# Exécuteur des réindexations en arrière-plan, partagé par toutes les sessions
+@st.cache_resource
+def get_reindex_runner():
+    return ReindexJobRunner(VectorStoreRegistry())
+
+# Cache sémantique des diagnostics, partagé par toutes les sessions
+@st.cache_resource
+def get_semantic_cache():
+    diagnostic_kb = VectorStoreRegistry().acquire("diagnostic_kb", lazy=True)
+    return SemanticCache(lambda text: diagnostic_kb.embeddings.embed_query(text))
+
+# Les flows sont créés à la première ouverture de leur page
+def get_flow(key, flow_class, **flow_options):
+    if key not in st.session_state:
+        try:
+            st.session_state[key] = flow_class(**flow_options)
+        except Exception as e:
+            st.error(f"Erreur lors de l'initialisation des flux : {str(e)}")
+            st.error("Détails de l'erreur :")
+            st.error(traceback.format_exc())
+            st.stop()
+    return st.session_state[key]
 
 # Chargement du thème
 current_theme = theme_manager.load_theme_preference()
@@ -104,13 +125,13 @@ if selected == "Tableau de Bord":
     # ... (code des graphiques)
 
 elif selected == "Diagnostic":
-    st.session_state.diagnostic_flow.show_diagnostic_interface()
+    get_flow("diagnostic_flow", DiagnosticFlow, semantic_cache=get_semantic_cache()).show_diagnostic_interface()
 
 elif selected == "Inspection":
-    st.session_state.inspection_flow.show_inspection_interface()
+    get_flow("inspection_flow", InspectionFlow).show_inspection_interface()
 
 elif selected == "Maintenance":
-    st.session_state.maintenance_flow.show_maintenance_interface()
+    get_flow("maintenance_flow", MaintenanceFlow).show_maintenance_interface()
 
 elif selected == "Historique":
     st.title("Historique")
@@ -146,6 +167,26 @@ elif selected == "Historique":
     search_manager.create_data_table(filtered_data)
     search_manager.create_search_summary(filtered_data, len(data))
 
+    # Retrait d'un cas de la base de connaissances (ex: validé à tort)
+    with st.expander("Retirer un cas de la base de connaissances"):
+        store_name, id_field = {
+            "Diagnostics": ("diagnostic_kb", "diagnostic_id"),
+            "Inspections": ("inspection_kb", "inspection_id"),
+            "Maintenances": ("maintenance_kb", "plan_id")
+        }[history_type]
+        case_id = st.text_input(f"Identifiant ({id_field})")
+        if st.button("Retirer le cas") and case_id:
+            vector_store = VectorStoreRegistry().acquire(store_name)
+            with vector_store.writing():
+                removed = vector_store.delete_documents(id_field, case_id)
+                if removed:
+                    vector_store.save_vector_store(store_name)
+            vector_store.release()
+            if removed:
+                st.success(f"{removed} élément(s) retiré(s) de {store_name}")
+            else:
+                st.warning(f"Aucun document avec {id_field} = {case_id}")
+
 elif selected == "Paramètres":
     st.title("Paramètres")
     
@@ -176,24 +217,44 @@ elif selected == "Paramètres":
     
     # Base de connaissances
     st.subheader("Base de Connaissances")
-    if st.button("Réindexer la Base de Connaissances"):
-        with st.spinner("Réindexation en cours..."):
-            # Réindexation des bases de connaissances
-            vector_store = VectorStoreManager()
-            
-            # Diagnostic KB
-            diagnostic_docs = vector_store.load_documents(["data/diagnostic_reports"])
-            vector_store.create_vector_store(diagnostic_docs, "diagnostic_kb")
-            
-            # Inspection KB
-            inspection_docs = vector_store.load_documents(["data/inspection_reports"])
-            vector_store.create_vector_store(inspection_docs, "inspection_kb")
-            
-            # Maintenance KB
-            maintenance_docs = vector_store.load_documents(["data/maintenance_plans"])
-            vector_store.create_vector_store(maintenance_docs, "maintenance_kb")
-            
-            st.success("Base de connaissances réindexée avec succès!")
+    full_rebuild = st.checkbox(
+        "Reconstruction complète",
+        help="Ignore le manifeste et réindexe tous les fichiers"
+    )
+    
+    # La réindexation tourne en arrière-plan : la page ne fait que lire l'état de la tâche
+    get_reindex_runner().show_status_panel(
+        {
+            "diagnostic_kb": "data/diagnostic_reports",
+            "inspection_kb": "data/inspection_reports",
+            "maintenance_kb": "data/maintenance_plans"
+        },
+        force_full=full_rebuild
+    )
+    
+    # Cache sémantique des diagnostics : un taux de faux positifs élevé impose un seuil plus strict
+    semantic_stats = get_semantic_cache().get_stats()
+    st.caption(
+        f"Cache sémantique des diagnostics : {semantic_stats['entries']} entrées, "
+        f"{semantic_stats['hits']} réutilisés ({semantic_stats['hit_rate']:.0%}), "
+        f"{semantic_stats['false_hits']} signalés inadaptés ({semantic_stats['false_hit_rate']:.0%}), "
+        f"seuil {semantic_stats['threshold']:.2f}"
+    )
+    
+    # Mémoire des bases partagées entre les sessions
+    if st.checkbox("Afficher la mémoire des bases partagées"):
+        st.table([
+            {
+                "Base": row["store_name"],
+                "Sessions": row["refcount"],
+                "Documents": row["documents"],
+                "Index (Mo)": round(row["index_bytes"] / 1e6, 1),
+                "Index mappé (Mo)": round(row["mapped_index_bytes"] / 1e6, 1),
+                "Docstore (Mo)": round(row["docstore_bytes"] / 1e6, 1),
+                "Cache résultats (Mo)": round(row["result_cache_bytes"] / 1e6, 1)
+            }
+            for row in VectorStoreRegistry().get_memory_report()
+        ])
 
 # Footer avec animation
 st.markdown("---")
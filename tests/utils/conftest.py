@@ -0,0 +1,66 @@
+import os
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.utils.vector_store_manager import VectorStoreManager
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Embeddings déterministes qui comptent les textes envoyés"""
+    calls: int = 0
+    requests: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        self.requests += 1
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+    def embed_queries(self, texts):
+        # Lot de requêtes : un seul appel au backend
+        self.requests += 1
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def fake_embeddings():
+    return CountingEmbeddings(size=16)
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch, fake_embeddings):
+    monkeypatch.chdir(tmp_path)
+    manager = VectorStoreManager()
+    manager.embeddings.embeddings = fake_embeddings
+    return manager
+
+
+def _snapshot_dir(store_dir):
+    """Instantané servi d'une base (désigné par CURRENT)"""
+    return store_dir / "snapshots" / (store_dir / "CURRENT").read_text()
+
+
+def _make_documents(count):
+    return [
+        Document(
+            page_content=f"Camion {i}: code P04{i:02d} perte de puissance",
+            metadata={"source": f"rapport_{i}.txt"}
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def snapshot_dir():
+    return _snapshot_dir
+
+
+@pytest.fixture
+def make_documents():
+    return _make_documents
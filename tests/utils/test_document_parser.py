@@ -0,0 +1,78 @@
+import time
+from pathlib import Path
+from app.utils import document_parser
+from app.utils.document_parser import ParallelDocumentParser
+
+
+def test_streaming_loader_yields_row_batches(manager, tmp_path):
+    csv_path = tmp_path / "historique.csv"
+    rows = ["vin,code"] + [f"VIN{i},P0{i:03d}" for i in range(25)]
+    csv_path.write_text("\n".join(rows))
+
+    chunks = manager.iter_document_chunks([str(csv_path)], batch_size=10)
+    first = next(chunks)
+    assert "VIN0" in first.page_content
+    assert len(list(chunks)) == 24
+
+    assert manager.create_vector_store_from_files([str(csv_path)], "maintenance_kb")
+    assert manager.vector_store.index.ntotal == 25
+
+
+def test_parallel_parsing_keeps_order_and_isolates_failures(manager, tmp_path):
+    manuals = tmp_path / "manuels"
+    manuals.mkdir()
+    for i in range(4):
+        (manuals / f"manuel_{i}.txt").write_text(f"Manuel {i}: procédure de purge du circuit")
+    (manuals / "manuel_2b.pdf").write_bytes(b"pas un vrai PDF")
+
+    chunks = manager.load_documents([str(manuals)], parse_workers=2)
+    assert [chunk.page_content[:8] for chunk in chunks] == [f"Manuel {i}" for i in range(4)]
+
+    failed = [report for report in manager.parse_report if report["error"]]
+    assert len(manager.parse_report) == 5
+    assert [Path(report["path"]).name for report in failed] == ["manuel_2b.pdf"]
+
+
+def test_parallel_parsing_keeps_csv_and_json_streamed(manager, tmp_path, monkeypatch):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    for i in range(2):
+        (sources / f"manuel_{i}.txt").write_text(f"Manuel {i}: procédure de purge du circuit")
+    rows = ["vin,code"] + [f"VIN{i},P0{i:03d}" for i in range(25)]
+    (sources / "historique.csv").write_text("\n".join(rows))
+
+    submitted = []
+    iter_parsed = ParallelDocumentParser.iter_parsed
+
+    def recording_iter_parsed(self, file_paths):
+        submitted.extend(Path(path).name for path in file_paths)
+        return iter_parsed(self, file_paths)
+
+    monkeypatch.setattr(ParallelDocumentParser, "iter_parsed", recording_iter_parsed)
+    chunks = manager.load_documents([str(sources)], parse_workers=2)
+
+    # Le CSV n'est pas chargé d'un bloc par un processus : il reste lu par lots de lignes
+    assert submitted == ["manuel_0.txt", "manuel_1.txt"]
+    assert [chunk.page_content[:8] for chunk in chunks[:1] + chunks[-2:]] == ["vin: VIN", "Manuel 0", "Manuel 1"]
+    assert len(chunks) == 27
+    assert [(Path(report["path"]).name, report["chunks"]) for report in manager.parse_report] == [
+        ("historique.csv", 25), ("manuel_0.txt", 1), ("manuel_1.txt", 1)
+    ]
+
+
+def hanging_parse_file(file_path, chunk_size, chunk_overlap):
+    if "bloque" in file_path:
+        time.sleep(120)
+    return {"path": file_path, "chunks": [], "elapsed_seconds": 0.0, "error": None}
+
+
+def test_parsing_timeout_replaces_the_blocked_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_parser, "parse_file", hanging_parse_file)
+    paths = [str(tmp_path / name) for name in ("bloque.txt", "a.txt", "b.txt")]
+    parser = ParallelDocumentParser(workers=1, file_timeout=1.0)
+
+    start = time.time()
+    results = list(parser.iter_parsed(paths))
+    # Le seul processus, bloqué, est remplacé : les fichiers suivants sont traités
+    assert [result["error"] is None for result in results] == [False, True, True]
+    assert time.time() - start < 30
@@ -0,0 +1,23 @@
+import json
+import pytest
+from app.utils.vector_store_manager import VectorStoreManager
+
+
+def test_hashing_backend_works_offline_and_is_recorded(tmp_path, monkeypatch, make_documents, snapshot_dir):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("OPENAI_API_KEY")
+    manager = VectorStoreManager(embedding_backend="hashing")
+    assert manager.create_vector_store(make_documents(10), "diagnostic_kb")
+
+    results = manager.similarity_search("code P0407 perte de puissance", k=1)
+    assert results[0]["content"].startswith("Camion 7:")
+    assert not manager.get_embedding_cache_stats()["entries"]
+
+    with open(snapshot_dir(tmp_path / "data/vector_store/diagnostic_kb") / "meta.json") as f:
+        assert json.load(f)["embedding_backend"] == "hashing"
+
+    # Des vecteurs d'un autre backend ne peuvent pas être mélangés à la base
+    other = VectorStoreManager(embedding_backend="hashing", embedding_model="hashing-128")
+    assert not other.load_vector_store("diagnostic_kb")
+    with pytest.raises(ValueError):
+        VectorStoreManager(embedding_backend="openai")
@@ -0,0 +1,90 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from app.utils.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+class AsymmetricEmbeddings(DeterministicFakeEmbedding):
+    """Modèle qui encode les requêtes avec un préfixe (ex: « query: » / « passage: »)"""
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents([f"passage: {text}" for text in texts])
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(f"query: {text}")
+
+
+def test_embedding_cache_skips_known_chunks(manager, fake_embeddings, make_documents):
+    documents = make_documents(5)
+    assert manager.create_vector_store(documents, "diagnostic_kb")
+    assert fake_embeddings.calls == 5
+
+    # Une seule nouvelle entrée : seul ce chunk doit être calculé
+    assert manager.create_vector_store(documents + make_documents(6)[5:], "diagnostic_kb")
+    assert fake_embeddings.calls == 6
+
+    stats = manager.get_embedding_cache_stats()
+    assert stats["hits"] == 5
+    assert stats["misses"] == 6
+
+
+def test_embedding_cache_is_keyed_by_model(tmp_path, fake_embeddings):
+    cache = EmbeddingCache(cache_path=str(tmp_path / "cache.sqlite"))
+    CachedEmbeddings(fake_embeddings, cache, "model-a").embed_documents(["texte"])
+    CachedEmbeddings(fake_embeddings, cache, "model-b").embed_documents(["texte"])
+    assert fake_embeddings.calls == 2
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path, fake_embeddings):
+    cache = EmbeddingCache(cache_path=str(tmp_path / "cache.sqlite"), max_entries=10)
+    embeddings = CachedEmbeddings(fake_embeddings, cache, "model")
+    embeddings.embed_documents([f"texte {i}" for i in range(25)])
+
+    stats = cache.get_stats()
+    assert stats["entries"] <= 10
+    assert stats["evictions"] > 0
+
+
+def test_query_embeddings_hit_lru_after_whitespace_normalization(manager, fake_embeddings, make_documents):
+    manager.create_vector_store(make_documents(3), "diagnostic_kb")
+    calls_before = fake_embeddings.calls
+
+    manager.similarity_search("""
+        Véhicule: Volvo VNL 2019
+        Symptômes: perte de puissance
+        """)
+    # k différent : le cache de résultats ne répond pas, mais l'embedding est réutilisé
+    manager.similarity_search("Véhicule: Volvo VNL 2019 Symptômes: perte de puissance", k=2)
+    assert fake_embeddings.calls == calls_before + 1
+
+    stats = manager.get_query_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_batched_queries_use_the_query_encoding(tmp_path):
+    cache = EmbeddingCache(cache_path=str(tmp_path / "cache.sqlite"))
+    single = CachedEmbeddings(AsymmetricEmbeddings(size=16), cache, "model", spill_queries_to_disk=False)
+    batched = CachedEmbeddings(AsymmetricEmbeddings(size=16), cache, "model", spill_queries_to_disk=False)
+
+    queries = ["perte de puissance", "code P0420"]
+    assert batched.embed_queries(queries) == [single.embed_query(query) for query in queries]
+
+
+def test_query_vectors_are_spilled_apart_from_document_vectors(tmp_path):
+    cache = EmbeddingCache(cache_path=str(tmp_path / "cache.sqlite"))
+    backend = AsymmetricEmbeddings(size=16)
+    embeddings = CachedEmbeddings(backend, cache, "model")
+
+    document_vector = embeddings.embed_documents(["code P0420"])[0]
+    query_vector = embeddings.embed_query("code P0420")
+    assert query_vector == backend.embed_query("code P0420")
+    assert query_vector != document_vector
+
+    # Relu depuis le disque par une autre instance, chacun dans son espace
+    other = CachedEmbeddings(AsymmetricEmbeddings(size=16), cache, "model")
+    assert other.embed_queries(["code P0420"])[0] == pytest.approx(query_vector, rel=1e-6)
+    assert other.embed_documents(["code P0420"])[0] == pytest.approx(document_vector, rel=1e-6)
+    assert other.embeddings.calls == 0
@@ -0,0 +1,143 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import pytest
+from app.utils.index_builder import apply_vector_storage, apply_projection, reconstruct_all
+from app.utils.vector_store_manager import VectorStoreManager
+
+
+@pytest.mark.parametrize("factory, search_options", [
+    ("HNSW16", {"ef_search": 32}),
+    ("IVF2,Flat", {"nprobe": 2}),
+])
+def test_ann_index_is_trained_past_threshold(tmp_path, monkeypatch, fake_embeddings, factory, search_options, make_documents):
+    monkeypatch.chdir(tmp_path)
+    manager = VectorStoreManager(index_factory=factory, train_threshold=50)
+    manager.embeddings.embeddings = fake_embeddings
+
+    assert manager.create_vector_store(make_documents(40), "diagnostic_kb")
+    assert isinstance(faiss.downcast_index(manager.vector_store.index), faiss.IndexFlat)
+
+    assert manager.create_vector_store(make_documents(100), "diagnostic_kb")
+    assert not isinstance(faiss.downcast_index(manager.vector_store.index), faiss.IndexFlat)
+    result = manager.similarity_search("Camion 7: code P0407 perte de puissance", k=1, **search_options)
+    assert result[0]["metadata"]["source"] == "rapport_7.txt"
+
+    # Le type d'index est restauré au chargement et les suppressions restent possibles
+    reloaded = VectorStoreManager()
+    reloaded.embeddings.embeddings = fake_embeddings
+    assert reloaded.load_vector_store("diagnostic_kb")
+    assert reloaded.index_factory == factory
+    reloaded._remove_ids([reloaded.vector_store.index_to_docstore_id[7]])
+    assert reloaded.vector_store.index.ntotal == 99
+    result = reloaded.similarity_search("Camion 7: code P0407 perte de puissance", k=1, **search_options)
+    assert result[0]["metadata"]["source"] != "rapport_7.txt"
+
+
+def test_scalar_quantized_storage_reports_recall(tmp_path, monkeypatch, fake_embeddings, make_documents, snapshot_dir):
+    assert apply_vector_storage("Flat", "float16") == "SQfp16"
+    assert apply_vector_storage("HNSW32", "sq8") == "HNSW32,SQ8"
+    assert apply_vector_storage("IVF1024,Flat", "sq8") == "IVF1024,SQ8"
+    with pytest.raises(ValueError):
+        apply_vector_storage("IVF1024,PQ64", "sq8")
+
+    monkeypatch.chdir(tmp_path)
+    manager = VectorStoreManager(vector_storage="sq8", train_threshold=0)
+    manager.embeddings.embeddings = fake_embeddings
+    assert manager.create_vector_store(make_documents(300), "diagnostic_kb")
+    assert type(faiss.downcast_index(manager.vector_store.index)).__name__ == "IndexScalarQuantizer"
+    assert manager.storage_recall > 0.8
+    assert manager.similarity_search("code P0407", k=1)
+
+    with open(snapshot_dir(tmp_path / "data/vector_store/diagnostic_kb") / "meta.json") as f:
+        meta = json.load(f)
+    assert meta["index_factory"] == "SQ8"
+    assert meta["storage_recall"] == manager.storage_recall
+
+    # L'encodage est retrouvé au rechargement
+    reloaded = VectorStoreManager()
+    reloaded.embeddings.embeddings = fake_embeddings
+    assert reloaded.load_vector_store("diagnostic_kb")
+    assert reloaded.index_factory == "SQ8"
+
+
+def test_pca_projection_is_trained_and_applied_to_queries(tmp_path, monkeypatch, fake_embeddings, make_documents):
+    assert apply_projection("HNSW32,SQ8", "pca", 256) == "PCA256,HNSW32,SQ8"
+    assert apply_projection("PCA256,Flat", "opq", 128) == "OPQ16_128,Flat"
+    with pytest.raises(ValueError):
+        apply_projection("Flat", "opq", 100)
+
+    monkeypatch.chdir(tmp_path)
+    manager = VectorStoreManager(projection="pca", projected_dimension=8, train_threshold=0)
+    manager.embeddings.embeddings = fake_embeddings
+    assert manager.create_vector_store(make_documents(60), "diagnostic_kb")
+    index = manager.vector_store.index
+    assert isinstance(index, faiss.IndexPreTransform)
+    assert (index.d, faiss.downcast_index(index.index).d) == (16, 8)
+    assert manager.similarity_search("code P0407", k=3)
+
+    reloaded = VectorStoreManager()
+    reloaded.embeddings.embeddings = fake_embeddings
+    assert reloaded.load_vector_store("diagnostic_kb")
+    assert reloaded.index_factory == "PCA8,Flat"
+    assert reloaded.add_texts(["Cas validé: capteur NOx remplacé"], [{"diagnostic_id": "d1"}])
+    assert reloaded.similarity_search("capteur", k=1, filters={"diagnostic_id": "d1"})
+
+    # Choix de la dimension sur des requêtes de validation
+    report = manager.select_projection_dimension(
+        [f"perte de puissance camion {i}" for i in range(20)],
+        dimensions=[2, 4, 8],
+        target_recall=0.99
+    )
+    assert [row["dimension"] for row in report["results"]] == [2, 4, 8]
+    assert report["results"][-1]["recall"] >= report["results"][0]["recall"]
+
+
+@pytest.mark.parametrize("factory", ["IVF4,Flat", "HNSW16", "Flat"])
+def test_deleting_from_an_ann_index_keeps_results_aligned_with_documents(tmp_path, monkeypatch, factory, make_documents):
+    monkeypatch.chdir(tmp_path)
+    manager = VectorStoreManager(embedding_backend="hashing", index_factory=factory, train_threshold=0)
+    assert manager.create_vector_store(make_documents(400), "diagnostic_kb")
+
+    removed = [manager.vector_store.index_to_docstore_id[i] for i in range(10)]
+    manager._remove_ids(removed)
+    assert manager.vector_store.index.ntotal == 390
+    assert len(manager.vector_store.index_to_docstore_id) == 390
+
+    for i in range(10, 400, 7):
+        query = f"Camion {i}: code P04{i:02d} perte de puissance"
+        result = manager.similarity_search(query, k=1, nprobe=4, ef_search=64)
+        assert result[0]["metadata"]["source"] == f"rapport_{i}.txt"
+    # La dernière position pointe toujours vers un document existant
+    assert manager.similarity_search("Camion 399: code P04399 perte de puissance", k=1)
+
+
+def test_filtered_searches_only_read_the_ivf_direct_map(tmp_path, monkeypatch, make_documents, snapshot_dir):
+    monkeypatch.chdir(tmp_path)
+    documents = make_documents(200)
+    for i, doc in enumerate(documents):
+        doc.metadata["make"] = ["Volvo", "Mack"][i % 2]
+    manager = VectorStoreManager(embedding_backend="hashing", index_factory="IVF4,Flat", train_threshold=0)
+    assert manager.create_vector_store(documents, "diagnostic_kb")
+
+    # Index enregistré sans table directe (bases antérieures)
+    index_path = snapshot_dir(tmp_path / "data/vector_store/diagnostic_kb") / "index.faiss"
+    index = faiss.read_index(str(index_path))
+    faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.NoMap)
+    faiss.write_index(index, str(index_path))
+    with pytest.raises(ValueError):
+        reconstruct_all(index)
+
+    # La table directe est construite au chargement, sous verrou d'écriture
+    reloaded = VectorStoreManager(embedding_backend="hashing", result_cache_size=0)
+    assert reloaded.load_vector_store("diagnostic_kb")
+    ivf = faiss.extract_index_ivf(reloaded.vector_store.index)
+    assert ivf.direct_map.type != faiss.DirectMap.NoMap
+
+    def search(i):
+        query = f"Camion {i}: code P04{i:02d} perte de puissance"
+        return reloaded.similarity_search(query, k=1, filters={"make": "Volvo"}, nprobe=4)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(search, range(0, 200, 2)))
+    assert [r[0]["metadata"]["source"] for r in results] == [f"rapport_{i}.txt" for i in range(0, 200, 2)]
@@ -0,0 +1,36 @@
+import pytest
+from app.utils.ingestion_pipeline import IngestionPipeline
+
+
+def test_ingestion_pipeline_batches_and_reports_progress(manager, make_documents):
+    progress = []
+    pipeline = IngestionPipeline(manager, batch_size=3, max_concurrency=2, progress_callback=progress.append)
+    stats = pipeline.run(make_documents(10), "diagnostic_kb")
+
+    assert stats["chunks"] == 10
+    assert stats["batches"] == 4
+    assert [p["chunks"] for p in progress[:4]] == [3, 6, 9, 10]
+    assert manager.vector_store.index.ntotal == 10
+
+
+def test_ingestion_pipeline_resumes_after_failure(manager, fake_embeddings, make_documents):
+    documents = make_documents(8)
+    original_embed = fake_embeddings.embed_documents
+    calls = {"count": 0}
+
+    def flaky_embed(texts):
+        calls["count"] += 1
+        if calls["count"] == 3:
+            raise RuntimeError("connexion interrompue")
+        return original_embed(texts)
+
+    object.__setattr__(fake_embeddings, "embed_documents", flaky_embed)
+    pipeline = IngestionPipeline(manager, batch_size=2, max_concurrency=1, max_retries=0, checkpoint_every=1)
+    with pytest.raises(RuntimeError):
+        pipeline.run(documents, "diagnostic_kb")
+    assert (manager.vector_store_path / "diagnostic_kb_ingest_checkpoint.json").exists()
+
+    stats = pipeline.run(documents, "diagnostic_kb")
+    assert stats["chunks_resumed"] == 4
+    assert manager.vector_store.index.ntotal == 8
+    assert not (manager.vector_store_path / "diagnostic_kb_ingest_checkpoint.json").exists()
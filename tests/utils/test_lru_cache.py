@@ -0,0 +1,18 @@
+from app.utils.lru_cache import LRUCache
+
+
+def test_lru_cache_evicts_by_entries_and_bytes():
+    evicted = []
+    cache = LRUCache(max_entries=2, on_evict=lambda key, value: evicted.append(key))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert evicted == ["b"]
+    assert "a" in cache and "c" in cache
+
+    cache = LRUCache(max_entries=100, max_bytes=250)
+    for i in range(10):
+        cache.put(i, "x", size=100)
+    assert len(cache) == 2
+    assert cache.get_stats()["memory_bytes"] == 200
@@ -0,0 +1,78 @@
+import numpy as np
+from app.utils.near_duplicates import NearDuplicateIndex
+from app.utils.vector_store_manager import VectorStoreManager
+
+
+def test_near_duplicates_are_merged_before_embedding(manager, fake_embeddings, tmp_path):
+    template = (
+        "Véhicule: Volvo VNL 2019. Symptômes: perte de puissance, fumée noire à l'accélération. "
+        "Codes DTC: P0299. Diagnostic: turbocompresseur défaillant, fuite sur la durite "
+        "d'admission. Gravité: élevée. Recommandations: remplacer la durite et contrôler le turbo. "
+        "Vérifier le jeu axial de la turbine, l'état de l'intercooler et les colliers de serrage, "
+        "puis effectuer un essai routier en charge avec lecture de la pression de suralimentation."
+    )
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    (reports / "a.txt").write_text(template)
+    (reports / "b.txt").write_text(template + " Atelier B.")
+    (reports / "c.txt").write_text("Inspection des freins: plaquettes usées à 80%")
+
+    stats = manager.reindex_incremental([str(reports)], "diagnostic_kb")
+    assert stats["duplicates"] == 1
+    assert fake_embeddings.calls == 2
+    assert manager.vector_store.index.ntotal == 2
+
+    canonical = manager.hybrid_search("turbocompresseur", k=1, alpha=0.0)[0]
+    assert [ref["source"] for ref in canonical["metadata"]["duplicates"]] == [str(reports / "b.txt")]
+
+    # Le chunk retenu disparaît : son quasi-doublon est réindexé à sa place
+    (reports / "a.txt").unlink()
+    manager.reindex_incremental([str(reports)], "diagnostic_kb")
+    sources = {r["metadata"]["source"] for r in manager.similarity_search("turbocompresseur", k=5)}
+    assert sources == {str(reports / "b.txt"), str(reports / "c.txt")}
+
+    # Les cas validés répétitifs ajoutés par les flows sont fusionnés eux aussi
+    ntotal = manager.vector_store.index.ntotal
+    assert manager.add_texts([template + " Atelier C."], [{"diagnostic_id": "42"}])
+    assert manager.vector_store.index.ntotal == ntotal
+
+
+def test_deleting_a_duplicate_file_drops_its_reference(manager, tmp_path):
+    template = (
+        "Véhicule: Mack Anthem 2021. Symptômes: ralenti instable et voyant moteur allumé. "
+        "Codes DTC: P0401. Diagnostic: vanne EGR encrassée, débit de recirculation insuffisant. "
+        "Recommandations: nettoyer la vanne EGR, contrôler le refroidisseur et les conduits."
+    )
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    (reports / "a.txt").write_text(template)
+    (reports / "b.txt").write_text(template)
+    assert manager.reindex_incremental([str(reports)], "diagnostic_kb")["duplicates"] == 1
+    canonical = manager.similarity_search("vanne EGR", k=1)[0]
+    assert [ref["source"] for ref in canonical["metadata"]["duplicates"]] == [str(reports / "b.txt")]
+
+    (reports / "b.txt").unlink()
+    stats = manager.reindex_incremental([str(reports)], "diagnostic_kb")
+    assert stats["removed"] == 1
+    assert manager.similarity_search("vanne EGR", k=1)[0]["metadata"]["duplicates"] == []
+
+
+def test_loaded_signatures_keep_the_configured_threshold(tmp_path, monkeypatch, fake_embeddings, make_documents):
+    monkeypatch.chdir(tmp_path)
+    manager = VectorStoreManager(dedup_threshold=0.9)
+    manager.embeddings.embeddings = fake_embeddings
+    assert manager.create_vector_store(make_documents(3), "diagnostic_kb")
+
+    stricter = VectorStoreManager(dedup_threshold=0.95)
+    stricter.embeddings.embeddings = fake_embeddings
+    assert stricter.load_vector_store("diagnostic_kb")
+    assert stricter._dedup_index is not None
+    assert stricter._dedup_index.threshold == 0.95
+
+    # Fichiers écrits avant ce changement : (seuil, num_perm, bands)
+    path = tmp_path / "old.npz"
+    with open(path, "wb") as f:
+        np.savez(f, ids=np.array([], dtype=str), signatures=np.zeros((0, 64), dtype=np.uint32),
+                 params=np.array([0.8, 64, 8]))
+    index = NearDuplicateIndex.load(path, threshold=0.95)
+    assert (index.threshold, index.num_perm, index.bands) == (0.95, 64, 8)
@@ -0,0 +1,34 @@
+import json
+import pytest
+from app.utils import projection_tuner
+
+
+class FakeManager:
+    def __init__(self, **kwargs):
+        pass
+
+    def load_vector_store(self, store_name):
+        return True
+
+    def select_projection_dimension(self, queries, dimensions, target_recall, projection, k):
+        return {
+            "dimension": 64,
+            "results": [{"dimension": 64, "recall": 0.97, "bytes_per_vector": 256}]
+        }
+
+
+@pytest.mark.parametrize("as_json", [False, True])
+def test_main_prints_either_the_table_or_the_json_report(tmp_path, monkeypatch, capsys, as_json):
+    monkeypatch.setattr("app.utils.vector_store_manager.VectorStoreManager", FakeManager)
+    queries_file = tmp_path / "queries.txt"
+    queries_file.write_text("perte de puissance\n", encoding="utf-8")
+
+    argv = ["--store", "diagnostic_kb", "--queries-file", str(queries_file)]
+    projection_tuner.main(argv + ["--json"] if as_json else argv)
+    output = capsys.readouterr().out
+
+    if as_json:
+        assert json.loads(output)["dimension"] == 64
+    else:
+        assert "Dimension retenue : 64" in output
+        assert "{" not in output
@@ -0,0 +1,86 @@
+import threading
+from streamlit.testing.v1 import AppTest
+from app.utils.reindex_jobs import ReindexJobRunner
+from app.utils.vector_store_registry import VectorStoreRegistry
+
+
+def test_reindex_job_can_be_cancelled_and_resumed(tmp_path, monkeypatch, fake_embeddings):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(VectorStoreRegistry, "_instance", None)
+    registry = VectorStoreRegistry()
+    registry.acquire("diagnostic_kb").embeddings.embeddings = fake_embeddings
+    sources = {}
+    for store_name in ("diagnostic_kb", "maintenance_kb"):
+        source_dir = tmp_path / store_name
+        source_dir.mkdir()
+        for i in range(3):
+            (source_dir / f"rapport_{i}.txt").write_text(f"{store_name} {i}: fuite d'huile moteur")
+        sources[store_name] = str(source_dir)
+
+    runner = ReindexJobRunner(registry, job_path=str(tmp_path / "reindex_job.json"))
+    embed_documents = type(fake_embeddings).embed_documents
+
+    def cancel_during_embedding(self, texts):
+        runner.cancel()
+        return embed_documents(self, texts)
+
+    monkeypatch.setattr(type(fake_embeddings), "embed_documents", cancel_during_embedding)
+    runner.start(sources)
+    assert runner.wait(timeout=30)
+    job = runner.status()
+    assert job["status"] == "cancelled"
+    assert job["stores"]["diagnostic_kb"]["status"] == "cancelled"
+    assert job["stores"]["maintenance_kb"]["status"] == "pending"
+
+    # Un nouveau processus retrouve la tâche sur disque et la reprend
+    monkeypatch.setattr(type(fake_embeddings), "embed_documents", embed_documents)
+    runner = ReindexJobRunner(registry, job_path=str(tmp_path / "reindex_job.json"))
+    assert runner.status()["status"] == "cancelled"
+    assert runner.resume() is not None
+    assert runner.wait(timeout=30)
+    job = runner.status()
+    assert job["status"] == "completed"
+    for store_name in sources:
+        store = job["stores"][store_name]
+        assert store["progress"] == 1.0
+        assert store["stats"]["added"] == 3
+        assert len(registry.acquire(store_name).similarity_search("fuite d'huile", k=5)) == 3
+
+
+def status_panel_app(runner, knowledge_bases):
+    runner.show_status_panel(knowledge_bases)
+
+
+def test_status_panel_renders_while_a_job_is_running(tmp_path, monkeypatch, fake_embeddings):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(VectorStoreRegistry, "_instance", None)
+    registry = VectorStoreRegistry()
+    registry.acquire("diagnostic_kb").embeddings.embeddings = fake_embeddings
+    source_dir = tmp_path / "rapports"
+    source_dir.mkdir()
+    (source_dir / "rapport.txt").write_text("Rapport: fuite d'huile moteur")
+    sources = {"diagnostic_kb": str(source_dir)}
+
+    runner = ReindexJobRunner(registry, job_path=str(tmp_path / "reindex_job.json"))
+    embed_documents = type(fake_embeddings).embed_documents
+    release = threading.Event()
+
+    def blocked_embedding(self, texts):
+        release.wait(timeout=30)
+        return embed_documents(self, texts)
+
+    monkeypatch.setattr(type(fake_embeddings), "embed_documents", blocked_embedding)
+    runner.start(sources)
+
+    # Pendant la tâche, le panneau (fragment rafraîchi périodiquement) s'affiche sans erreur
+    app = AppTest.from_function(status_panel_app, kwargs={"runner": runner, "knowledge_bases": sources})
+    app.run()
+    assert not app.exception
+    assert "Dernière réindexation : en cours" in [caption.value for caption in app.caption]
+    assert [button.disabled for button in app.button] == [True, False, True]
+
+    release.set()
+    assert runner.wait(timeout=30)
+    app.run()
+    assert not app.exception
+    assert "Dernière réindexation : terminée" in [caption.value for caption in app.caption]
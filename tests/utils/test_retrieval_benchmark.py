@@ -0,0 +1,36 @@
+import os
+from app.utils.embedding_backends import HashingEmbeddings
+from app.utils.retrieval_benchmark import format_report, run_benchmark
+
+
+def test_retrieval_benchmark_runs_offline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("OPENAI_API_KEY")
+
+    def forbidden_chdir(path):
+        raise AssertionError("le banc d'essai ne doit pas changer le dossier du processus")
+
+    monkeypatch.setattr(os, "chdir", forbidden_chdir)
+    query_embeddings = []
+    embed_query = HashingEmbeddings.embed_query
+
+    def counting_embed_query(self, text):
+        query_embeddings.append(text)
+        return embed_query(self, text)
+
+    monkeypatch.setattr(HashingEmbeddings, "embed_query", counting_embed_query)
+    results = run_benchmark(
+        corpus_size=40,
+        num_queries=5,
+        index_factories=["Flat", "HNSW32"],
+        chunk_sizes=[300],
+        k=5
+    )
+    assert [row["index_type"] for row in results] == ["IndexFlatL2", "IndexHNSWFlat"]
+    assert results[0]["recall@5"] == 1.0
+    assert all(row["p99_ms"] >= row["p50_ms"] > 0 for row in results)
+    assert "recall@5" in format_report(results)
+    # Chaque recherche mesurée calcule l'embedding de sa requête (aucun cache)
+    assert len(query_embeddings) == 2 * 5
+    # Les bases de mesure sont construites hors du dossier de travail
+    assert not (tmp_path / "data").exists()
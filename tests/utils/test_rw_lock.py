@@ -0,0 +1,59 @@
+import threading
+import time
+from app.utils.rw_lock import ReadWriteLock
+
+
+def wait_for_writer(lock):
+    while not lock._writers_waiting:
+        time.sleep(0.001)
+
+
+def test_nested_read_does_not_wait_for_a_pending_writer():
+    lock = ReadWriteLock()
+    order = []
+
+    def writer():
+        with lock.write():
+            order.append("write")
+
+    def reader():
+        with lock.read():
+            order.append("read")
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    with lock.read():
+        writer_thread = threading.Thread(target=writer, daemon=True)
+        writer_thread.start()
+        wait_for_writer(lock)
+        reader_thread.start()
+        reader_thread.join(timeout=0.2)
+        # Nouveau lecteur d'un autre thread : il reste derrière le rédacteur
+        assert reader_thread.is_alive()
+
+    reader_thread.join(timeout=5)
+    writer_thread.join(timeout=5)
+    assert order == ["write", "read"]
+
+    # Recherches enchaînées dans reading() : le thread qui tient déjà une lecture
+    # la reprend sans attendre le rédacteur (qui attend lui-même cette lecture)
+    nested_done = threading.Event()
+    outer_read = threading.Event()
+
+    def chained_searches():
+        with lock.read():
+            outer_read.set()
+            wait_for_writer(lock)
+            with lock.read():
+                order.append("nested read")
+                nested_done.set()
+
+    searches = threading.Thread(target=chained_searches, daemon=True)
+    searches.start()
+    assert outer_read.wait(timeout=5)
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    writer_thread.start()
+    assert nested_done.wait(timeout=5)
+    searches.join(timeout=5)
+    writer_thread.join(timeout=5)
+    assert order[-2:] == ["nested read", "write"]
+    assert lock._readers == 0
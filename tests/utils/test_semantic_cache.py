@@ -0,0 +1,37 @@
+from app.utils.embedding_backends import HashingEmbeddings
+from app.utils.semantic_cache import SemanticCache
+
+
+def test_semantic_cache_reuses_rephrased_requests_for_same_profile():
+    cache = SemanticCache(HashingEmbeddings().embed_query, threshold=0.8, max_entries=2)
+    truck = {"make": "Volvo", "model": "VNL", "year": 2019, "vin": "VIN1"}
+    entry_id = cache.store(truck, ["Perte de puissance en côte", "fumée noire"], ["P0420"], {"diagnostic": "catalyseur"})
+
+    # Même demande reformulée (ordre, casse, accents, espaces) et autre VIN du même modèle
+    hit = cache.lookup(
+        {"make": "volvo", "model": "VNL ", "year": 2019, "vin": "VIN2"},
+        ["fumee  noire", "perte de puissance en cote"],
+        ["p0420 "]
+    )
+    assert hit["diagnostic"] == "catalyseur"
+    assert hit["semantic_cache"]["entry_id"] == entry_id
+    assert hit["semantic_cache"]["age_seconds"] >= 0
+
+    # Autre profil ou autres codes : pas de réutilisation
+    assert cache.lookup({**truck, "year": 2020}, ["fumée noire"], ["P0420"]) is None
+    assert cache.lookup(truck, ["Perte de puissance en côte", "fumée noire"], ["P0430"]) is None
+    # Symptômes différents : sous le seuil
+    assert cache.lookup(truck, ["bruit de freinage à l'arrêt"], ["P0420"]) is None
+
+    assert cache.report_false_hit(entry_id, hit["semantic_cache"]["similarity"])
+    assert cache.lookup(truck, ["fumée noire", "perte de puissance en côte"], ["P0420"]) is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["false_hits"]) == (1, 4, 1)
+    assert stats["false_hit_rate"] == 1.0
+
+    # Borné : la plus ancienne entrée est évincée
+    for year in (2001, 2002, 2003):
+        cache.store({**truck, "year": year}, ["fumée noire"], [], {"diagnostic": str(year)})
+    assert cache.get_stats()["entries"] == 2
+    assert cache.lookup({**truck, "year": 2001}, ["fumée noire"], []) is None
+    assert cache.lookup({**truck, "year": 2003}, ["fumée noire"], [])["diagnostic"] == "2003"
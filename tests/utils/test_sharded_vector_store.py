@@ -0,0 +1,107 @@
+import pytest
+from app.utils.sharded_vector_store import ShardedVectorStoreManager
+from app.utils.vector_store_manager import VectorStoreManager
+
+
+def test_sharded_store_routes_by_make_and_loads_shards_lazily(tmp_path, monkeypatch, fake_embeddings, make_documents):
+    monkeypatch.chdir(tmp_path)
+    documents = make_documents(9)
+    for i, doc in enumerate(documents):
+        doc.metadata["make"] = ["Volvo", "Kenworth", None][i % 3]
+
+    sharded = ShardedVectorStoreManager(shard_by="make", max_resident_shards=1)
+    sharded.embeddings.embeddings = fake_embeddings
+    assert sharded.create_vector_store(documents, "diagnostic_kb")
+    assert sharded.shards == {"autres": 3, "kenworth": 3, "volvo": 3}
+
+    reloaded = ShardedVectorStoreManager(shard_by="make", max_resident_shards=1)
+    reloaded.embeddings.embeddings = fake_embeddings
+    assert reloaded.load_vector_store("diagnostic_kb")
+    assert reloaded.resident_shards() == []
+
+    # Une requête filtrée par marque ne charge que le shard concerné
+    results = reloaded.similarity_search("perte de puissance", k=5, filters={"make": "VOLVO"})
+    assert {r["metadata"]["make"] for r in results} == {"Volvo"}
+    assert reloaded.resident_shards() == ["volvo"]
+
+    # Sans filtre, tous les shards sont interrogés et leurs top-k fusionnés
+    results = reloaded.similarity_search("perte de puissance", k=9)
+    assert len(results) == 9
+    assert [r["score"] for r in results] == sorted(r["score"] for r in results)
+    assert len(reloaded.resident_shards()) == 1
+
+    assert reloaded.add_texts(["Cas validé: capteur NOx"], [{"make": "Mack", "diagnostic_id": "d1"}])
+    reloaded.save_vector_store("diagnostic_kb")
+    assert ShardedVectorStoreManager(shard_by="make").load_vector_store("diagnostic_kb")
+    assert reloaded.shards["mack"] == 1
+    with pytest.raises(ValueError):
+        ShardedVectorStoreManager(shard_by="hash").load_vector_store("diagnostic_kb")
+
+
+def test_sharded_store_routes_documents_batch_by_batch(tmp_path, monkeypatch, fake_embeddings, make_documents):
+    monkeypatch.chdir(tmp_path)
+    consumed = []
+
+    def documents():
+        for i, doc in enumerate(make_documents(12)):
+            doc.metadata["make"] = ["Volvo", "Kenworth"][i % 2]
+            consumed.append(i)
+            yield doc
+
+    sharded = ShardedVectorStoreManager(shard_by="make")
+    sharded.embeddings.embeddings = fake_embeddings
+    ingested = []
+    ingest = sharded._ingest
+    monkeypatch.setattr(
+        sharded, "_ingest",
+        lambda shard, docs, *args: ingested.append((shard, len(docs), len(consumed))) or ingest(shard, docs, *args)
+    )
+
+    assert sharded.create_vector_store(documents(), "diagnostic_kb", flush_size=2)
+    assert sharded.shards == {"kenworth": 6, "volvo": 6}
+    # Chaque shard est ingéré dès que son tampon est plein, sans lire tout le corpus
+    assert ingested[0] == ("volvo", 2, 3)
+    assert all(size <= 2 for _, size, _ in ingested)
+
+
+def test_unfiltered_search_loads_shards_in_waves_and_never_saves(tmp_path, monkeypatch, fake_embeddings, make_documents):
+    monkeypatch.chdir(tmp_path)
+    documents = make_documents(9)
+    for i, doc in enumerate(documents):
+        doc.metadata["make"] = ["Volvo", "Kenworth", "Mack"][i % 3]
+    builder = ShardedVectorStoreManager(shard_by="make")
+    builder.embeddings.embeddings = fake_embeddings
+    assert builder.create_vector_store(documents, "diagnostic_kb")
+
+    sharded = ShardedVectorStoreManager(shard_by="make", max_resident_shards=1)
+    sharded.embeddings.embeddings = fake_embeddings
+    assert sharded.load_vector_store("diagnostic_kb")
+    assert sharded.add_texts(["Cas validé: capteur NOx"], [{"make": "Volvo", "diagnostic_id": "d1"}])
+
+    saves = []
+    monkeypatch.setattr(
+        "app.utils.vector_store_manager.VectorStoreManager.save_vector_store",
+        lambda self, store_name=None: saves.append(store_name) or True
+    )
+    results = sharded.similarity_search("perte de puissance", k=10)
+    assert len(results) == 10
+    # Le shard modifié reste en mémoire sans être sauvegardé par la recherche
+    assert saves == []
+    assert sharded.resident_shards() == ["volvo", "mack"]
+
+    sharded.save_vector_store("diagnostic_kb")
+    assert saves == ["diagnostic_kb/shards/volvo"]
+    assert len(sharded.resident_shards()) == 1
+
+
+def test_shards_accept_embeddings_passed_as_manager_options(tmp_path, monkeypatch, make_documents):
+    monkeypatch.chdir(tmp_path)
+    embeddings = VectorStoreManager(embedding_backend="hashing").embeddings
+    sharded = ShardedVectorStoreManager(shard_by="make", embedding_backend="hashing", embeddings=embeddings)
+    documents = make_documents(4)
+    for i, doc in enumerate(documents):
+        doc.metadata["make"] = ["Volvo", "Mack"][i % 2]
+
+    assert sharded.create_vector_store(documents, "diagnostic_kb")
+    assert sharded.shards == {"mack": 2, "volvo": 2}
+    assert sharded._get_shard("volvo").embeddings is embeddings
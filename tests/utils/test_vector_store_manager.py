@@ -0,0 +1,246 @@
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import pytest
+from langchain_core.documents import Document
+from app.utils.bm25_index import BM25Index
+from app.utils.metadata_index import MetadataIndex
+from app.utils.vector_store_manager import VectorStoreManager
+
+
+def test_reindex_incremental_only_processes_changes(manager, tmp_path):
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    for i in range(3):
+        (reports / f"rapport_{i}.txt").write_text(f"Rapport {i}: fuite d'huile moteur")
+
+    stats = manager.reindex_incremental([str(reports)], "diagnostic_kb")
+    assert stats["added"] == 3
+    assert manager.vector_store.index.ntotal == 3
+
+    # Aucun changement : rien n'est rechargé
+    stats = manager.reindex_incremental([str(reports)], "diagnostic_kb")
+    assert stats["unchanged"] == 3
+    assert stats["chunks_added"] == 0
+
+    # Modification d'un fichier et suppression d'un autre
+    (reports / "rapport_0.txt").write_text("Rapport 0: turbo défectueux, code P0299")
+    (reports / "rapport_2.txt").unlink()
+    stats = manager.reindex_incremental([str(reports)], "diagnostic_kb")
+    assert stats["modified"] == 1
+    assert stats["removed"] == 1
+    assert stats["unchanged"] == 1
+    assert manager.vector_store.index.ntotal == 2
+
+    contents = [r["content"] for r in manager.similarity_search("turbo", k=5)]
+    assert any("P0299" in content for content in contents)
+    assert not any("Rapport 2" in content for content in contents)
+
+
+def test_native_store_round_trip_with_mmap(manager, fake_embeddings, make_documents, snapshot_dir):
+    assert manager.create_vector_store(make_documents(4), "diagnostic_kb")
+    store_dir = snapshot_dir(manager.vector_store_path / "diagnostic_kb")
+    assert (store_dir / "index.faiss").exists()
+    assert (store_dir / "docstore.json").exists()
+
+    reloaded = VectorStoreManager()
+    reloaded.embeddings.embeddings = fake_embeddings
+    assert reloaded.load_vector_store("diagnostic_kb", mmap=True)
+    assert reloaded.vector_store.index.ntotal == 4
+    assert reloaded.similarity_search("P0402", k=1)[0]["metadata"]["source"] == "rapport_2.txt"
+
+    # L'ajout sur un index mappé passe par une copie privée
+    assert reloaded.add_texts(["Camion 9: frein moteur inopérant"], [{"source": "nouveau"}])
+    reloaded.save_vector_store("diagnostic_kb")
+    assert reloaded.load_vector_store("diagnostic_kb")
+    assert reloaded.vector_store.index.ntotal == 5
+
+
+def test_legacy_pickle_store_is_migrated(manager, make_documents, snapshot_dir):
+    from langchain_community.vectorstores.faiss import FAISS
+
+    legacy = FAISS.from_documents(make_documents(2), manager.embeddings.embeddings)
+    with open(manager.vector_store_path / "maintenance_kb.pkl", "wb") as f:
+        pickle.dump(legacy, f)
+
+    assert manager.load_vector_store("maintenance_kb")
+    assert manager.vector_store.index.ntotal == 2
+    assert not (manager.vector_store_path / "maintenance_kb.pkl").exists()
+    assert (snapshot_dir(manager.vector_store_path / "maintenance_kb") / "index.faiss").exists()
+
+
+def test_result_cache_is_invalidated_by_index_version(manager, fake_embeddings, make_documents):
+    manager.create_vector_store(make_documents(3), "diagnostic_kb")
+
+    first = manager.similarity_search("Camion 1: code P0401", k=2)
+    assert manager.similarity_search("Camion 1:   code P0401", k=2) == first
+    stats = manager.get_result_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["memory_bytes"] > 0
+
+    # Un ajout change la version : la recherche doit voir le nouveau document
+    version = manager.index_version
+    manager.add_texts(["Camion 1: code P0401 vanne EGR bloquée"], [{"source": "nouveau"}])
+    assert manager.index_version > version
+    results = manager.similarity_search("Camion 1: code P0401 vanne EGR bloquée", k=1)
+    assert results[0]["metadata"]["source"] == "nouveau"
+
+
+def test_similarity_search_batch_matches_single_queries(manager, fake_embeddings, make_documents):
+    manager.create_vector_store(make_documents(10), "diagnostic_kb")
+    queries = [f"Camion {i}: code P04{i:02d} perte de puissance" for i in (2, 5, 8)]
+    manager.embeddings.spill_queries_to_disk = False
+
+    requests_before = fake_embeddings.requests
+    batch = manager.similarity_search_batch(queries, k=3)
+    assert fake_embeddings.requests == requests_before + 1
+
+    assert [rows[0]["metadata"]["source"] for rows in batch] == [
+        "rapport_2.txt", "rapport_5.txt", "rapport_8.txt"
+    ]
+    for query, rows in zip(queries, batch):
+        assert manager.similarity_search(query, k=3) == rows
+
+
+def test_concurrent_searches_build_derived_indexes_once(manager, monkeypatch, make_documents):
+    documents = make_documents(20)
+    for i, doc in enumerate(documents):
+        doc.metadata.update({"make": ["Volvo", "Mack"][i % 2], "diagnostic_id": f"d{i}"})
+    assert manager.create_vector_store(documents, "diagnostic_kb")
+    assert manager.delete_documents("diagnostic_id", "d0")
+    manager._metadata_index = None
+    manager._bm25_index = None
+    manager._tombstone_positions = None
+
+    builds = []
+
+    def slow(name, build):
+        def wrapper(items):
+            builds.append(name)
+            time.sleep(0.05)
+            return build(items)
+        return staticmethod(wrapper)
+
+    monkeypatch.setattr(MetadataIndex, "build", slow("metadata", MetadataIndex.build))
+    monkeypatch.setattr(BM25Index, "build", slow("bm25", BM25Index.build))
+
+    def search(i):
+        # Comme SharedVectorStore : les recherches ne prennent que le verrou de lecture
+        with manager.lock.read():
+            filtered = manager.similarity_search(f"Camion {i}", k=3, filters={"make": "Volvo"})
+            hybrid = manager.hybrid_search(f"Camion {i} perte de puissance", k=3)
+        return filtered, hybrid
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(search, range(8)))
+    assert sorted(builds) == ["bm25", "metadata"]
+    for filtered, hybrid in results:
+        assert {r["metadata"]["make"] for r in filtered} == {"Volvo"}
+        assert "d0" not in {r["metadata"]["diagnostic_id"] for r in filtered + hybrid}
+
+
+def test_filtered_search_restricts_candidates_by_metadata(manager, make_documents):
+    trucks = [("Volvo", "VNL", 2018), ("Volvo", "VNL", 2021), ("Kenworth", "T680", 2019)]
+    manager.create_vector_store(make_documents(1), "diagnostic_kb")
+    for i, (make, model, year) in enumerate(trucks):
+        manager.add_texts(
+            [f"Cas {i}: Codes DTC: P0420, SPN 3226 FMI 4"],
+            [{"diagnostic_id": f"d{i}", "make": make, "model": model, "year": year}]
+        )
+
+    results = manager.similarity_search("catalyseur", k=5, filters={"make": "volvo", "model": "VNL"})
+    assert sorted(r["metadata"]["diagnostic_id"] for r in results) == ["d0", "d1"]
+
+    results = manager.similarity_search("catalyseur", k=5, filters={"year_min": 2019, "dtc_codes": ["spn 3226 fmi 4"]})
+    assert sorted(r["metadata"]["diagnostic_id"] for r in results) == ["d1", "d2"]
+
+    assert manager.similarity_search("catalyseur", filters={"make": "Mack"}) == []
+
+    # Les ajouts ultérieurs sont indexés sans reconstruction
+    manager.add_texts(["Cas 3: injecteur"], [{"diagnostic_id": "d3", "make": "Mack", "model": "Anthem", "year": 2022}])
+    results = manager.similarity_search("injecteur", filters={"make": "Mack"})
+    assert [r["metadata"]["diagnostic_id"] for r in results] == ["d3"]
+
+
+def test_hybrid_search_resolves_codes_without_embedding(manager, fake_embeddings, make_documents):
+    documents = make_documents(8) + [
+        Document(page_content="Défaut SPN 3226 FMI 4 capteur NOx", metadata={"source": "j1939.txt"})
+    ]
+    assert manager.create_vector_store(documents, "diagnostic_kb")
+    manager.save_vector_store("diagnostic_kb")
+    assert manager.load_vector_store("diagnostic_kb")
+    calls = fake_embeddings.calls
+
+    # Code seul : réponse depuis l'index inversé persisté, sans appel d'embeddings
+    results = manager.hybrid_search("P0403", k=3)
+    assert results[0]["content"].startswith("Camion 3:")
+    results = manager.hybrid_search("spn 3226 fmi 4", k=1)
+    assert results[0]["metadata"]["source"] == "j1939.txt"
+    assert results[0]["vector_score"] is None
+    assert fake_embeddings.calls == calls
+
+    # Requête mixte : fusion des scores lexicaux et vectoriels
+    results = manager.hybrid_search("perte de puissance P0405", k=3)
+    assert results[0]["content"].startswith("Camion 5:")
+    assert fake_embeddings.calls == calls + 1
+
+    # L'index lexical suit les ajouts incrémentaux
+    assert manager.add_texts(["Nouveau défaut U0100 perte de communication"])
+    assert manager.hybrid_search("U0100", k=1)[0]["content"].startswith("Nouveau défaut")
+
+
+def test_deleted_cases_are_hidden_then_compacted(manager, fake_embeddings, tmp_path, make_documents, snapshot_dir):
+    assert manager.create_vector_store(make_documents(8), "diagnostic_kb")
+    assert manager.add_texts(
+        ["Cas validé à tort: capteur NOx remplacé", "Ancien cas: courroie d'alternateur usée"],
+        [{"diagnostic_id": "d-err"}, {"diagnostic_id": "d-old"}]
+    )
+    manager.save_vector_store("diagnostic_kb")
+
+    with pytest.raises(ValueError):
+        manager.delete_documents("content", "x")
+    manager.compaction_threshold = None
+    assert manager.delete_documents("diagnostic_id", "d-err") == 1
+    assert not manager.similarity_search("capteur", k=10, filters={"diagnostic_id": "d-err"})
+    assert all(r["metadata"].get("diagnostic_id") != "d-err" for r in manager.similarity_search("capteur NOx", k=10))
+    assert all(r["metadata"].get("diagnostic_id") != "d-err" for r in manager.hybrid_search("capteur NOx", k=10))
+
+    # La suppression est journalisée : elle survit au rechargement
+    manager.save_vector_store("diagnostic_kb")
+    reloaded = VectorStoreManager(compaction_threshold=0.15)
+    reloaded.embeddings.embeddings = fake_embeddings
+    assert reloaded.load_vector_store("diagnostic_kb")
+    assert not reloaded.similarity_search("capteur", k=10, filters={"diagnostic_id": "d-err"})
+
+    # Au-delà du seuil, l'index est reconstruit en arrière-plan sans les documents supprimés
+    assert reloaded.delete_documents("diagnostic_id", "d-old") == 1
+    reloaded.wait_for_compaction(timeout=10)
+    assert reloaded.vector_store.index.ntotal == 8
+    assert len(reloaded.similarity_search("camion", k=20)) == 8
+    store_dir = snapshot_dir(tmp_path / "data/vector_store/diagnostic_kb")
+    assert faiss.read_index(str(store_dir / "index.faiss")).ntotal == 8
+
+
+def test_refused_save_reloads_the_published_snapshot_and_replays_the_addition(manager, fake_embeddings, make_documents):
+    assert manager.create_vector_store(make_documents(3), "diagnostic_kb")
+    # Deuxième processus : ses sauvegardes publient un nouvel instantané
+    other = VectorStoreManager(wal_max_entries=0)
+    other.embeddings.embeddings = fake_embeddings
+    assert other.load_vector_store("diagnostic_kb")
+    assert other.add_texts(["Cas validé: capteur NOx"], [{"diagnostic_id": "d1"}])
+    assert other.save_vector_store("diagnostic_kb")
+
+    assert manager.add_texts(["Cas validé: vanne EGR"], [{"diagnostic_id": "d2"}])
+    assert not manager.save_vector_store("diagnostic_kb")
+    assert manager.add_texts_and_save(["Cas validé: vanne EGR"], [{"diagnostic_id": "d2"}], "diagnostic_kb")
+
+    reloaded = VectorStoreManager()
+    reloaded.embeddings.embeddings = fake_embeddings
+    assert reloaded.load_vector_store("diagnostic_kb")
+    ids = [doc.metadata.get("diagnostic_id") for doc in reloaded.vector_store.docstore._dict.values()]
+    assert sorted(filter(None, ids)) == ["d1", "d2"]
+
+    manager.retire()
+    with pytest.raises(RuntimeError):
+        manager.add_texts_and_save(["Cas validé: turbo"], [{"diagnostic_id": "d3"}], "diagnostic_kb")
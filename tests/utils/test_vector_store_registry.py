@@ -0,0 +1,166 @@
+import threading
+import faiss
+from app.utils import vector_store_manager
+from app.utils.vector_store_registry import VectorStoreRegistry
+from app.utils.vector_store_manager import VectorStoreManager
+
+
+def test_registry_shares_one_store_across_sessions(tmp_path, monkeypatch, fake_embeddings):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(VectorStoreRegistry, "_instance", None)
+    registry = VectorStoreRegistry()
+
+    first = registry.acquire("diagnostic_kb")
+    first.embeddings.embeddings = fake_embeddings
+    with first.writing():
+        assert first.add_texts(["Camion 1: code P0420 catalyseur"], [{"make": "Volvo"}])
+        first.save_vector_store("diagnostic_kb")
+
+    second = VectorStoreRegistry().acquire("diagnostic_kb")
+    other = registry.acquire("inspection_kb")
+    assert second._entry.manager is first._entry.manager
+    assert other.embeddings is first.embeddings
+    assert second.similarity_search("catalyseur", k=1)[0]["metadata"]["make"] == "Volvo"
+
+    # Le rapport estime la taille de l'index sans le sérialiser
+    monkeypatch.setattr(faiss, "serialize_index", None)
+    report = {row["store_name"]: row for row in registry.get_memory_report()}
+    assert report["diagnostic_kb"]["refcount"] == 2
+    assert report["diagnostic_kb"]["documents"] == 1
+    assert report["diagnostic_kb"]["index_bytes"] == 16 * 4
+    assert report["diagnostic_kb"]["docstore_bytes"] > 0
+
+    first.release()
+    first.release()
+    del second
+    other.release()
+    assert sorted(registry.unload_unused()) == ["diagnostic_kb", "inspection_kb"]
+
+
+def test_registry_defers_loading_until_first_use(tmp_path, monkeypatch, fake_embeddings, make_documents):
+    monkeypatch.chdir(tmp_path)
+    writer = VectorStoreManager()
+    writer.embeddings.embeddings = fake_embeddings
+    assert writer.create_vector_store(make_documents(3), "diagnostic_kb")
+    assert writer.create_vector_store(make_documents(2), "inspection_kb")
+
+    monkeypatch.setattr(VectorStoreRegistry, "_instance", None)
+    registry = VectorStoreRegistry()
+    lazy = registry.acquire("diagnostic_kb", lazy=True)
+    assert not lazy._entry.loaded
+
+    # Le premier accès charge la base
+    lazy._entry.manager.embeddings.embeddings = fake_embeddings
+    assert len(lazy.similarity_search("perte de puissance", k=5)) == 3
+    assert lazy._entry.loaded
+
+    # Le préchargement en arrière-plan évite l'attente de la première requête
+    registry.warm_up(["inspection_kb"]).join(timeout=10)
+    other = registry.acquire("inspection_kb", lazy=True)
+    assert other._entry.loaded
+    assert other._entry.manager.vector_store.index.ntotal == 2
+
+
+def test_rebuild_publishes_a_new_snapshot_while_readers_keep_the_old_one(tmp_path, monkeypatch, fake_embeddings, make_documents, snapshot_dir):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(VectorStoreRegistry, "_instance", None)
+    registry = VectorStoreRegistry()
+    shared = registry.acquire("diagnostic_kb", snapshot_grace_seconds=0)
+    shared.embeddings.embeddings = fake_embeddings
+    with shared.writing():
+        assert shared.add_texts(["Camion 1: code P0420 catalyseur"])
+        shared.save_vector_store("diagnostic_kb")
+    store_dir = tmp_path / "data/vector_store/diagnostic_kb"
+    first_snapshot = snapshot_dir(store_dir)
+
+    def build(manager):
+        # Pendant la reconstruction, les recherches servent toujours l'ancienne version
+        assert len(shared.similarity_search("catalyseur", k=5)) == 1
+        assert manager.create_vector_store(make_documents(3), "diagnostic_kb")
+        assert snapshot_dir(store_dir) != first_snapshot
+        assert len(shared.similarity_search("catalyseur", k=5)) == 1
+        return "ok"
+
+    assert registry.rebuild("diagnostic_kb", build) == "ok"
+    assert len(shared.similarity_search("catalyseur", k=5)) == 3
+    # L'instantané remplacé est supprimé une fois le délai de grâce écoulé
+    assert [path.name for path in (store_dir / "snapshots").iterdir()] == [snapshot_dir(store_dir).name]
+
+
+def shared_store_with_cases(tmp_path, monkeypatch, fake_embeddings, **manager_options):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(VectorStoreRegistry, "_instance", None)
+    registry = VectorStoreRegistry()
+    shared = registry.acquire("diagnostic_kb", **manager_options)
+    shared.embeddings.embeddings = fake_embeddings
+    with shared.writing():
+        assert shared.add_texts(
+            [f"Camion {i}: code P0420 catalyseur" for i in range(4)],
+            [{"diagnostic_id": f"d{i}"} for i in range(4)]
+        )
+        shared.save_vector_store("diagnostic_kb")
+    return registry, shared
+
+
+def test_writes_during_rebuild_do_not_wait_and_are_replayed(tmp_path, monkeypatch, fake_embeddings, make_documents):
+    registry, shared = shared_store_with_cases(tmp_path, monkeypatch, fake_embeddings)
+
+    def validate_case():
+        # Validation d'un cas par une autre session pendant la réindexation
+        with shared.writing():
+            shared.add_texts(["Camion 9: code P0299 turbocompresseur"], [{"diagnostic_id": "d9"}])
+            shared.save_vector_store("diagnostic_kb")
+
+    def build(manager):
+        assert manager.create_vector_store(make_documents(3), "diagnostic_kb")
+        writer = threading.Thread(target=validate_case)
+        writer.start()
+        writer.join(timeout=5)
+        assert not writer.is_alive()
+        # Visible tout de suite sur la version servie
+        assert len(shared.similarity_search("turbocompresseur", k=10)) == 5
+        return "ok"
+
+    assert registry.rebuild("diagnostic_kb", build) == "ok"
+    # Rejoué sur la version reconstruite, puis sauvegardé avec elle
+    assert len(shared.similarity_search("turbocompresseur", k=10)) == 4
+    reloaded = VectorStoreManager()
+    reloaded.embeddings.embeddings = fake_embeddings
+    assert reloaded.load_vector_store("diagnostic_kb")
+    contents = [doc.page_content for doc in reloaded.vector_store.docstore._dict.values()]
+    assert "Camion 9: code P0299 turbocompresseur" in contents
+    assert len(contents) == 4
+
+
+def test_compaction_of_the_replaced_store_cannot_overwrite_the_rebuild(tmp_path, monkeypatch, fake_embeddings, make_documents, snapshot_dir):
+    registry, shared = shared_store_with_cases(
+        tmp_path, monkeypatch, fake_embeddings, compaction_threshold=0.1
+    )
+    store_dir = tmp_path / "data/vector_store/diagnostic_kb"
+    previous = shared._entry.manager
+    compaction_started = threading.Event()
+    rebuild_published = threading.Event()
+    reconstruct_all = vector_store_manager.reconstruct_all
+
+    def slow_reconstruct_all(index):
+        compaction_started.set()
+        rebuild_published.wait(timeout=10)
+        return reconstruct_all(index)
+
+    monkeypatch.setattr(vector_store_manager, "reconstruct_all", slow_reconstruct_all)
+
+    def build(manager):
+        # Le retrait d'un cas lance une compaction de l'ancienne version
+        assert shared.delete_documents("diagnostic_id", "d0") == 1
+        assert compaction_started.wait(timeout=5)
+        assert manager.create_vector_store(make_documents(3), "diagnostic_kb")
+        rebuilt_snapshot = snapshot_dir(store_dir)
+        rebuild_published.set()
+        return rebuilt_snapshot
+
+    rebuilt_snapshot = registry.rebuild("diagnostic_kb", build)
+    previous.wait_for_compaction(timeout=10)
+    assert snapshot_dir(store_dir) == rebuilt_snapshot
+    assert not previous.save_vector_store("diagnostic_kb")
+    assert snapshot_dir(store_dir) == rebuilt_snapshot
+    assert len(shared.similarity_search("Camion", k=10)) == 3
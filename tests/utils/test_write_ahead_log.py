@@ -0,0 +1,32 @@
+import faiss
+from app.utils.vector_store_manager import VectorStoreManager
+
+
+def test_saves_after_additions_only_append_to_the_journal(manager, fake_embeddings, tmp_path, make_documents, snapshot_dir):
+    assert manager.create_vector_store(make_documents(5), "diagnostic_kb")
+    store_dir = snapshot_dir(tmp_path / "data/vector_store/diagnostic_kb")
+    index_stat = (store_dir / "index.faiss").stat()
+
+    for i in range(2):
+        assert manager.add_texts([f"Cas validé {i}: remplacement du capteur NOx"], [{"diagnostic_id": f"d{i}"}])
+        manager.save_vector_store("diagnostic_kb")
+    assert (store_dir / "index.faiss").stat().st_mtime_ns == index_stat.st_mtime_ns
+    assert len((store_dir / "wal.log").read_text().splitlines()) == 2
+
+    # Arrêt pendant une écriture : la dernière ligne incomplète est ignorée
+    with open(store_dir / "wal.log", "a") as f:
+        f.write('{"op": "add", "id": "incomplet"')
+
+    reloaded = VectorStoreManager(wal_max_entries=2)
+    reloaded.embeddings.embeddings = fake_embeddings
+    assert reloaded.load_vector_store("diagnostic_kb")
+    assert reloaded.vector_store.index.ntotal == 7
+    assert reloaded.similarity_search("capteur", k=1, filters={"diagnostic_id": "d1"})
+
+    # Au-delà du seuil, la sauvegarde écrit un nouvel instantané, sans journal
+    assert reloaded.add_texts(["Cas validé 2: injecteur colmaté"], [{"diagnostic_id": "d2"}])
+    reloaded.save_vector_store("diagnostic_kb")
+    new_dir = snapshot_dir(tmp_path / "data/vector_store/diagnostic_kb")
+    assert new_dir != store_dir
+    assert not (new_dir / "wal.log").exists()
+    assert faiss.read_index(str(new_dir / "index.faiss")).ntotal == 8